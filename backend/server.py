@@ -1,7 +1,19 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from threading import Thread
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import base64
+import binascii
+import gzip
+import hashlib
+import threading
+import time
+import traceback
+import uuid
+from urllib.parse import urlparse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
 import ast
 import os
@@ -10,6 +22,11 @@ import json
 import autoroute
 import layout
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 app = Flask(__name__)
 CORS(app)
 
@@ -18,13 +35,32 @@ HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3"
 }
 
+# Outgoing requests: (connect, read) timeouts in seconds, requests at once per
+# host, and worker threads shared by every job's lookups and downloads
+HTTP_TIMEOUT = (5, 30)
+HOST_CONCURRENCY = int(os.getenv("WIREHEAD_HOST_CONCURRENCY", "10"))
+FETCH_WORKERS = 32
+
 AI_URL = os.getenv("MCP_SERVER_URL", "http://127.0.0.1:8888/parse")
+# Where the browser reaches this server, for the image URLs in build states
+PUBLIC_URL = os.getenv("WIREHEAD_PUBLIC_URL", "http://localhost:8000")
 
-for chunk in stream:
-  print(chunk.choices[0].delta.content or "", end="")
+# Pipelines that may run at once; more submissions wait in the queue
+MAX_CONCURRENT_JOBS = int(os.getenv("WIREHEAD_MAX_JOBS", "2"))
+# Finished jobs kept around for /buildstatus/<job_id>, oldest dropped first
+MAX_FINISHED_JOBS = int(os.getenv("WIREHEAD_MAX_FINISHED_JOBS", "50"))
+# Patches kept per job for streams that fall behind or reconnect; older
+# clients get a fresh snapshot instead
+MAX_PATCH_HISTORY = 256
+# Seconds between keep-alive comments on an idle event stream
+HEARTBEAT_INTERVAL = 15
+# Responses smaller than this aren't worth compressing
+MIN_COMPRESS_SIZE = 1024
+# Build state keys holding images: a data URI or bare base64 PNG (as from
+# pcb/generate.py's generate_visualization), or a dict of them
+IMAGE_KEYS = ("layouts", "fullLayout", "schematic")
+PNG_BASE64_PREFIX = "iVBORw0KGgo"
 
-COMPONENTS = []
-CONTEXT = ""
 # BUILD_STATE = {
 #     "status": "idle",
 #     "components": {
@@ -89,14 +125,303 @@ CONTEXT = ""
 #         "graphnode1": "/layout.png",
 #     },
 # }
-BUILD_STATE = {}
+
+
+def new_build_state(status):
+    return {
+        "status": status,
+        "components": {},
+        "adjGraph": {},
+        "layouts": {},
+        "layoutProgress": {},
+        "solverStatus": "",
+        "failedComponents": [],
+    }
+
+
+def escape_pointer(key):
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def json_patch(old, new, path=""):
+    """
+    RFC 6902 operations that turn old into new. Dicts are compared key by key,
+    anything else is replaced whole when it differs.
+    """
+    if not (isinstance(old, dict) and isinstance(new, dict)):
+        return [] if old == new else [{"op": "replace", "path": path, "value": new}]
+    ops = [
+        {"op": "remove", "path": f"{path}/{escape_pointer(key)}"}
+        for key in old
+        if key not in new
+    ]
+    for key, value in new.items():
+        pointer = f"{path}/{escape_pointer(key)}"
+        if key not in old:
+            ops.append({"op": "add", "path": pointer, "value": value})
+        else:
+            ops.extend(json_patch(old[key], value, pointer))
+    return ops
+
+
+def inline_image(value):
+    """(mimetype, bytes) of an inline image, or None for anything else."""
+    if not isinstance(value, str):
+        return None
+    if value.startswith("data:image/"):
+        header, _, data = value.partition(",")
+        if not header.endswith(";base64"):
+            return None
+        mimetype = header[len("data:") : -len(";base64")]
+    elif value.startswith(PNG_BASE64_PREFIX):
+        mimetype, data = "image/png", value
+    else:
+        return None
+    try:
+        return mimetype, base64.b64decode(data, validate=True)
+    except binascii.Error:
+        return None
+
+
+def sse_event(event, data, version=None):
+    """One Server-Sent Event; data is already JSON text."""
+    lines = [f"event: {event}"]
+    if version is not None:
+        lines.append(f"id: {version}")
+    lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
+
+
+class Job:
+    """One /setquery submission with its own build state."""
+
+    def __init__(self, components, context):
+        self.id = uuid.uuid4().hex
+        self.components = components
+        self.context = context
+        # Ready before the job is queued, so a status request never sees a
+        # missing or stale state
+        self.state = new_build_state("queued")
+        # Held while the state's dicts gain or lose keys, and while serving it
+        self.lock = threading.Lock()
+        # Notified on every publish and when the job finishes
+        self.changed = threading.Condition(self.lock)
+        self.created = time.time()
+        self.finished = None
+        # The state as of the last publish, never mutated, and the patches
+        # (version, JSON text) that led to it
+        self.version = 0
+        self.published = json.loads(json.dumps(self.state))
+        self.patches = deque(maxlen=MAX_PATCH_HISTORY)
+        # Images taken out of the published state, by SHA-256
+        self.images = {}
+        # Encoded /buildstatus bodies for the current version
+        self.bodies = {}
+
+    def image_url(self, value):
+        """Store an inline image and return its URL; other values pass through."""
+        image = inline_image(value)
+        if image is None:
+            return value
+        digest = hashlib.sha256(image[1]).hexdigest()
+        self.images[digest] = image
+        return f"{PUBLIC_URL}/buildimage/{self.id}/{digest}"
+
+    def without_images(self, state):
+        for key in IMAGE_KEYS:
+            if isinstance(state.get(key), dict):
+                state[key] = {k: self.image_url(v) for k, v in state[key].items()}
+            elif key in state:
+                state[key] = self.image_url(state[key])
+        return state
+
+    def publish(self):
+        """
+        Record what changed in the state since the last publish as one patch.
+        Called after each pipeline step; the diff is computed and serialized
+        once here, however many clients are streaming.
+        """
+        with self.lock:
+            current = self.without_images(json.loads(json.dumps(self.state)))
+            patch = json_patch(self.published, current)
+            if not patch:
+                return
+            self.published = current
+            self.version += 1
+            keys = {op["path"].split("/")[1] for op in patch}
+            self.patches.append((self.version, json.dumps(patch), keys))
+            self.bodies = {}
+            self.changed.notify_all()
+
+    def finish(self):
+        self.publish()
+        with self.lock:
+            self.finished = time.time()
+            self.changed.notify_all()
+
+    def covers(self, version):
+        """Whether the patch history can bring a client at version up to date."""
+        return version is not None and (
+            version == self.version
+            or bool(self.patches)
+            and self.patches[0][0] <= version + 1 <= self.version
+        )
+
+    def changed_keys(self, since):
+        """Top-level keys changed after version since; all of them if unknown."""
+        if not self.covers(since):
+            return set(self.published)
+        return {key for v, _, keys in self.patches if v > since for key in keys}
+
+    def events(self, last_version=None):
+        """
+        Server-Sent Events for this job: a snapshot (unless last_version can
+        still be patched up to date), one patch event per publish, and an end
+        event once the job has finished.
+        """
+        version = last_version
+        while True:
+            pending = None
+            with self.lock:
+                if self.covers(version):
+                    self.changed.wait_for(
+                        lambda: self.version > version or self.finished is not None,
+                        HEARTBEAT_INTERVAL,
+                    )
+                if self.covers(version):
+                    pending = [
+                        (v, patch) for v, patch, _ in self.patches if v > version
+                    ]
+                else:
+                    # New stream, or one that fell behind the history
+                    version, state = self.version, self.published
+                end = self.finished is not None and (
+                    (pending[-1][0] if pending else version) == self.version
+                )
+
+            if pending is None:
+                data = json.dumps({"version": version, "state": state})
+                yield sse_event("snapshot", data, version)
+            elif pending:
+                for version, patch in pending:
+                    yield sse_event("patch", patch, version)
+            elif not end:
+                yield ": keep-alive\n\n"
+            if end:
+                yield sse_event("end", json.dumps({"version": version}), version)
+                return
+
+
+class JobManager:
+    """Runs pipelines on a bounded thread pool and keeps their jobs by ID."""
+
+    def __init__(self, max_workers, max_finished):
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="pipeline")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        # The job whose layout stage is running; the layout posts its
+        # progress without knowing which job it belongs to
+        self.layout_job = None
+
+    def submit(self, components, context):
+        job = Job(components, context)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def latest(self):
+        with self._lock:
+            return next(reversed(self._jobs.values()), None)
+
+    def _run(self, job):
+        job.state["status"] = "starting pipeline..."
+        job.publish()
+        try:
+            run_pipeline(job)
+            job.state["status"] = "done"
+        except Exception as e:
+            traceback.print_exc()
+            job.state["status"] = f"failed: {e}"
+        finally:
+            job.finish()
+            self._prune()
+
+    def _prune(self):
+        with self._lock:
+            finished = [j for j in self._jobs.values() if j.finished is not None]
+            for job in finished[: max(0, len(finished) - self.max_finished)]:
+                del self._jobs[job.id]
+
+
+JOBS = JobManager(MAX_CONCURRENT_JOBS, MAX_FINISHED_JOBS)
+# massive.run keeps its netlist in module globals and reads adjacency_<i>.json
+# from the working directory, and layout/autoroute drive the one KiCad window,
+# so those stages run one job at a time
+NETLIST_LOCK = threading.Lock()
+DESKTOP_LOCK = threading.Lock()
+
+
+def new_session():
+    """
+    One pooled, keep-alive session for all outgoing requests. Idempotent
+    requests are retried with exponential backoff on connection errors and
+    on 429 and 5xx responses.
+    """
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=HOST_CONCURRENCY)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+SESSION = new_session()
+FETCH_POOL = ThreadPoolExecutor(FETCH_WORKERS, thread_name_prefix="fetch")
+HOST_SLOTS = {}
+HOST_SLOTS_LOCK = threading.Lock()
+
+
+def fetch(method, url, **kwargs):
+    """A request on the shared session, waiting for one of its host's slots."""
+    host = urlparse(url).netloc
+    with HOST_SLOTS_LOCK:
+        slot = HOST_SLOTS.setdefault(host, threading.BoundedSemaphore(HOST_CONCURRENCY))
+    kwargs.setdefault("timeout", HTTP_TIMEOUT)
+    with slot:
+        return SESSION.request(method, url, **kwargs)
 
 
 def lcsc_search(item):
+    """
+    Product ID of the first LCSC result for item, or None if the search
+    fails, so one part can't fail the lookups of the others.
+    """
+    try:
+        return first_search_result(item)
+    except Exception as e:
+        print(f"LCSC search for {item!r} failed: {e}")
+        return None
+
+
+def first_search_result(item):
     search_url = f"{API_URL}/search?q={item}"
-    response = requests.get(search_url, headers=HEADERS)
+    response = fetch("GET", search_url)
     if response.status_code != 200:
-        return None
+        raise ValueError(
+            f"LCSC search for {item!r} failed: HTTP {response.status_code}"
+        )
 
     soup = BeautifulSoup(response.text, "html.parser")
 
@@ -119,9 +444,13 @@ def lcsc_search(item):
 
 
 def download_image(product_ID):
+    path = f"../frontend/wirehead/public/component_img/{product_ID}.jpg"
+    if os.path.exists(path):
+        print(f"Image for {product_ID} already exists, skipping download.")
+        return
     url = f"https://www.lcsc.com/product-image/{product_ID}.html"
 
-    response = requests.get(url, headers=HEADERS)
+    response = fetch("GET", url)
     if response.status_code != 200:
         return None
 
@@ -136,102 +465,122 @@ def download_image(product_ID):
     print(image_link)
 
     # download the image from the image link
-    image_response = requests.get(image_link, headers=HEADERS)
-    with open(f"../frontend/wirehead/public/component_img/{product_ID}.jpg", "wb") as f:
+    image_response = fetch("GET", image_link)
+    with open(path, "wb") as f:
         f.write(image_response.content)
     print("Image", product_ID, "downloaded!")
 
 
-def run_pipeline(components, context):
-    global BUILD_STATE
-    BUILD_STATE["status"] = "searching components..."
-    names = [lcsc_search(comp) for comp in components if comp.strip() != ""]
+def parse_datasheet(product_ID):
+    """
+    The part's structured adjacency JSON (text) and image path; parsed
+    datasheets are cached per part in <product ID>.json.
+    """
+    if os.path.exists(product_ID + ".json"):
+        with open(product_ID + ".json", "r", encoding="utf-8") as f:
+            return f.read(), f"component_img/{product_ID}.jpg"
+    r = fetch(
+        "POST",
+        AI_URL
+        + "?pdfUrl=https://wmsc.lcsc.com/wmsc/upload/file/pdf/v2/"
+        + product_ID
+        + ".pdf&part_name="
+        + product_ID,
+        timeout=(HTTP_TIMEOUT[0], 300),
+    )
+    print("Status:", r.status_code)
+    body = r.json()
+    structured = body.get("structured")
+    with open(product_ID + ".json", "w", encoding="utf-8") as f:
+        f.write(structured)
+    return structured, f"/{product_ID}.jpg"
 
-    for name in names:
-        if os.path.exists("../frontend/wirehead/public/component_img/" + name + ".jpg"):
-            print(f"Image for {name} already exists, skipping download.")
-            continue
-        download_image(name)
 
-    for i in range(len(names)):
-        BUILD_STATE["status"] = f"processing component {i+1}/{len(names)}..."
-        if os.path.exists(names[i] + ".json"):
-            with open(names[i] + ".json", "r", encoding="utf-8") as f:
-                with open("adjacency_" + str(i) + ".json", "w", encoding="utf-8") as f2:
-                    adjacency_str = f.read()
-                    adjacency = json.loads(adjacency_str)
-                    f2.write(adjacency_str)
-            aux = adjacency["auxiliary_components"]
-            BUILD_STATE["components"][components[i]] = {
-                "name": components[i],
-                "description": "",
-                "img": f"component_img/{names[i]}.jpg",
-                "submodules": {
-                    c: {
-                        "name": f"{aux[c]['value']} {aux[c]['type']}",
-                        "description": c,
-                        "img": {
-                            "resistor": "component_img/C98220.jpg",
-                            "capacitor": "component_img/C602037.jpg",
-                            "inductor": "component_img/C502009.jpg",
-                            "diode": "component_img/C232841.jpg",
-                            "crystal": "component_img/C13738.jpg",
-                        }[aux[c]["type"]],
-                    }
-                    for c in aux
-                },
+def component_entry(name, adjacency, img):
+    aux = adjacency["auxiliary_components"]
+    entry = {
+        "name": name,
+        "description": "",
+        "img": img,
+        "submodules": {
+            c: {
+                "name": f"{aux[c]['value']} {aux[c]['type']}",
+                "description": c,
+                "img": {
+                    "resistor": "component_img/C98220.jpg",
+                    "capacitor": "component_img/C602037.jpg",
+                    "inductor": "component_img/C502009.jpg",
+                    "diode": "component_img/C232841.jpg",
+                    "crystal": "component_img/C13738.jpg",
+                }.get(aux[c]["type"], "/component.jpg"),
             }
-            if aux:
-                BUILD_STATE["components"][components[i]]["subgraph"] = {
-                    c:[] for c in aux
-                }
-            continue
-        else:
-            r = requests.post(
-                AI_URL
-                + "?pdfUrl=https://wmsc.lcsc.com/wmsc/upload/file/pdf/v2/"
-                + names[i]
-                + ".pdf&part_name="
-                + names[i],
-                timeout=300,
-            )
-            print("Status:", r.status_code)
-            body = r.json()
-            structured = body.get("structured")
+            for c in aux
+        },
+    }
+    if aux:
+        entry["subgraph"] = {c: [] for c in aux}
+    return entry
+
+
+def run_pipeline(job):
+    state = job.state
+    components = [comp for comp in job.components if comp.strip() != ""]
+    state["status"] = "searching components..."
+    job.publish()
+    names = list(FETCH_POOL.map(lcsc_search, components))
+    # Parts that weren't found are reported and left out of the build
+    failed = [comp for comp, name in zip(components, names) if name is None]
+    if failed:
+        with job.lock:
+            state["failedComponents"] = failed
+        components = [comp for comp, name in zip(components, names) if name]
+        names = [name for name in names if name]
+
+    state["status"] = "downloading images and datasheets..."
+    job.publish()
+    # Every part's requests at once, each part once however often it's listed
+    images = {name: FETCH_POOL.submit(download_image, name) for name in names}
+    datasheets = {name: FETCH_POOL.submit(parse_datasheet, name) for name in names}
+
+    adjacencies = []
+    for i in range(len(names)):
+        state["status"] = f"processing component {i+1}/{len(names)}..."
+        job.publish()
+        structured, img = datasheets[names[i]].result()
+        images[names[i]].result()
+        adjacencies.append(structured)
+        entry = component_entry(components[i], json.loads(structured), img)
+        with job.lock:
+            state["components"][components[i]] = entry
+        job.publish()
+
+    with NETLIST_LOCK:
+        for i, structured in enumerate(adjacencies):
             with open("adjacency_" + str(i) + ".json", "w", encoding="utf-8") as f:
                 f.write(structured)
-            with open(names[i] + ".json", "w", encoding="utf-8") as f2:
-                f2.write(structured)
-            f.close()
-            f2.close()
-            adjacency = json.loads(structured)
-            aux = adjacency["auxiliary_components"]
-            BUILD_STATE["components"][components[i]] = {
-                "name": components[i],
-                "description": "",
-                "img": f"/{names[i]}.jpg",
-                "submodules": {
-                    c: {
-                        "name": f"{aux[c]['value']} {aux[c]['type']}",
-                        "description": c,
-                    }
-                    for c in aux
-                }
-            }
+        for _, complete in massive.run(state, len(names), components):
+            job.publish()
 
-    for (state, complete) in massive.run(BUILD_STATE, len(names), components):
-        BUILD_STATE = state
+    state["status"] = "waiting for the layout..."
+    job.publish()
+    with DESKTOP_LOCK:
+        JOBS.layout_job = job
+        try:
+            state["status"] = "laying out the board..."
+            job.publish()
+            # for (state, complete) in layout.run(BUILD_STATE, len(names), components):
+            #     BUILD_STATE = state
+            layout.run()
 
-    # for (state, complete) in layout.run(BUILD_STATE, len(names), components):
-    #     BUILD_STATE = state
-    layout.run()
-
-    autoroute.run()
+            state["status"] = "routing..."
+            job.publish()
+            autoroute.run()
+        finally:
+            JOBS.layout_job = None
 
 
 @app.route("/setquery", methods=["POST"])
 def set_query():
-    global BUILD_STATE
     print("Received build request")
     data = request.json
     components = data.get("components", [])
@@ -239,25 +588,141 @@ def set_query():
     print("Received components:", components)
     print("Received context:", context)
 
-    # launch thread
-    thread = Thread(target=run_pipeline, args=(components, context))
-    thread.daemon = True
-    thread.start()
-    BUILD_STATE = {
-        "status": "starting pipeline...",
-        "components": {},
-        "adjGraph": {},
-        "layouts": {},
-    }
-    
-    return jsonify({"status": "success", "message": "Query received"}), 200
+    job = JOBS.submit(components, context)
+    print("Queued job", job.id)
+
+    return (
+        jsonify({"status": "success", "message": "Query received", "job_id": job.id}),
+        200,
+    )
+
+
+@app.route("/layoutprogress", methods=["POST"])
+@app.route("/layoutprogress/<job_id>", methods=["POST"])
+def layout_progress(job_id=None):
+    """Latest improved solution of one pack, posted by pcb/generate.py."""
+    job = JOBS.get(job_id) if job_id else JOBS.layout_job or JOBS.latest()
+    if job is None:
+        return jsonify({"status": "error", "message": "No such job"}), 404
+    data = request.json
+    name = data.get("name", "layout")
+    with job.lock:
+        job.state["layoutProgress"][name] = {
+            "objective": data.get("objective"),
+            "bound": data.get("bound"),
+            "gap": data.get("gap"),
+            "elapsed": data.get("elapsed"),
+        }
+        job.state["solverStatus"] = (
+            f"{name}: objective {data.get('objective', 0):.0f}, "
+            f"gap {data.get('gap', 0):.1%} after {data.get('elapsed', 0):.1f}s"
+        )
+    job.publish()
+    return jsonify({"status": "success"}), 200
+
+
+def status_response(job):
+    """
+    A job's published state, or with ?since=<version> only the top-level
+    keys changed after that version (and those removed since). Carries an
+    ETag per version (answered with 304) and is gzip or brotli encoded when
+    the client accepts it.
+    """
+    since = request.args.get("since", type=int)
+    with job.lock:
+        version = job.version
+        etag = f"{job.id}-{version}" + ("" if since is None else f"-{since}")
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+            response.set_etag(etag, weak=True)
+            return response
+
+        encodings = ["br", "gzip"] if brotli is not None else ["gzip"]
+        encoding = request.accept_encodings.best_match(encodings)
+        # Every poller at this version shares one serialized, encoded body
+        key = (since, encoding)
+        if key not in job.bodies:
+            if since is None:
+                body = json.dumps(job.published)
+            else:
+                keys = job.changed_keys(since)
+                changed = {k: job.published[k] for k in keys if k in job.published}
+                # Keys deleted since then are listed so the client drops them
+                removed = sorted(keys - job.published.keys())
+                body = json.dumps(
+                    {
+                        "job": job.id,
+                        "version": version,
+                        "changed": changed,
+                        "removed": removed,
+                    }
+                )
+            body = body.encode("utf-8")
+            if encoding is not None and len(body) >= MIN_COMPRESS_SIZE:
+                body = (
+                    brotli.compress(body) if encoding == "br" else gzip.compress(body)
+                )
+            else:
+                encoding = None
+            job.bodies[key] = (body, encoding)
+        body, encoding = job.bodies[key]
+
+    response = Response(body, mimetype="application/json")
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    # Revalidate with the ETag before every reuse
+    response.headers["Cache-Control"] = "no-cache"
+    response.set_etag(etag, weak=True)
+    return response
+
+
+@app.route("/buildstatus/<job_id>", methods=["GET"])
+def build_status(job_id):
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "No such job"}), 404
+    return status_response(job)
+
+
+@app.route("/buildimage/<job_id>/<digest>", methods=["GET"])
+def build_image(job_id, digest):
+    """Layout images from build states; the URL changes when the image does."""
+    job = JOBS.get(job_id)
+    image = job.images.get(digest) if job is not None else None
+    if image is None:
+        return jsonify({"status": "error", "message": "No such image"}), 404
+    mimetype, data = image
+    response = Response(data, mimetype=mimetype)
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    response.set_etag(digest)
+    return response.make_conditional(request)
+
+
+@app.route("/buildevents/<job_id>", methods=["GET"])
+def build_events(job_id):
+    """Build state as a stream: a snapshot, then JSON patches as it changes."""
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "No such job"}), 404
+    # EventSource sends the id of the last event it saw when it reconnects
+    last_id = request.headers.get("Last-Event-ID", "")
+    last_version = int(last_id) if last_id.isdigit() else None
+    return Response(
+        stream_with_context(job.events(last_version)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.route("/buildstatus", methods=["GET"])
-def build_status():
-    global BUILD_STATE
-    return jsonify(BUILD_STATE), 200
+def latest_build_status():
+    """The most recent job's state, for clients without a job ID."""
+    job = JOBS.latest()
+    if job is None:
+        return jsonify(new_build_state("idle")), 200
+    return status_response(job)
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8000)
+    app.run(host="0.0.0.0", port=8000, threaded=True)
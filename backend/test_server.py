@@ -0,0 +1,116 @@
+"""
+/buildstatus and /buildevents on a job driven by hand: ETags, ?since= deltas
+and SSE patches (python -m pytest backend).
+
+server.py pulls in the whole pipeline (skidl, the desktop automation), so this
+is skipped where that can't be imported.
+"""
+
+import gzip
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+server = pytest.importorskip("server")
+
+
+@pytest.fixture
+def job():
+    job = server.Job(["stm32f103"], "")
+    with server.JOBS._lock:
+        server.JOBS._jobs[job.id] = job
+    yield job
+    with server.JOBS._lock:
+        server.JOBS._jobs.pop(job.id, None)
+
+
+@pytest.fixture
+def client():
+    return server.app.test_client()
+
+
+def publish(job, **changes):
+    job.state.update(changes)
+    job.publish()
+    return job.version
+
+
+def events(response):
+    """(event, data) of every event in an SSE body."""
+    parsed = []
+    for block in response.get_data(as_text=True).split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        if "event" in lines:
+            parsed.append((lines["event"], json.loads(lines["data"])))
+    return parsed
+
+
+def test_etag_answers_304_until_the_next_publish(job, client):
+    publish(job, status="searching components...")
+    first = client.get(f"/buildstatus/{job.id}")
+    assert first.status_code == 200
+    assert first.json["status"] == "searching components..."
+
+    etag = first.headers["ETag"]
+    cached = client.get(f"/buildstatus/{job.id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and not cached.data
+
+    publish(job, status="done")
+    fresh = client.get(f"/buildstatus/{job.id}", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200 and fresh.headers["ETag"] != etag
+
+
+def test_since_sends_only_changed_keys(job, client):
+    since = publish(job, status="searching components...")
+    publish(job, status="done", adjGraph={"stm32f103": []})
+
+    delta = client.get(f"/buildstatus/{job.id}?since={since}").json
+    assert delta["version"] == job.version
+    assert delta["changed"] == {"status": "done", "adjGraph": {"stm32f103": []}}
+    assert delta["removed"] == []
+
+    current = client.get(f"/buildstatus/{job.id}?since={job.version}").json
+    assert current["changed"] == {}
+
+
+def test_since_lists_removed_keys(job, client):
+    since = publish(job, status="searching components...")
+    del job.state["layoutProgress"]
+    job.publish()
+
+    response = client.get(f"/buildstatus/{job.id}?since={since}")
+    assert response.status_code == 200
+    assert response.json["removed"] == ["layoutProgress"]
+    assert "layoutProgress" not in response.json["changed"]
+
+
+def test_since_outside_the_history_sends_everything(job, client):
+    publish(job, status="done")
+    delta = client.get(f"/buildstatus/{job.id}?since=-5").json
+    assert set(delta["changed"]) == set(job.published)
+
+
+def test_large_bodies_are_gzipped(job, client):
+    publish(job, adjGraph={f"part{i}": ["stm32f103"] for i in range(200)})
+    response = client.get(f"/buildstatus/{job.id}", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(response.data)) == job.published
+
+
+def test_events_stream_a_snapshot_then_patches(job, client):
+    first = publish(job, status="searching components...")
+    publish(job, status="done")
+    job.finish()
+
+    snapshot = events(client.get(f"/buildevents/{job.id}"))
+    assert [name for name, _ in snapshot] == ["snapshot", "end"]
+    assert snapshot[0][1]["state"] == job.published
+
+    resumed = events(
+        client.get(f"/buildevents/{job.id}", headers={"Last-Event-ID": str(first)})
+    )
+    assert [name for name, _ in resumed] == ["patch", "end"]
+    assert resumed[0][1] == [{"op": "replace", "path": "/status", "value": "done"}]
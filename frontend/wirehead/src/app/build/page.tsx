@@ -2,6 +2,32 @@
 import React, { useState, useRef, useEffect } from "react";
 import * as d3 from "d3";
 
+function unescapePointer(key: string) {
+  return key.replace(/~1/g, "/").replace(/~0/g, "~");
+}
+
+// Apply RFC 6902 add/replace/remove operations from /buildevents, copying the
+// objects along each path so React sees new references only where it changed
+function applyPatch(doc: any, patch: any[]) {
+  for (const op of patch) {
+    const keys = op.path.split("/").slice(1).map(unescapePointer);
+    if (keys.length === 0) {
+      doc = op.value;
+      continue;
+    }
+    doc = { ...doc };
+    let target = doc;
+    for (const key of keys.slice(0, -1)) {
+      target[key] = { ...target[key] };
+      target = target[key];
+    }
+    const last = keys[keys.length - 1];
+    if (op.op === "remove") delete target[last];
+    else target[last] = op.value;
+  }
+  return doc;
+}
+
 export default function Home() {
   const [fullscreen, setFullscreen] = useState(false);
   const [components, setComponents] = useState<any>({});
@@ -11,29 +37,45 @@ export default function Home() {
   const [finalPcbLayout, setFinalPcbLayout] = useState<any>({});
   const [schematic, setSchematic] = useState<any>("");
   const [solverStatus, setSolverStatus] = useState<string>("");
-  // Poll build status from backend
+  // Build status from backend: streamed for a job, polled otherwise
   useEffect(() => {
     let isMounted = true;
+    let state: any = {};
+    const show = (data: any, keys: string[]) => {
+      if (keys.includes("components")) setComponents(data.components || {});
+      if (keys.includes("adjGraph")) setAdjGraph(data.adjGraph || {});
+      if (keys.includes("status")) setBuildStatus(data.status || "");
+      if (keys.includes("layouts")) setPcbLayout(data.layouts || {});
+      if (keys.includes("fullLayout")) setFinalPcbLayout(data.fullLayout || null);
+      if (keys.includes("schematic")) setSchematic(data.schematic || null);
+      if (keys.includes("solverStatus")) setSolverStatus(data.solverStatus || "");
+    };
+    const allKeys = ["components", "adjGraph", "status", "layouts", "fullLayout", "schematic", "solverStatus"];
+
+    const jobId = new URLSearchParams(window.location.search).get("job");
+    if (jobId) {
+      const events = new EventSource(`http://localhost:8000/buildevents/${jobId}`);
+      events.addEventListener("snapshot", (e) => {
+        state = JSON.parse((e as MessageEvent).data).state;
+        show(state, allKeys);
+      });
+      events.addEventListener("patch", (e) => {
+        const patch = JSON.parse((e as MessageEvent).data);
+        state = applyPatch(state, patch);
+        show(state, patch.map((op: any) => unescapePointer(op.path.split("/")[1] ?? "")));
+      });
+      events.addEventListener("end", () => events.close());
+      return () => { events.close(); };
+    }
+
     const poll = async () => {
       try {
         const res = await fetch('http://localhost:8000/buildstatus');
         if (!res.ok) throw new Error('Failed to fetch build status');
         const data = await res.json();
-        console.log(data);
         if (isMounted) {
-          if (JSON.stringify(data.components) != JSON.stringify(components)) {
-            setComponents(data.components || {});
-          }
-          if (JSON.stringify(data.adjGraph) != JSON.stringify(adjGraph)) {
-            console.log(adjGraph);
-            console.log(JSON.stringify(data.adjGraph), JSON.stringify(adjGraph));
-            setAdjGraph(data.adjGraph);
-          }
-          setBuildStatus(data.status || "");
-          setPcbLayout(data.layouts || {});
-          setFinalPcbLayout(data.fullLayout || null);
-          setSchematic(data.schematic || null);
-          setSolverStatus(data.solverStatus || "");
+          show(data, allKeys.filter((key) => JSON.stringify(data[key]) != JSON.stringify(state[key])));
+          state = data;
         }
       } catch (err) {
         // Optionally handle error
@@ -42,7 +84,7 @@ export default function Home() {
     };
     poll();
     return () => { isMounted = false; };
-  }, [adjGraph, components]);
+  }, []);
   const graphRef = useRef(null);
   const graphContainerRef = useRef<HTMLDivElement>(null);
 
@@ -183,6 +225,9 @@ export default function Home() {
           <span className="w-2 h-2 rounded-full mr-5 bg-emerald-800 animate-ping"></span>
           <p className="uppercase tracking-widest font-mono text-emerald-800">status: {buildStatus}</p>
         </div>
+        {solverStatus && (
+          <p className="font-mono text-sm text-emerald-800 mb-5">layout: {solverStatus}</p>
+        )}
         <h2 className="text-2xl font-bold my-5 uppercase tracking-widest text-emerald-800 w-full">
           <img src="/component_selection.png" alt="Component Selection" className="h-15 mr-5 inline"/>
           Component Selection →</h2>
@@ -71,8 +71,8 @@ export default function Home() {
                   context: contextRef.current?.value || ""
                 }),
               }
-            ).then(() => {
-              window.location.href = "/build";
+            ).then((res) => res.json()).then((data) => {
+              window.location.href = `/build?job=${data.job_id}`;
             });
           }
         }
@@ -0,0 +1,328 @@
+"""
+Simulated annealing packer for groups too large for CP-SAT.
+
+Starts from the greedy skyline placement and only ever makes legal moves (no
+overlaps, edge-constrained rects stay on the side they start on), so whatever
+it holds when time runs out is a valid answer. The one exception is a greedy
+start that fixed rects push off an edge: the best placement kept is always one
+that meets every edge constraint, and if none is reached the annealer gives
+up. Overlap and cost are evaluated with NumPy over all rects, wires and nets at
+once, which keeps a move in the tens of microseconds for a few hundred
+rectangles.
+
+The cost is packing.evaluate's objective, the same as CP-SAT's: width + height
+of the bounding box plus weighted wire lengths and net half-perimeters.
+"""
+
+import math
+import time
+
+import numpy as np
+
+from packing.edges import EdgeConstraint, edge_constraint, side_options, start_side
+from packing.evaluate import PlacementProblem
+from packing.geometry import ROTATIONS, rotate_point
+from packing.greedy import pack_greedy
+from packing.options import SolverOptions
+
+# Moves per rect; the time limit in the options caps this as well
+_MOVES_PER_RECT = 60
+# Relative probabilities of each kind of move
+_P_SHIFT = 0.45
+_P_PULL = 0.2
+_P_SWAP = 0.2
+_P_SLIDE = 0.1
+_P_ROTATE = 0.05
+# Starting temperature as a fraction of the median uphill move, and the final
+# one as a fraction of the starting one
+_T_START = 0.05
+_T_END = 1e-3
+
+
+class _Problem(PlacementProblem):
+    """The problem as arrays, plus what the moves need."""
+
+    def __init__(self, rects, wires, sides, nets, rotations, fixed):
+        super().__init__(
+            rects,
+            wires,
+            [EdgeConstraint((side,)) if side is not None else None for side in sides],
+            nets,
+            rotations,
+            fixed,
+        )
+        # The side each edge constrained rect stays on, None for the others
+        self.side = sides
+        self.right = np.array([side == "right" for side in sides], dtype=bool)
+        self.top = np.array([side == "top" for side in sides], dtype=bool)
+
+        # Per rect, the (other rect, weight) pairs it is tied to, for pull moves
+        self.neighbours = [[] for _ in range(self.n)]
+        for s, d, weight in zip(self.src, self.dst, self.wire_weight):
+            self.neighbours[s].append((d, weight))
+            self.neighbours[d].append((s, weight))
+        ends = [*self.net_start[1:], len(self.net_members)]
+        for start, end, net_weight in zip(self.net_start, ends, self.net_weight):
+            refs = {i for i, _ in self.net_members[start:end]}
+            share = net_weight / (len(refs) - 1)
+            for i in refs:
+                self.neighbours[i].extend((j, share) for j in refs if j != i)
+
+    def cost(self, x, y, rot, w, h) -> float:
+        return float(self.objective(x, y, rot, w, h))
+
+    def overlaps(self, x, y, w, h, moved: list[int]) -> bool:
+        """Whether any of the moved rects overlaps any other rect."""
+        for i in moved:
+            hit = (
+                (x < x[i] + w[i]) & (x[i] < x + w) & (y < y[i] + h[i]) & (y[i] < y + h)
+            )
+            hit[i] = False
+            if hit.any():
+                return True
+        return False
+
+    def on_far_edges(self, x, y, w, h) -> bool:
+        """Whether the right and top rects are still flush with the bounding box."""
+        tolerance = 1e-6 * max((x + w).max(), (y + h).max(), 1.0)
+        right, top = x + w, y + h
+        return bool(
+            (right[self.right] >= right.max() - tolerance).all()
+            and (top[self.top] >= top.max() - tolerance).all()
+        )
+
+
+def pack_components_annealing(
+    rects: list[tuple[float, float]],
+    wires: list,
+    constraints: list,
+    options: SolverOptions | None = None,
+    nets: list | None = None,
+    rotations: list[tuple[int, ...]] | None = None,
+    fixed: list[tuple[float, float] | None] | None = None,
+) -> list[tuple[float, ...]]:
+    """
+    Heuristic drop-in for pack_components_general; same arguments and output.
+
+    Runs _MOVES_PER_RECT moves per rect or until options.max_time_in_seconds,
+    whichever comes first, seeded by options.random_seed.
+
+    Returns None if no placement it reached meets every edge constraint.
+    """
+    if len(constraints) != len(rects):
+        raise ValueError("Constraints must be the same length as rects")
+    if options is None:
+        options = SolverOptions()
+
+    n = len(rects)
+    rotations_given = rotations is not None
+    if rotations is None:
+        rotations = [(0,)] * n
+    elif len(rotations) != n:
+        raise ValueError("Rotations must be the same length as rects")
+    if fixed is None:
+        fixed = [None] * n
+    elif len(fixed) != n:
+        raise ValueError("Fixed must be the same length as rects")
+    rotations = [(0,) if p is not None else r for r, p in zip(rotations, fixed)]
+    if n == 0:
+        return [(0, 0)]
+
+    # Each edge constrained rect keeps the side the greedy placement gives it,
+    # and with it the rotations that face out from there
+    sides = [None] * n
+    for i, c in enumerate(constraints):
+        c = edge_constraint(c) if fixed[i] is None else None
+        if c is not None:
+            sides[i], _ = start_side(c, rotations[i])
+            rotations[i] = side_options(c, rotations[i])[sides[i]]
+
+    problem = _Problem(rects, wires, sides, nets or [], rotations, fixed)
+    # The constraints as given, on the frame of every rect (fixed ones too)
+    check = PlacementProblem(rects, wires, constraints, nets, rotations, fixed)
+    rng = np.random.default_rng(options.random_seed)
+
+    # Legal starting point
+    rot = np.array([k[0] if 0 not in k else 0 for k in problem.allowed], dtype=int)
+    sizes = [(problem.w[i, rot[i]], problem.h[i, rot[i]]) for i in range(n)]
+    greedy = pack_greedy(
+        sizes,
+        [
+            (
+                s,
+                d,
+                tuple(problem.src_pin[k, rot[s]]),
+                tuple(problem.dst_pin[k, rot[d]]),
+                wt,
+            )
+            for k, (s, d, wt) in enumerate(
+                zip(problem.src, problem.dst, problem.wire_weight)
+            )
+        ],
+        [EdgeConstraint((side,)) if side is not None else None for side in sides],
+        [
+            (
+                [
+                    (i, rotate_point(*loc, *rects[i], ROTATIONS[rot[i]]))
+                    for i, loc in members
+                ],
+                weight,
+            )
+            for members, weight in nets or []
+        ],
+        fixed,
+    )
+    x = np.array([p[0] for p in greedy.positions], dtype=float)
+    y = np.array([p[1] for p in greedy.positions], dtype=float)
+
+    w, h = problem.sizes(rot)
+    cost = problem.cost(x, y, rot, w, h)
+    movable = [i for i in range(n) if fixed[i] is None]
+    rotatable = [i for i in movable if len(problem.allowed[i]) > 1]
+    span = max(greedy.width, greedy.height)
+
+    def on_edges(x, y, rot, w, h) -> bool:
+        return not check.edge_violations(x, y, rot, w, h, 1e-6 * max(span, 1.0))
+
+    # Fixed rects can keep the greedy start off an edge; moving the edge rects
+    # snaps them back onto it
+    best = (cost, x, y, rot) if on_edges(x, y, rot, w, h) else None
+
+    def propose():
+        """A candidate (x, y, rot, w, h, moved) or None for a pointless move."""
+        nx, ny, nrot, nw, nh = x.copy(), y.copy(), rot, w, h
+        kind = rng.random() * (_P_SHIFT + _P_PULL + _P_SWAP + _P_SLIDE + _P_ROTATE)
+        i = movable[int(rng.integers(len(movable)))]
+
+        if kind < _P_SHIFT:
+            step = span * max(temperature_fraction, 0.02)
+            nx[i] += rng.normal(0, step)
+            ny[i] += rng.normal(0, step)
+            moved = [i]
+        elif kind < _P_SHIFT + _P_PULL:
+            # Towards the weighted centre of whatever the rect is wired to
+            if not problem.neighbours[i]:
+                return None
+            others = np.array([j for j, _ in problem.neighbours[i]])
+            weights = np.array([wt for _, wt in problem.neighbours[i]])
+            tx = weights @ (x + w / 2)[others] / weights.sum()
+            ty = weights @ (y + h / 2)[others] / weights.sum()
+            nx[i] = tx - w[i] / 2 + rng.normal(0, span * 0.02)
+            ny[i] = ty - h[i] / 2 + rng.normal(0, span * 0.02)
+            moved = [i]
+        elif kind < _P_SHIFT + _P_PULL + _P_SWAP:
+            j = movable[int(rng.integers(len(movable)))]
+            if i == j:
+                return None
+            nx[i], nx[j] = x[j], x[i]
+            ny[i], ny[j] = y[j], y[i]
+            moved = [i, j]
+        elif kind < _P_SHIFT + _P_PULL + _P_SWAP + _P_SLIDE:
+            # Drop the rect as far down, then left, as it goes
+            below = (x < x[i] + w[i]) & (x[i] < x + w) & (y + h <= y[i])
+            below[i] = False
+            ny[i] = (y + h)[below].max() if below.any() else 0.0
+            left = (y < ny[i] + h[i]) & (ny[i] < y + h) & (x + w <= x[i])
+            left[i] = False
+            nx[i] = (x + w)[left].max() if left.any() else 0.0
+            moved = [i]
+        else:
+            if not rotatable:
+                return None
+            i = rotatable[int(rng.integers(len(rotatable)))]
+            k = problem.allowed[i][int(rng.integers(len(problem.allowed[i])))]
+            if k == rot[i]:
+                return None
+            nrot, nw, nh = rot.copy(), w.copy(), h.copy()
+            nrot[i], nw[i], nh[i] = k, problem.w[i, k], problem.h[i, k]
+            # Rotate about the centre
+            nx[i] += (w[i] - nw[i]) / 2
+            ny[i] += (h[i] - nh[i]) / 2
+            moved = [i]
+
+        nx[moved] = np.maximum(nx[moved], 0.0)
+        ny[moved] = np.maximum(ny[moved], 0.0)
+        for k in moved:
+            side = problem.side[k]
+            if side == "left":
+                nx[k] = 0.0
+            elif side == "bottom":
+                ny[k] = 0.0
+            elif side in ("right", "top") and problem.n > 1:
+                # Flush with the far edge of everything else
+                near, size = (nx, nw) if side == "right" else (ny, nh)
+                near[k] = max(np.delete(near + size, k).max() - size[k], 0.0)
+        if not problem.on_far_edges(nx, ny, nw, nh):
+            return None
+        return nx, ny, nrot, nw, nh, moved
+
+    # Starting temperature from the typical size of an uphill move
+    temperature_fraction = 1.0
+    uphill = []
+    for _ in range(min(50, 5 * len(movable))):
+        candidate = propose()
+        if candidate is None:
+            continue
+        delta = problem.cost(*candidate[:5]) - cost
+        if delta > 0:
+            uphill.append(delta)
+    t_start = float(np.median(uphill)) * _T_START if uphill else 1.0
+
+    moves = _MOVES_PER_RECT * len(movable)
+    move = -1
+    start = time.monotonic()
+    accepted = 0
+    for move in range(moves):
+        progress = max(
+            move / moves,
+            (time.monotonic() - start) / max(options.max_time_in_seconds, 1e-3),
+        )
+        if progress >= 1:
+            break
+        temperature_fraction = _T_END**progress
+        temperature = t_start * temperature_fraction
+
+        candidate = propose()
+        if candidate is None:
+            continue
+        nx, ny, nrot, nw, nh, moved = candidate
+        if problem.overlaps(nx, ny, nw, nh, moved):
+            continue
+
+        new_cost = problem.cost(nx, ny, nrot, nw, nh)
+        delta = new_cost - cost
+        if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+            # Candidates are fresh arrays, so the state can simply be swapped
+            x, y, rot, w, h, cost = nx, ny, nrot, nw, nh, new_cost
+            accepted += 1
+            if (best is None or cost < best[0]) and on_edges(x, y, rot, w, h):
+                best = (cost, x, y, rot)
+
+    elapsed = time.monotonic() - start
+    if best is None:
+        print(
+            f"⚠️ Annealing: no placement on every edge after {move + 1} moves "
+            f"in {elapsed:.2f}s"
+        )
+        return None
+    cost, x, y, rot = best
+    print(
+        f"Annealing: {move + 1} moves, {accepted} accepted, cost {cost:.0f} in {elapsed:.2f}s"
+    )
+
+    # Bottom left at the origin, unless fixed rects pin the frame
+    if all(p is None for p in fixed):
+        x = x - x.min()
+        y = y - y.min()
+    w, h = problem.sizes(rot)
+    width = (x + w).max()
+    height = (y + h).max()
+
+    sol = []
+    for i in range(n):
+        if rotations_given:
+            sol.append((float(x[i]), float(y[i]), ROTATIONS[rot[i]]))
+        else:
+            sol.append((float(x[i]), float(y[i])))
+    sol.append((math.ceil(width), math.ceil(height)))
+    return sol
@@ -0,0 +1,278 @@
+"""
+Headless packing benchmark.
+
+Runs every engine and setting over seeded synthetic instances and the fixture
+problems in packing/fixtures (exported from real boards with
+pcb/generate.py's export_group_problems), and writes one row per run to JSON
+and/or CSV so solver changes can be compared against a baseline:
+
+    python -m packing.benchmark --sizes 8,16,32 --seeds 0,1,2 \\
+        --engines greedy,cpsat,anneal --time-limits 2,10 --json base.json
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import json
+import sys
+import time
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+
+from packing.edges import SIDES, EdgeConstraint, edge_constraint, start_side
+from packing.evaluate import PlacementProblem
+from packing.geometry import DEFAULT_GRID_STEP, rotate_point, rotated_size
+from packing.greedy import pack_greedy
+from packing.instances import (
+    SIZE_DISTRIBUTIONS,
+    Instance,
+    load_instances,
+    synthetic_instance,
+)
+from packing.rectangles import (
+    NetInfo,
+    SolverOptions,
+    WireInfo,
+    pack_components_general,
+)
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+# "greedy" is the skyline packer on its own, as a baseline for the others
+BENCHMARK_ENGINES = ("greedy", "cpsat", "anneal")
+
+
+@dataclass
+class BenchmarkResult:
+    instance: str
+    n_rects: int
+    engine: str
+    time_limit: float
+    num_workers: int
+    grid_step: float
+    coarse_grid_step: float | None
+    wall_time: float
+    # Wirelength (weighted) plus width plus height, the packer's cost in
+    # instance units, so every engine is scored the same way
+    objective: float
+    # Relative gap CP-SAT proved for its own objective; None for the others
+    gap: float | None
+    width: float
+    height: float
+    efficiency: float  # Rect area over bounding box area
+    wirelength: float  # Manhattan wires plus net half-perimeters, unweighted
+    overlaps: int
+    edge_violations: int
+
+
+def evaluate(instance: Instance, positions: list) -> dict:
+    """Score packer output (positions, optionally followed by the size)."""
+    scores = PlacementProblem.from_instance(instance).score_positions(positions)
+    return {
+        "objective": float(scores.objective),
+        "width": float(scores.width),
+        "height": float(scores.height),
+        "efficiency": float(scores.efficiency),
+        "wirelength": float(scores.wirelength),
+        "overlaps": int(scores.overlaps),
+        "edge_violations": int(scores.edge_violations),
+    }
+
+
+def run_engine(instance: Instance, engine: str, options: SolverOptions):
+    """Pack once; returns (positions, gap)."""
+    if engine == "greedy":
+        # Rotated as the other engines start: unrotated, unless an edge rect
+        # has to face out
+        angles = [0] * len(instance.rects)
+        sides = [None] * len(instance.rects)
+        for i, c in enumerate(map(edge_constraint, instance.constraints)):
+            if c is not None:
+                allowed = instance.rotations[i] if instance.rotations else (0,)
+                side, angles[i] = start_side(c, allowed)
+                sides[i] = EdgeConstraint((side,))
+
+        def pin(i, location):
+            return rotate_point(*location, *instance.rects[i], angles[i])
+
+        greedy = pack_greedy(
+            [rotated_size(*r, a) for r, a in zip(instance.rects, angles)],
+            [
+                (s, d, pin(s, loc_s), pin(d, loc_d), w)
+                for s, d, loc_s, loc_d, w in instance.wires
+            ],
+            sides,
+            [([(i, pin(i, loc)) for i, loc in m], w) for m, w in instance.nets],
+        )
+        positions = [tuple(p) for p in greedy.positions]
+        if instance.rotations is not None:
+            positions = [(x, y, a) for (x, y), a in zip(positions, angles)]
+        return positions + [(greedy.width, greedy.height)], None
+
+    last = []
+    positions = pack_components_general(
+        instance.rects,
+        [WireInfo(*wire) for wire in instance.wires],
+        instance.constraints,
+        replace(options, engine=engine),
+        nets=[NetInfo(members, weight) for members, weight in instance.nets],
+        rotations=instance.rotations,
+        on_solution=last.append,
+    )
+    return positions, last[-1].gap if last else None
+
+
+def run_benchmark(
+    instances: list[Instance],
+    engines: list[str],
+    time_limits: list[float],
+    num_workers: int = 8,
+    grid_steps: list[float] = (DEFAULT_GRID_STEP,),
+    coarse_grid_steps: list[float | None] = (None,),
+    verbose: bool = True,
+) -> list[BenchmarkResult]:
+    """Every engine at every time limit and grid on every instance."""
+    results = []
+    for instance, engine, grid_step, coarse_grid_step in itertools.product(
+        instances, engines, grid_steps, coarse_grid_steps
+    ):
+        # Only CP-SAT has a coarse pass
+        if coarse_grid_step is not None and engine != "cpsat":
+            continue
+        # The greedy packer has no time limit to vary
+        for time_limit in time_limits if engine != "greedy" else [0.0]:
+            options = SolverOptions(
+                max_time_in_seconds=time_limit,
+                num_workers=num_workers,
+                grid_step=grid_step,
+                coarse_grid_step=coarse_grid_step,
+            )
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                positions, gap = run_engine(instance, engine, options)
+            wall_time = time.perf_counter() - start
+
+            result = BenchmarkResult(
+                instance=instance.name,
+                n_rects=len(instance.rects),
+                engine=engine,
+                time_limit=time_limit,
+                num_workers=num_workers,
+                grid_step=grid_step,
+                coarse_grid_step=coarse_grid_step,
+                wall_time=wall_time,
+                gap=gap,
+                **evaluate(instance, positions),
+            )
+            results.append(result)
+            if verbose:
+                illegal = result.overlaps or result.edge_violations
+                print(
+                    f"{instance.name:40} {engine:7} {time_limit:5g}s "
+                    f"grid {grid_step:<6g} "
+                    f"coarse {'-' if coarse_grid_step is None else f'{coarse_grid_step:g}':<6} "
+                    f"{wall_time:7.2f}s  objective {result.objective:12.0f}  "
+                    f"gap {'-' if gap is None else f'{gap:.3f}':>5}  "
+                    f"eff {result.efficiency:.2f}{'  ⚠️ ILLEGAL' if illegal else ''}"
+                )
+    return results
+
+
+def write_json(results: list[BenchmarkResult], path: str | Path) -> None:
+    Path(path).write_text(json.dumps([asdict(r) for r in results], indent=1))
+
+
+def write_csv(results: list[BenchmarkResult], path: str | Path) -> None:
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(
+            f, fieldnames=list(BenchmarkResult.__dataclass_fields__)
+        )
+        writer.writeheader()
+        for result in results:
+            writer.writerow(asdict(result))
+
+
+def _numbers(text: str, kind=int) -> list:
+    return [kind(part) for part in text.split(",") if part]
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="8,16,32", help="synthetic rect counts")
+    parser.add_argument("--seeds", default="0,1,2")
+    parser.add_argument(
+        "--size-distribution", default="uniform", choices=SIZE_DISTRIBUTIONS
+    )
+    parser.add_argument("--nets-per-rect", type=float, default=1.0)
+    parser.add_argument("--fanout", type=float, default=3.0)
+    parser.add_argument("--edge-ratio", type=float, default=0.0)
+    parser.add_argument(
+        "--sides-per-edge",
+        type=int,
+        default=len(SIDES),
+        help="allowed sides per edge rect (4 = any)",
+    )
+    parser.add_argument("--rotate", action="store_true")
+    parser.add_argument("--fixtures", default=str(FIXTURES_DIR))
+    parser.add_argument("--no-fixtures", action="store_true")
+    parser.add_argument("--engines", default=",".join(BENCHMARK_ENGINES))
+    parser.add_argument("--time-limits", default="5")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument(
+        "--grid-steps",
+        default=str(DEFAULT_GRID_STEP),
+        help="packer grids, in instance units (1000 = 1 um for KiCad nm)",
+    )
+    parser.add_argument(
+        "--coarse-grid-steps",
+        default="none",
+        help="CP-SAT coarse pass grids, 'none' for a single pass",
+    )
+    parser.add_argument("--json", help="write results to this JSON file")
+    parser.add_argument("--csv", help="write results to this CSV file")
+    args = parser.parse_args(argv)
+
+    engines = args.engines.split(",")
+    for engine in engines:
+        if engine not in BENCHMARK_ENGINES:
+            parser.error(f"unknown engine {engine!r}, expected {BENCHMARK_ENGINES}")
+
+    instances = [
+        synthetic_instance(
+            n,
+            seed,
+            args.size_distribution,
+            nets_per_rect=args.nets_per_rect,
+            fanout=args.fanout,
+            edge_ratio=args.edge_ratio,
+            rotate=args.rotate,
+            sides_per_edge=args.sides_per_edge,
+        )
+        for n in _numbers(args.sizes)
+        for seed in _numbers(args.seeds)
+    ]
+    if not args.no_fixtures and Path(args.fixtures).is_dir():
+        instances += load_instances(args.fixtures)
+
+    results = run_benchmark(
+        instances,
+        engines,
+        _numbers(args.time_limits, float),
+        args.workers,
+        _numbers(args.grid_steps, float),
+        [
+            None if step == "none" else float(step)
+            for step in args.coarse_grid_steps.split(",")
+        ],
+    )
+    if not results:
+        sys.exit("No instances to benchmark")
+    if args.json:
+        write_json(results, args.json)
+    if args.csv:
+        write_csv(results, args.csv)
+
+
+if __name__ == "__main__":
+    main()
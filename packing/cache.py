@@ -0,0 +1,264 @@
+"""
+Content-addressed cache of packing results.
+
+A problem is relabelled into a canonical order (rects sorted by size, edge sides,
+rotations and how they are wired), its sizes and pin locations are quantized,
+and the sha256 of the result is the key. Identical groups, such as the same
+decoupling network around two regulators, therefore hit the same entry even if
+their parts come in a different order.
+
+Entries live in an in-memory LRU and optionally in a directory of small JSON
+files; both are evicted oldest first once they exceed their size budget.
+"""
+
+import hashlib
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple
+
+from packing.edges import edge_key
+
+# Sizes and pins are rounded to this many input units (1 um for KiCad nm),
+# the same resolution the CP-SAT model works at
+_QUANTUM = 1000
+# Wire and net weights are resolved to quarter units, as in the CP-SAT objective
+_WEIGHT_STEPS = 4
+_MAX_MEMORY_BYTES = 16 * 1024 * 1024
+_MAX_DISK_BYTES = 256 * 1024 * 1024
+# Bump when the key or entry format changes so stale entries are never read
+_VERSION = 3
+
+
+class ProblemKey(NamedTuple):
+    digest: str
+    order: list[int]  # order[k] is the original index of canonical rect k
+
+
+def canonical_key(
+    rects: list,
+    wires: list,
+    constraints: list,
+    nets: list | None = None,
+    rotations: list | None = None,
+    quantum: float = _QUANTUM,
+    fixed: list | None = None,
+    grid_step: float | None = None,
+) -> ProblemKey:
+    """
+    Hash of the normalized problem and the relabelling that produced it.
+
+    grid_step is the packer grid the result was solved on, when known.
+    """
+    n = len(rects)
+    rotations = rotations or [(0,)] * n
+    fixed = fixed or [None] * n
+
+    def q(value):
+        return math.ceil(value / quantum - 1e-9)
+
+    def qp(point):
+        return (round(point[0] / quantum), round(point[1] / quantum))
+
+    def qw(weight):
+        return round(weight * _WEIGHT_STEPS)
+
+    own = [
+        # Fixed positions are kept exact: they come back unchanged in the result
+        (q(w), q(h), edge_key(c), tuple(sorted(r)), tuple(p) if p is not None else None)
+        for (w, h), c, r, p in zip(rects, constraints, rotations, fixed)
+    ]
+
+    # One round of neighbourhood refinement so equal-looking rects wired
+    # differently still sort apart
+    incident = [[] for _ in range(n)]
+    for source, dest, loc_source, loc_dest, *rest in wires:
+        weight = qw(rest[0] if rest else 1.0)
+        incident[source].append(("w", weight, qp(loc_source), qp(loc_dest), own[dest]))
+        incident[dest].append(("w", weight, qp(loc_dest), qp(loc_source), own[source]))
+    for members, weight in nets or []:
+        fanout = len(members)
+        for i, location in members:
+            incident[i].append(("n", qw(weight), qp(location), fanout))
+
+    signature = [(repr(own[i]), sorted(map(repr, incident[i]))) for i in range(n)]
+    order = sorted(range(n), key=lambda i: (signature[i], i))
+    rank = {original: k for k, original in enumerate(order)}
+
+    canonical_wires = []
+    for source, dest, loc_source, loc_dest, *rest in wires:
+        a, b = rank[source], rank[dest]
+        loc_a, loc_b = qp(loc_source), qp(loc_dest)
+        if a > b:
+            a, b, loc_a, loc_b = b, a, loc_b, loc_a
+        canonical_wires.append((a, b, loc_a, loc_b, qw(rest[0] if rest else 1.0)))
+
+    canonical_nets = [
+        (sorted((rank[i], qp(location)) for i, location in members), qw(weight))
+        for members, weight in nets or []
+    ]
+
+    problem = {
+        "version": _VERSION,
+        "quantum": quantum,
+        "grid": grid_step,
+        "rects": [own[i] for i in order],
+        "wires": sorted(canonical_wires),
+        "nets": sorted(canonical_nets),
+    }
+    digest = hashlib.sha256(
+        json.dumps(problem, separators=(",", ":")).encode()
+    ).hexdigest()
+    return ProblemKey(digest, order)
+
+
+def default_cache_dir() -> Path:
+    if "WIREHEAD_CACHE_DIR" in os.environ:
+        return Path(os.environ["WIREHEAD_CACHE_DIR"])
+    return Path.home() / ".cache" / "wirehead" / "placements"
+
+
+class PlacementCache:
+    """
+    Packer results keyed by canonical_key.
+
+    Values are packer output: one (x, y[, rotation]) per rect followed by the
+    final (width, height). Safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path | None = None,
+        max_memory_bytes: int = _MAX_MEMORY_BYTES,
+        max_disk_bytes: int = _MAX_DISK_BYTES,
+        quantum: float = _QUANTUM,
+    ):
+        self.directory = Path(directory) if directory is not None else None
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.quantum = quantum
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(
+        self,
+        rects,
+        wires,
+        constraints,
+        nets=None,
+        rotations=None,
+        fixed=None,
+        grid_step=None,
+    ) -> ProblemKey:
+        return canonical_key(
+            rects, wires, constraints, nets, rotations, self.quantum, fixed, grid_step
+        )
+
+    def get(self, key: ProblemKey) -> list | None:
+        """Cached packer output in the caller's rect order, or None."""
+        with self._lock:
+            entry = self._memory.get(key.digest)
+            if entry is not None:
+                self._memory.move_to_end(key.digest)
+            else:
+                entry = self._read_disk(key.digest)
+                if entry is not None:
+                    self._remember(key.digest, entry)
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        canonical = json.loads(entry)
+        if len(canonical["positions"]) != len(key.order):
+            return None
+        positions = [None] * len(key.order)
+        for k, original in enumerate(key.order):
+            positions[original] = tuple(canonical["positions"][k])
+        return positions + [tuple(canonical["size"])]
+
+    def put(self, key: ProblemKey, positions: list) -> None:
+        """Store packer output given in the caller's rect order."""
+        placed = positions[: len(key.order)]
+        entry = json.dumps(
+            {
+                "positions": [list(placed[original]) for original in key.order],
+                "size": list(positions[len(key.order)]),
+            }
+        )
+        with self._lock:
+            self._remember(key.digest, entry)
+            self._write_disk(key.digest, entry)
+
+    def _remember(self, digest: str, entry: str) -> None:
+        if digest in self._memory:
+            self._memory_bytes -= len(self._memory.pop(digest))
+        self._memory[digest] = entry
+        self._memory_bytes += len(entry)
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _path(self, digest: str) -> Path:
+        return self.directory / digest[:2] / f"{digest}.json"
+
+    def _read_disk(self, digest: str) -> str | None:
+        if self.directory is None:
+            return None
+        path = self._path(digest)
+        try:
+            entry = path.read_text()
+            os.utime(path)  # Reads count as use for eviction
+        except OSError:
+            return None
+        return entry
+
+    def _write_disk(self, digest: str, entry: str) -> None:
+        if self.directory is None:
+            return
+        path = self._path(digest)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(entry)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"⚠️ Could not write placement cache entry: {e}")
+            return
+        self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        files = []
+        total = 0
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self.directory is not None:
+                for path in self.directory.glob("*/*.json"):
+                    path.unlink(missing_ok=True)
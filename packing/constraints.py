@@ -1,8 +1,11 @@
+import json
 import os
 
 import anthropic
 from dotenv import load_dotenv
 
+from packing.edges import EdgeConstraint, edge_constraint
+
 load_dotenv()
 
 _PROMPT = """
@@ -20,26 +23,70 @@ Input:
 {part_names}
 """
 
+_SIDES_PROMPT = """
+You are an expert in PCB layout design. You are given a list of components for a layout
+and need to determine which components **must** be on the edge of the board, and on
+which sides. For example, USBs or things with antennas need to be on the edge.
 
-def get_constraints(part_names: list[str]) -> list[bool]:
+Sides are "left", "right", "top" and "bottom". For each component give:
+- false if it can go anywhere
+- true if it must be on the edge but any side will do
+- {{"sides": [...], "facing": null}} if only some sides will do
+- {{"sides": [...], "facing": "<side>"}} if one side of the part itself (as drawn,
+  unrotated) has to point out of the board, like a connector's opening; only when
+  the part name makes that side clear
+
+Output format:
+Always return a JSON list with one entry per component and NOTHING ELSE.
+
+Example: [{{"sides": ["left", "right"], "facing": "top"}}, false, true, false]
+
+Input:
+{part_names}
+"""
+
+
+def _ask(prompt: str, parse):
     client = anthropic.Anthropic(api_key=os.getenv("CLAUDE_API_KEY"))
     for _ in range(10):
         response = client.messages.create(
             model="claude-sonnet-4-20250514",
             max_tokens=1000,
-            messages=[
-                {"role": "user", "content": _PROMPT.format(part_names=part_names)}
-            ],
+            messages=[{"role": "user", "content": prompt}],
         )
         try:
-            return list(map(bool, eval(response.content[0].text)))
+            return parse(response.content[0].text)
         except Exception as e:
             print(f"Error: {e}; Trying again...")
             continue
     raise RuntimeError("Failed to get constraints")
 
 
-if __name__ == "__main__":
-    print(
-        get_constraints(["USB", "Antenna", "IC", "Connector", "Power Module", "Sensor"])
+def get_constraints(part_names: list[str]) -> list[bool]:
+    return _ask(
+        _PROMPT.format(part_names=part_names),
+        lambda text: list(map(bool, eval(text))),
     )
+
+
+def get_edge_constraints(part_names: list[str]) -> list[EdgeConstraint | None]:
+    """
+    Like get_constraints, but with the sides each part may take and the side
+    of it that must face out (see packing.edges); None where it can go anywhere.
+    """
+
+    def parse(text):
+        constraints = [edge_constraint(value) for value in json.loads(text)]
+        if len(constraints) != len(part_names):
+            raise ValueError(
+                f"Expected {len(part_names)} constraints, got {len(constraints)}"
+            )
+        return constraints
+
+    return _ask(_SIDES_PROMPT.format(part_names=part_names), parse)
+
+
+if __name__ == "__main__":
+    parts = ["USB", "Antenna", "IC", "Connector", "Power Module", "Sensor"]
+    print(get_constraints(parts))
+    print(get_edge_constraints(parts))
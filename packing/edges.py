@@ -0,0 +1,128 @@
+"""
+Edge constraints: which sides of the packing a rect may sit on, and which of
+its own sides (unrotated) has to face out from there, e.g. a USB connector's
+opening or an antenna's keep-out end.
+
+A constraints entry may be False/None (anywhere), True (any side), a side
+name, a list of side names, a dict {"sides": [...], "facing": side} or an
+EdgeConstraint; edge_constraint() turns any of these into one form.
+"""
+
+from typing import NamedTuple
+
+from packing.geometry import ROTATIONS
+
+# Counter-clockwise, so rotating by ROTATIONS[k] turns SIDES[i] into SIDES[i + k]
+SIDES = ("right", "top", "left", "bottom")
+# Sides tried first when a starting placement has to pick one
+_START_ORDER = ("bottom", "left", "right", "top")
+
+
+class EdgeConstraint(NamedTuple):
+    sides: tuple[str, ...] = SIDES
+    facing: str | None = None  # Side of the unrotated rect that must face out
+
+
+def edge_constraint(value) -> EdgeConstraint | None:
+    """Normalize a constraints entry; None when the rect may go anywhere."""
+    if value is None or value is False:
+        return None
+    if value is True:
+        return EdgeConstraint()
+    if isinstance(value, str):
+        constraint = EdgeConstraint((value,))
+    elif isinstance(value, dict):
+        constraint = EdgeConstraint(
+            tuple(value.get("sides") or SIDES), value.get("facing")
+        )
+    elif len(value) == 2 and not isinstance(value[0], str):
+        # An EdgeConstraint that went through JSON: [sides, facing]
+        constraint = EdgeConstraint(tuple(value[0] or SIDES), value[1])
+    else:
+        constraint = EdgeConstraint(tuple(value))
+
+    for side in (*constraint.sides, constraint.facing):
+        if side is not None and side not in SIDES:
+            raise ValueError(f"Unknown side {side!r}, expected one of {SIDES}")
+    if not constraint.sides:
+        raise ValueError("An edge constraint needs at least one side")
+    return constraint
+
+
+def edge_json(value) -> bool | dict:
+    """A constraints entry as plain JSON: a bool when that says it all."""
+    constraint = edge_constraint(value)
+    if constraint is None:
+        return False
+    if constraint.facing is None and set(constraint.sides) == set(SIDES):
+        return True
+    return {"sides": list(constraint.sides), "facing": constraint.facing}
+
+
+def edge_key(value) -> tuple | None:
+    """Hashable, order-independent form of a constraints entry."""
+    constraint = edge_constraint(value)
+    if constraint is None:
+        return None
+    return tuple(sorted(set(constraint.sides))), constraint.facing
+
+
+def facing_angle(facing: str, side: str) -> int:
+    """Counter-clockwise rotation that turns the facing side towards side."""
+    return ROTATIONS[(SIDES.index(side) - SIDES.index(facing)) % len(SIDES)]
+
+
+def side_options(
+    constraint: EdgeConstraint, allowed: tuple[int, ...]
+) -> dict[str, tuple[int, ...]]:
+    """The sides a rect can take with its allowed rotations, and those rotations."""
+    options = {}
+    for side in dict.fromkeys(constraint.sides):
+        if constraint.facing is None:
+            options[side] = tuple(allowed)
+        elif facing_angle(constraint.facing, side) in allowed:
+            options[side] = (facing_angle(constraint.facing, side),)
+    return options
+
+
+def preferred_side(sides) -> str:
+    """The side a starting placement puts a rect on, preferring the bottom."""
+    return next(side for side in _START_ORDER if side in sides)
+
+
+def start_side(constraint: EdgeConstraint, allowed: tuple[int, ...]) -> tuple[str, int]:
+    """Side and rotation for a starting placement, preferring the bottom."""
+    options = side_options(constraint, allowed)
+    if not options:
+        raise ValueError(
+            f"No allowed rotation {tuple(allowed)} faces {constraint.facing!r} "
+            f"out of any of the sides {constraint.sides}"
+        )
+    side = preferred_side(options)
+    angle = 0 if 0 in options[side] else options[side][0]
+    return side, angle
+
+
+def on_edge(
+    constraint: EdgeConstraint | None,
+    box: tuple[float, float, float, float],
+    angle: int,
+    width: float,
+    height: float,
+    tolerance: float = 0.0,
+) -> bool:
+    """
+    Whether a rect placed at box (x0, y0, x1, y1 in a packing whose bottom left
+    is the origin) satisfies its constraint.
+    """
+    if constraint is None:
+        return True
+    x0, y0, x1, y1 = box
+    gaps = {"left": x0, "bottom": y0, "right": width - x1, "top": height - y1}
+    return any(
+        abs(gaps[side]) <= tolerance
+        and (
+            constraint.facing is None or angle == facing_angle(constraint.facing, side)
+        )
+        for side in constraint.sides
+    )
@@ -0,0 +1,243 @@
+"""
+Vectorized placement scoring.
+
+PlacementProblem holds a packing problem as arrays (sizes and pin offsets at
+each of the four rotations, wire endpoints, net members), built once. Any
+number of candidate placements can then be scored together: positions and
+rotation indices come as (n,) arrays for one placement or (batch, n) for
+many, and every statistic comes back with the batch shape.
+
+The objective is the packers': bounding box width + height plus weighted wire
+lengths and net half-perimeters. The annealer, the placement cache check in
+pcb/generate.py and the benchmark all score with this module.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+from packing.edges import SIDES, edge_constraint, side_options
+from packing.geometry import ROTATIONS, rotate_point, rotated_size
+
+# Pairwise overlap tests are done this many rect pairs at a time
+_PAIR_CHUNK = 1 << 22
+
+
+class Scores(NamedTuple):
+    """Statistics per placement; leading dimensions are the batch shape."""
+
+    objective: np.ndarray
+    width: np.ndarray
+    height: np.ndarray
+    efficiency: np.ndarray  # Rect area over bounding box area
+    wirelength: np.ndarray  # Unweighted, wires and nets together
+    wire_lengths: np.ndarray  # (..., n_wires) Manhattan length of each wire
+    net_lengths: np.ndarray  # (..., n_nets) half-perimeter of each net
+    overlap_area: np.ndarray
+    overlaps: np.ndarray  # Rect pairs that overlap
+    edge_violations: np.ndarray
+
+    def legal(self) -> np.ndarray:
+        return (self.overlaps == 0) & (self.edge_violations == 0)
+
+
+class PlacementProblem:
+    """
+    Struct-of-arrays view of a packing problem, in pack_components_general's
+    input format. Fixed rects may overlap each other and have no edge
+    constraints.
+    """
+
+    def __init__(
+        self, rects, wires, constraints, nets=None, rotations=None, fixed=None
+    ):
+        n = len(rects)
+        self.n = n
+        rotations = rotations or [(0,)] * n
+        fixed = fixed or [None] * n
+        self.fixed = np.array([p is not None for p in fixed], dtype=bool)
+
+        # Size of each rect at each of the four rotations
+        self.w = np.zeros((n, len(ROTATIONS)))
+        self.h = np.zeros((n, len(ROTATIONS)))
+        for i, (w, h) in enumerate(rects):
+            for k, angle in enumerate(ROTATIONS):
+                self.w[i, k], self.h[i, k] = rotated_size(w, h, angle)
+        self.area = float(sum(w * h for w, h in rects))
+        self.allowed = [[ROTATIONS.index(a % 360) for a in r] for r in rotations]
+
+        def pins(i, location):
+            return [rotate_point(*location, *rects[i], angle) for angle in ROTATIONS]
+
+        self.src = np.array([w[0] for w in wires], dtype=int)
+        self.dst = np.array([w[1] for w in wires], dtype=int)
+        self.src_pin = np.array([pins(w[0], w[2]) for w in wires]).reshape(-1, 4, 2)
+        self.dst_pin = np.array([pins(w[1], w[3]) for w in wires]).reshape(-1, 4, 2)
+        self.wire_weight = np.array([w[4] if len(w) > 4 else 1.0 for w in wires])
+
+        # Nets flattened into one member list with segment starts for reduceat
+        members = []
+        starts = []
+        net_weight = []
+        for net_members, weight in nets or []:
+            if len({i for i, _ in net_members}) < 2:
+                continue
+            starts.append(len(members))
+            members.extend(net_members)
+            net_weight.append(weight)
+        self.net_members = members
+        self.net_rect = np.array([i for i, _ in members], dtype=int)
+        self.net_pin = np.array([pins(i, loc) for i, loc in members]).reshape(-1, 4, 2)
+        self.net_start = np.array(starts, dtype=int)
+        self.net_weight = np.array(net_weight)
+        self._wire_range = np.arange(len(self.src))
+        self._member_range = np.arange(len(self.net_rect))
+
+        # Edge constraints: per rect and side (in SIDES order) whether it may
+        # go there, and the rotation index it must then have (-1 for any)
+        self.edge = np.zeros(n, dtype=bool)
+        self.side_ok = np.zeros((n, len(SIDES)), dtype=bool)
+        self.side_rot = np.full((n, len(SIDES)), -1, dtype=int)
+        for i, c in enumerate(constraints):
+            c = edge_constraint(c) if fixed[i] is None else None
+            if c is None:
+                continue
+            self.edge[i] = True
+            for side in c.sides:
+                self.side_ok[i, SIDES.index(side)] = True
+            if c.facing is not None:
+                for side, angles in side_options(c, ROTATIONS).items():
+                    self.side_rot[i, SIDES.index(side)] = ROTATIONS.index(angles[0])
+
+    @classmethod
+    def from_instance(cls, instance) -> "PlacementProblem":
+        return cls(
+            instance.rects,
+            instance.wires,
+            instance.constraints,
+            instance.nets,
+            instance.rotations,
+        )
+
+    def sizes(self, rot: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Widths and heights of all rects at the given rotation indices."""
+        ar = np.arange(self.n)
+        return self.w[ar, rot], self.h[ar, rot]
+
+    def wire_lengths(self, x, y, rot) -> np.ndarray:
+        sp = self.src_pin[self._wire_range, rot[..., self.src]]
+        dp = self.dst_pin[self._wire_range, rot[..., self.dst]]
+        dx = x[..., self.src] + sp[..., 0] - x[..., self.dst] - dp[..., 0]
+        dy = y[..., self.src] + sp[..., 1] - y[..., self.dst] - dp[..., 1]
+        return np.abs(dx) + np.abs(dy)
+
+    def net_lengths(self, x, y, rot) -> np.ndarray:
+        if not len(self.net_start):
+            return np.zeros(x.shape[:-1] + (0,))
+        pin = self.net_pin[self._member_range, rot[..., self.net_rect]]
+        px = x[..., self.net_rect] + pin[..., 0]
+        py = y[..., self.net_rect] + pin[..., 1]
+        return (
+            np.maximum.reduceat(px, self.net_start, axis=-1)
+            - np.minimum.reduceat(px, self.net_start, axis=-1)
+            + np.maximum.reduceat(py, self.net_start, axis=-1)
+            - np.minimum.reduceat(py, self.net_start, axis=-1)
+        )
+
+    def objective(self, x, y, rot, w, h) -> np.ndarray:
+        """Packer objective; w and h are the rotated sizes (see sizes())."""
+        total = (
+            (x + w).max(axis=-1)
+            - x.min(axis=-1)
+            + (y + h).max(axis=-1)
+            - y.min(axis=-1)
+        )
+        if len(self.src):
+            total = total + self.wire_lengths(x, y, rot) @ self.wire_weight
+        if len(self.net_start):
+            total = total + self.net_lengths(x, y, rot) @ self.net_weight
+        return total
+
+    def overlap(self, x, y, w, h, tolerance: float = 0.0):
+        """Total overlap area and number of overlapping pairs per placement."""
+        first, second = np.triu_indices(self.n, 1)
+        keep = ~(self.fixed[first] & self.fixed[second])
+        first, second = first[keep], second[keep]
+
+        area = np.zeros(x.shape[:-1])
+        count = np.zeros(x.shape[:-1], dtype=int)
+        batch = max(1, int(np.prod(x.shape[:-1])))
+        step = max(1, _PAIR_CHUNK // batch)
+        for start in range(0, len(first), step):
+            a, b = first[start : start + step], second[start : start + step]
+            dx = np.minimum(x[..., a] + w[..., a], x[..., b] + w[..., b]) - np.maximum(
+                x[..., a], x[..., b]
+            )
+            dy = np.minimum(y[..., a] + h[..., a], y[..., b] + h[..., b]) - np.maximum(
+                y[..., a], y[..., b]
+            )
+            # Touching is fine; only a positive-area intersection counts
+            hit = (dx > tolerance) & (dy > tolerance)
+            area += np.where(hit, dx * dy, 0.0).sum(axis=-1)
+            count += hit.sum(axis=-1)
+        return area, count
+
+    def edge_violations(self, x, y, rot, w, h, tolerance: float = 0.0):
+        """Edge constrained rects on none of their sides (or facing wrong)."""
+        if not self.edge.any():
+            return np.zeros(x.shape[:-1], dtype=int)
+        left = x.min(axis=-1, keepdims=True)
+        bottom = y.min(axis=-1, keepdims=True)
+        right = (x + w).max(axis=-1, keepdims=True)
+        top = (y + h).max(axis=-1, keepdims=True)
+        # Distance to each side, in SIDES order
+        gaps = np.stack([right - x - w, top - y - h, x - left, y - bottom], axis=-1)
+        ok = (
+            self.side_ok
+            & (np.abs(gaps) <= tolerance)
+            & ((self.side_rot < 0) | (self.side_rot == rot[..., None]))
+        )
+        return (self.edge & ~ok.any(axis=-1)).sum(axis=-1)
+
+    def score(self, x, y, rot=None, tolerance: float | None = None) -> Scores:
+        """
+        Score placements: x, y (bottom lefts) and rot (rotation indices into
+        ROTATIONS, default unrotated) as (n,) or (batch, n) arrays.
+        tolerance defaults to a millionth of the largest bounding box side.
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        rot = np.zeros(x.shape, dtype=int) if rot is None else np.asarray(rot, int)
+        w, h = self.w[np.arange(self.n), rot], self.h[np.arange(self.n), rot]
+
+        width = (x + w).max(axis=-1) - x.min(axis=-1)
+        height = (y + h).max(axis=-1) - y.min(axis=-1)
+        if tolerance is None:
+            tolerance = 1e-6 * max(float(np.max(width)), float(np.max(height)), 1.0)
+
+        wire_lengths = self.wire_lengths(x, y, rot)
+        net_lengths = self.net_lengths(x, y, rot)
+        overlap_area, overlaps = self.overlap(x, y, w, h, tolerance)
+        box = width * height
+        return Scores(
+            objective=self.objective(x, y, rot, w, h),
+            width=width,
+            height=height,
+            efficiency=np.divide(self.area, box, out=np.zeros_like(box), where=box > 0),
+            wirelength=wire_lengths.sum(axis=-1) + net_lengths.sum(axis=-1),
+            wire_lengths=wire_lengths,
+            net_lengths=net_lengths,
+            overlap_area=overlap_area,
+            overlaps=overlaps,
+            edge_violations=self.edge_violations(x, y, rot, w, h, tolerance),
+        )
+
+    def score_positions(self, positions: list, tolerance: float | None = None):
+        """Score one packer output (positions, optionally followed by the size)."""
+        placed = positions[: self.n]
+        return self.score(
+            [p[0] for p in placed],
+            [p[1] for p in placed],
+            [ROTATIONS.index((p[2] if len(p) > 2 else 0) % 360) for p in placed],
+            tolerance,
+        )
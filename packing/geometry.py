@@ -0,0 +1,113 @@
+"""
+Rectangle geometry shared by the packer and the KiCad side.
+
+Everything here uses the packer's frame: (0, 0) is a rectangle's bottom left,
+y points up and rotations are counter-clockwise in degrees.
+"""
+
+import math
+from dataclasses import dataclass
+
+ROTATIONS = (0, 90, 180, 270)
+
+# Input units per grid unit by default: 1 um for KiCad's nanometres
+DEFAULT_GRID_STEP = 1000
+# Values within this fraction of a step of a grid line count as on it, so
+# float noise never costs a whole step
+_GRID_EPSILON = 1e-9
+
+
+@dataclass(frozen=True)
+class Grid:
+    """
+    The integer grid packers work on, `step` input units per grid unit.
+
+    Sizes are rounded up and positions of fixed rects down, so a rect's grid
+    cells always cover it; anything computed on the grid converts back
+    exactly with to_units.
+    """
+
+    step: float = DEFAULT_GRID_STEP
+
+    def __post_init__(self):
+        if self.step <= 0:
+            raise ValueError(f"Grid step must be positive, got {self.step}")
+
+    def up(self, value: float) -> int:
+        return math.ceil(value / self.step - _GRID_EPSILON)
+
+    def down(self, value: float) -> int:
+        return math.floor(value / self.step + _GRID_EPSILON)
+
+    def nearest(self, value: float) -> int:
+        return round(value / self.step)
+
+    def to_units(self, cells: int) -> float:
+        return cells * self.step
+
+    def snap_up(self, value: float) -> float:
+        return self.to_units(self.up(value))
+
+    def snap_down(self, value: float) -> float:
+        return self.to_units(self.down(value))
+
+
+def rotated_size(w: float, h: float, angle: int) -> tuple[float, float]:
+    """Size of a w x h rectangle after rotating it by `angle`."""
+    if angle % 180 == 0:
+        return w, h
+    return h, w
+
+
+def rotate_point(
+    px: float, py: float, w: float, h: float, angle: int
+) -> tuple[float, float]:
+    """
+    Where the point (px, py) of a w x h rectangle ends up, relative to the
+    bottom left, after rotating the rectangle by `angle` in place.
+    """
+    angle %= 360
+    if angle == 0:
+        return px, py
+    if angle == 90:
+        return h - py, px
+    if angle == 180:
+        return w - px, h - py
+    if angle == 270:
+        return py, w - px
+    raise ValueError(f"Rotation must be a multiple of 90 degrees, got {angle}")
+
+
+def place_rotated(rects: list, wires: list, positions: list) -> tuple[list, list, list]:
+    """
+    Turn packer output into what was actually placed.
+
+    Args:
+        rects: unrotated (width, height) of each rectangle
+        wires: (source, dest, location_source, location_dest, ...) tuples, with
+               locations relative to the unrotated rectangles
+        positions: packer output; (x, y) or (x, y, rotation) per rectangle,
+                   optionally followed by the overall size
+
+    Returns:
+        (sizes, wires, locations): rotated sizes, wires with rotated endpoints
+        (same tuple type as given) and (x, y) bottom lefts
+    """
+    placed = positions[: len(rects)]
+    angles = [p[2] if len(p) > 2 else 0 for p in placed]
+    sizes = [rotated_size(w, h, a) for (w, h), a in zip(rects, angles)]
+    locations = [(p[0], p[1]) for p in placed]
+
+    placed_wires = []
+    for wire in wires:
+        source, dest, loc_source, loc_dest, *rest = wire
+        fields = (
+            source,
+            dest,
+            rotate_point(*loc_source, *rects[source], angles[source]),
+            rotate_point(*loc_dest, *rects[dest], angles[dest]),
+            *rest,
+        )
+        placed_wires.append(type(wire)(*fields) if hasattr(wire, "_fields") else fields)
+
+    return sizes, placed_wires, locations
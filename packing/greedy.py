@@ -0,0 +1,282 @@
+"""
+Fast skyline bottom-left packer.
+
+Used to warm-start CP-SAT and as the answer of last resort when the solver
+runs out of time without a solution. Runs in milliseconds for a few hundred
+rectangles and always returns a legal placement: no overlaps, and every
+edge-constrained rectangle on one of its sides. Bottom rects make up the
+bottom row; left, right and top ones are laid around everything else.
+"""
+
+import math
+from collections import defaultdict
+from typing import NamedTuple
+
+from packing.edges import edge_constraint, preferred_side
+
+# How much wirelength counts against height when choosing a spot
+_WIRE_PULL = 0.5
+# Strip width as a multiple of sqrt(total area); a bit wider than square
+# leaves room for the skyline's ragged top
+_STRIP_SLACK = 1.15
+
+
+class GreedyPlacement(NamedTuple):
+    positions: list[tuple[float, float]]
+    width: float
+    height: float
+
+
+class _Link(NamedTuple):
+    other: int
+    pin: tuple[float, float]
+    other_pin: tuple[float, float]
+    weight: float
+
+
+def _links(n: int, wires: list, nets: list) -> list[list[_Link]]:
+    """Per rect, every (other rect, own pin, other pin, weight) it is tied to."""
+    links = [[] for _ in range(n)]
+    for source, dest, loc_source, loc_dest, *rest in wires:
+        weight = rest[0] if rest else 1.0
+        links[source].append(_Link(dest, loc_source, loc_dest, weight))
+        links[dest].append(_Link(source, loc_dest, loc_source, weight))
+
+    for members, weight in nets:
+        if len(members) < 2:
+            continue
+        # Spread a net's weight over its members so big nets don't dominate
+        share = weight / (len(members) - 1)
+        for i, loc_i in members:
+            for j, loc_j in members:
+                if i != j:
+                    links[i].append(_Link(j, loc_i, loc_j, share))
+    return links
+
+
+def _order(sizes: list, constraints: list, links: list[list[_Link]]) -> list:
+    """
+    Edge-constrained rects first, then grow outwards from the best connected
+    rect, always taking the one most strongly tied to what is already placed.
+    """
+    n = len(sizes)
+    order = [i for i in range(n) if constraints[i]]
+    placed = set(order)
+
+    pull = defaultdict(float)
+    for i in order:
+        for link in links[i]:
+            pull[link.other] += link.weight
+
+    def area(i):
+        return sizes[i][0] * sizes[i][1]
+
+    degree = [sum(link.weight for link in links[i]) for i in range(n)]
+
+    while len(order) < n:
+        remaining = [i for i in range(n) if i not in placed]
+        best = max(remaining, key=lambda i: (pull[i], degree[i], area(i)))
+        order.append(best)
+        placed.add(best)
+        for link in links[best]:
+            pull[link.other] += link.weight
+    return order
+
+
+def pack_greedy(
+    sizes: list[tuple[float, float]],
+    wires: list,
+    constraints: list,
+    nets: list | None = None,
+    fixed: list | None = None,
+) -> GreedyPlacement:
+    """
+    Place rectangles with a wire-aware skyline bottom-left heuristic.
+
+    Args:
+        sizes: (width, height) of each rectangle
+        wires: (source, dest, location_source, location_dest[, weight]) tuples
+        constraints: edge constraint per rectangle (see packing.edges); each
+                     constrained one goes on its preferred side. Sizes are
+                     taken as given, so rects that must face out should
+                     already be rotated for that side
+        nets: optional (members, weight) with members as (rect, location)
+        fixed: optional bottom left per rect for rects that may not move (None
+               for free ones); the free rects are packed to the right of them
+
+    Returns:
+        Bottom-left positions and the bounding width and height
+    """
+    n = len(sizes)
+    if n == 0:
+        return GreedyPlacement([], 0, 0)
+    if fixed and any(p is not None for p in fixed):
+        return _pack_beside(sizes, wires, constraints, nets or [], fixed)
+
+    sides = [
+        preferred_side(c.sides) if c is not None else None
+        for c in map(edge_constraint, constraints)
+    ]
+    links = _links(n, wires, nets or [])
+    order = _order(sizes, sides, links)
+
+    total_area = sum(w * h for w, h in sizes)
+    edge_width = sum(sizes[i][0] for i in range(n) if sides[i] == "bottom")
+    # Never wider than all rects side by side, so positions stay within the
+    # domains the CP-SAT model uses
+    strip = max(
+        max(w for w, _ in sizes),
+        edge_width,
+        min(
+            math.ceil(math.sqrt(total_area) * _STRIP_SLACK),
+            sum(w for w, _ in sizes),
+        ),
+    )
+
+    # Skyline as [x, y, width] segments covering [0, strip)
+    skyline = [[0, 0, strip]]
+    positions: list[tuple[float, float] | None] = [None] * n
+
+    def wire_cost(i, x, y):
+        cost = 0.0
+        for link in links[i]:
+            other = positions[link.other]
+            if other is None:
+                continue
+            dx = x + link.pin[0] - other[0] - link.other_pin[0]
+            dy = y + link.pin[1] - other[1] - link.other_pin[1]
+            cost += link.weight * (abs(dx) + abs(dy))
+        return cost
+
+    edge_x = 0
+    for i in order:
+        w, h = sizes[i]
+
+        if sides[i] in ("left", "right", "top"):
+            continue
+        if sides[i] == "bottom":
+            # Bottom row, left to right, so every constrained rect is on the edge
+            best = (edge_x, 0)
+            edge_x += w
+        else:
+            best = None
+            best_score = None
+            for k, (sx, _, _) in enumerate(skyline):
+                if sx + w > strip:
+                    break
+                y = _resting_height(skyline, k, w)
+                score = y + h + _WIRE_PULL * wire_cost(i, sx, y)
+                if best_score is None or score < best_score:
+                    best, best_score = (sx, y), score
+
+        x, y = best
+        positions[i] = (x, y)
+        _raise_skyline(skyline, x, w, y + h)
+
+    if any(side in ("left", "right", "top") for side in sides):
+        _place_around(sizes, sides, positions)
+
+    width = max(x + w for (x, _), (w, _) in zip(positions, sizes))
+    height = max(y + h for (_, y), (_, h) in zip(positions, sizes))
+    return GreedyPlacement(positions, width, height)
+
+
+def _place_around(sizes: list, sides: list, positions: list) -> None:
+    """
+    Put the left, right and top rects around the rest: a column at each side
+    (the rest moves right to make room on the left) and a row across the top.
+    """
+    column = {
+        side: [i for i, s in enumerate(sides) if s == side]
+        for side in ("left", "right", "top")
+    }
+    inner = [i for i, p in enumerate(positions) if p is not None]
+    inner_width = max((positions[i][0] + sizes[i][0] for i in inner), default=0)
+    inner_height = max((positions[i][1] + sizes[i][1] for i in inner), default=0)
+    left = max((sizes[i][0] for i in column["left"]), default=0)
+    right = max((sizes[i][0] for i in column["right"]), default=0)
+    top = max((sizes[i][1] for i in column["top"]), default=0)
+
+    for i in inner:
+        positions[i] = (positions[i][0] + left, positions[i][1])
+    width = max(left + inner_width + right, sum(sizes[i][0] for i in column["top"]))
+    heights = [inner_height]
+    for side, x_of in (("left", lambda i: 0), ("right", lambda i: width - sizes[i][0])):
+        y = 0
+        for i in column[side]:
+            positions[i] = (x_of(i), y)
+            y += sizes[i][1]
+        heights.append(y)
+
+    x = 0
+    for i in column["top"]:
+        positions[i] = (x, max(heights) + top - sizes[i][1])
+        x += sizes[i][0]
+
+
+def _pack_beside(sizes, wires, constraints, nets, fixed) -> GreedyPlacement:
+    """Pack the free rects on their own, then put them right of the fixed ones."""
+    free = [i for i, p in enumerate(fixed) if p is None]
+    index = {i: k for k, i in enumerate(free)}
+    placed = pack_greedy(
+        [sizes[i] for i in free],
+        [
+            (index[w[0]], index[w[1]], *w[2:])
+            for w in wires
+            if w[0] in index and w[1] in index
+        ],
+        [constraints[i] for i in free],
+        [
+            ([(index[i], loc) for i, loc in members if i in index], weight)
+            for members, weight in nets
+        ],
+    )
+
+    x0 = max(p[0] + sizes[i][0] for i, p in enumerate(fixed) if p is not None)
+    positions = [
+        (
+            (fixed[i][0], fixed[i][1])
+            if fixed[i] is not None
+            else (x0 + placed.positions[index[i]][0], placed.positions[index[i]][1])
+        )
+        for i in range(len(sizes))
+    ]
+    width = max(x + w for (x, _), (w, _) in zip(positions, sizes))
+    height = max(y + h for (_, y), (_, h) in zip(positions, sizes))
+    return GreedyPlacement(positions, width, height)
+
+
+def _resting_height(skyline: list, k: int, w: float) -> float:
+    """Height at which a rect of width w starting at segment k comes to rest."""
+    x_end = skyline[k][0] + w
+    y = 0
+    for sx, sy, _ in skyline[k:]:
+        if sx >= x_end:
+            break
+        y = max(y, sy)
+    return y
+
+
+def _raise_skyline(skyline: list, x: float, w: float, top: float) -> None:
+    """Lift the skyline to `top` over [x, x + w)."""
+    x_end = x + w
+    updated = []
+    for sx, sy, sw in skyline:
+        s_end = sx + sw
+        if s_end <= x or sx >= x_end:
+            updated.append([sx, sy, sw])
+            continue
+        if sx < x:
+            updated.append([sx, sy, x - sx])
+        if s_end > x_end:
+            updated.append([x_end, sy, s_end - x_end])
+    updated.append([x, top, w])
+    updated.sort()
+
+    # Merge neighbours at the same height
+    skyline.clear()
+    for segment in updated:
+        if skyline and skyline[-1][1] == segment[1]:
+            skyline[-1][2] += segment[2]
+        else:
+            skyline.append(segment)
@@ -0,0 +1,176 @@
+"""
+Packing problems as plain data: a JSON format for fixtures exported from real
+boards, and a seeded generator of synthetic ones.
+
+Nothing here imports ortools, so KiCad-side code can export problems too.
+"""
+
+import json
+import math
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from packing.edges import SIDES, edge_constraint, edge_json
+from packing.geometry import ROTATIONS
+
+SIZE_DISTRIBUTIONS = ("uniform", "lognormal")
+
+# Synthetic parts are between 0.5 and 10 mm on a side (in KiCad nm)
+_MIN_SIZE = 500_000
+_MAX_SIZE = 10_000_000
+
+
+@dataclass
+class Instance:
+    """One packing problem in pack_components_general's input format."""
+
+    name: str
+    rects: list[tuple[float, float]]
+    # False, True or an EdgeConstraint per rect (see packing.edges)
+    constraints: list
+    # (source, dest, location_source, location_dest, weight)
+    wires: list[tuple] = field(default_factory=list)
+    # (members, weight) with members as (rect index, location) pairs
+    nets: list[tuple] = field(default_factory=list)
+    rotations: list[tuple[int, ...]] | None = None
+
+    def to_json(self) -> dict:
+        return {
+            "name": self.name,
+            "rects": [list(r) for r in self.rects],
+            "constraints": [edge_json(c) for c in self.constraints],
+            "wires": [
+                [s, d, list(loc_s), list(loc_d), w]
+                for s, d, loc_s, loc_d, w in self.wires
+            ],
+            "nets": [
+                [[[i, list(loc)] for i, loc in members], w] for members, w in self.nets
+            ],
+            "rotations": (
+                [list(r) for r in self.rotations]
+                if self.rotations is not None
+                else None
+            ),
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Instance":
+        return cls(
+            name=data["name"],
+            rects=[tuple(r) for r in data["rects"]],
+            constraints=[
+                c if isinstance(c, bool) else edge_constraint(c)
+                for c in data["constraints"]
+            ],
+            wires=[
+                (s, d, tuple(loc_s), tuple(loc_d), w)
+                for s, d, loc_s, loc_d, w in data.get("wires", [])
+            ],
+            nets=[
+                ([(i, tuple(loc)) for i, loc in members], w)
+                for members, w in data.get("nets", [])
+            ],
+            rotations=(
+                [tuple(r) for r in data["rotations"]]
+                if data.get("rotations") is not None
+                else None
+            ),
+        )
+
+
+def save_instance(instance: Instance, path: str | Path) -> None:
+    Path(path).write_text(json.dumps(instance.to_json(), indent=1))
+
+
+def load_instance(path: str | Path) -> Instance:
+    return Instance.from_json(json.loads(Path(path).read_text()))
+
+
+def load_instances(directory: str | Path) -> list[Instance]:
+    """Every *.json instance in a directory, by file name."""
+    return [load_instance(path) for path in sorted(Path(directory).glob("*.json"))]
+
+
+def synthetic_instance(
+    n_rects: int,
+    seed: int = 0,
+    size_distribution: str = "uniform",
+    min_size: float = _MIN_SIZE,
+    max_size: float = _MAX_SIZE,
+    nets_per_rect: float = 1.0,
+    fanout: float = 3.0,
+    edge_ratio: float = 0.0,
+    rotate: bool = False,
+    sides_per_edge: int = len(SIDES),
+) -> Instance:
+    """
+    A reproducible random problem.
+
+    Sides are drawn uniformly or log-normally (many small parts, a few big
+    ones) between min_size and max_size. There are about nets_per_rect nets
+    per rect, each joining 2 + Poisson(fanout - 2) distinct rects at random
+    pins, and edge_ratio of the rects must touch the edge: any side, or
+    sides_per_edge random ones.
+    """
+    if size_distribution not in SIZE_DISTRIBUTIONS:
+        raise ValueError(
+            f"Unknown size distribution {size_distribution!r}, "
+            f"expected one of {SIZE_DISTRIBUTIONS}"
+        )
+    rng = random.Random(seed)
+
+    def side():
+        if size_distribution == "uniform":
+            value = rng.uniform(min_size, max_size)
+        else:
+            # Median at a fifth of the range, clipped to it
+            value = rng.lognormvariate(0, 0.75) * (min_size + (max_size - min_size) / 5)
+        return float(round(min(max(value, min_size), max_size), -3))
+
+    rects = [(side(), side()) for _ in range(n_rects)]
+
+    def pin(i):
+        w, h = rects[i]
+        return (
+            float(round(rng.uniform(0, w), -3)),
+            float(round(rng.uniform(0, h), -3)),
+        )
+
+    def poisson(mean):
+        # Knuth's method; the means here are small
+        limit, k, p = math.exp(-mean), 0, rng.random()
+        while p > limit:
+            k += 1
+            p *= rng.random()
+        return k
+
+    nets = []
+    if n_rects >= 2:
+        for _ in range(round(nets_per_rect * n_rects)):
+            size = min(n_rects, 2 + poisson(max(0.0, fanout - 2)))
+            members = rng.sample(range(n_rects), size)
+            nets.append(([(i, pin(i)) for i in members], 1.0))
+
+    n_edge = round(edge_ratio * n_rects)
+    edge = set(rng.sample(range(n_rects), n_edge))
+
+    def constraint(i):
+        if i not in edge:
+            return False
+        if sides_per_edge >= len(SIDES):
+            return True
+        return edge_constraint(rng.sample(SIDES, sides_per_edge))
+
+    return Instance(
+        name=(
+            f"synthetic-{n_rects}-{size_distribution}-f{fanout:g}"
+            f"-e{edge_ratio:g}"
+            + (f"x{sides_per_edge}" if sides_per_edge < len(SIDES) else "")
+            + f"-s{seed}"
+        ),
+        rects=rects,
+        constraints=[constraint(i) for i in range(n_rects)],
+        nets=nets,
+        rotations=[ROTATIONS] * n_rects if rotate else None,
+    )
@@ -0,0 +1,133 @@
+from collections import defaultdict
+from typing import Iterable, NamedTuple
+
+
+class CSRGraph(NamedTuple):
+    """
+    Symmetric adjacency in compressed sparse row form.
+
+    Neighbours of node i are indices[indptr[i]:indptr[i + 1]] with matching
+    weights; nodes[i] is the reference of node i.
+    """
+
+    nodes: list[str]
+    indptr: list[int]
+    indices: list[int]
+    weights: list[float]
+
+
+class NetGraph:
+    """
+    Weighted, undirected graph of parts that share nets.
+
+    Edges are stored once as sorted (ref_a, ref_b) tuples; an edge's weight is
+    the number of nets the two parts share, with large nets counting for
+    `large_net_weight` instead of 1 (0 drops them entirely).
+    """
+
+    def __init__(self, nodes: Iterable[str] = ()):
+        self.nodes: list[str] = []
+        self.index: dict[str, int] = {}
+        self.weights: dict[tuple[str, str], float] = defaultdict(float)
+        for node in nodes:
+            self.add_node(node)
+
+    @classmethod
+    def from_nets(
+        cls,
+        nets: dict[str, Iterable[str]],
+        nodes: Iterable[str] = (),
+        large_net_size: int | None = None,
+        large_net_weight: float = 0.0,
+    ) -> "NetGraph":
+        """
+        Build the graph from a net name -> part references map.
+
+        Args:
+            nets: references on each net (duplicates are fine, e.g. one per pad)
+            nodes: parts to include even if they have no connections
+            large_net_size: nets with more distinct parts than this (typically
+                            GND and supply rails) are large; None disables the check
+            large_net_weight: weight each large net contributes to an edge
+        """
+        graph = cls(nodes)
+
+        for refs in nets.values():
+            unique_refs = sorted(set(refs))
+            if len(unique_refs) < 2:
+                continue
+
+            weight = 1.0
+            if large_net_size is not None and len(unique_refs) > large_net_size:
+                if large_net_weight <= 0:
+                    continue
+                weight = large_net_weight
+
+            for ref in unique_refs:
+                graph.add_node(ref)
+            for i, a in enumerate(unique_refs):
+                for b in unique_refs[i + 1 :]:
+                    graph.weights[(a, b)] += weight
+
+        return graph
+
+    def add_node(self, ref: str) -> int:
+        if ref not in self.index:
+            self.index[ref] = len(self.nodes)
+            self.nodes.append(ref)
+        return self.index[ref]
+
+    @staticmethod
+    def edge(a: str, b: str) -> tuple[str, str]:
+        """Canonical key for the edge between a and b."""
+        return (a, b) if a <= b else (b, a)
+
+    def weight(self, a: str, b: str) -> float:
+        return self.weights.get(self.edge(a, b), 0.0)
+
+    def edges(self) -> list[tuple[str, str, float]]:
+        return [(a, b, w) for (a, b), w in self.weights.items()]
+
+    def subgraph_edges(self, refs: Iterable[str]) -> list[tuple[str, str, float]]:
+        """Edges with both ends in `refs`."""
+        members = set(refs)
+        return [
+            (a, b, w)
+            for (a, b), w in self.weights.items()
+            if a in members and b in members
+        ]
+
+    def quotient_edges(
+        self, part_to_group: dict[str, int]
+    ) -> dict[tuple[int, int], float]:
+        """
+        Collapse parts into groups and sum the weights between distinct groups.
+
+        Parts missing from `part_to_group` are ignored.
+        """
+        group_weights = defaultdict(float)
+        for (a, b), w in self.weights.items():
+            ga = part_to_group.get(a)
+            gb = part_to_group.get(b)
+            if ga is None or gb is None or ga == gb:
+                continue
+            group_weights[(min(ga, gb), max(ga, gb))] += w
+        return dict(group_weights)
+
+    def to_csr(self) -> CSRGraph:
+        neighbours = [[] for _ in self.nodes]
+        for (a, b), w in self.weights.items():
+            ia, ib = self.index[a], self.index[b]
+            neighbours[ia].append((ib, w))
+            neighbours[ib].append((ia, w))
+
+        indptr = [0]
+        indices = []
+        weights = []
+        for row in neighbours:
+            row.sort()
+            indices.extend(j for j, _ in row)
+            weights.extend(w for _, w in row)
+            indptr.append(len(indices))
+
+        return CSRGraph(list(self.nodes), indptr, indices, weights)
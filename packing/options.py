@@ -0,0 +1,49 @@
+from dataclasses import dataclass
+from typing import Any
+
+from packing.geometry import DEFAULT_GRID_STEP, Grid
+
+ENGINES = ("auto", "cpsat", "anneal")
+
+
+@dataclass
+class SolverOptions:
+    """Knobs for pack_components_general and the engines behind it."""
+
+    max_time_in_seconds: float = 10.0
+    num_workers: int = 0  # 0 lets CP-SAT pick from the number of cores
+    relative_gap_limit: float = 0.0
+    random_seed: int = 0
+    # Stop once no better solution has been found for this many seconds
+    no_improvement_timeout: float | None = None
+    # "cpsat", "anneal", or "auto" to anneal groups above heuristic_threshold rects
+    engine: str = "auto"
+    heuristic_threshold: int = 40
+    # Input units per grid unit; coarser grids make smaller CP-SAT domains
+    grid_step: float = DEFAULT_GRID_STEP
+    # Multiresolution: solve on this coarser grid first (a multiple of
+    # grid_step), then refine within refine_window coarse cells of that answer.
+    # The refine pass's bound (and so its gap) only holds inside that window
+    coarse_grid_step: float | None = None
+    coarse_time_fraction: float = 0.25
+    refine_window: float = 2.0
+
+    @property
+    def grid(self) -> Grid:
+        return Grid(self.grid_step)
+
+    def engine_for(self, n_rects: int) -> str:
+        if self.engine not in ENGINES:
+            raise ValueError(
+                f"Unknown engine {self.engine!r}, expected one of {ENGINES}"
+            )
+        if self.engine == "auto":
+            return "anneal" if n_rects > self.heuristic_threshold else "cpsat"
+        return self.engine
+
+    def apply(self, solver: Any) -> None:
+        """Copy the CP-SAT settings onto a cp_model.CpSolver."""
+        solver.parameters.max_time_in_seconds = self.max_time_in_seconds
+        solver.parameters.num_workers = self.num_workers
+        solver.parameters.relative_gap_limit = self.relative_gap_limit
+        solver.parameters.random_seed = self.random_seed
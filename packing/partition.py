@@ -0,0 +1,214 @@
+"""
+Graph partitioning for hierarchical packing.
+
+Nodes are 0..n-1 and edges are (a, b, weight) triples, so the same code splits
+parts inside a group and groups on the board. Splits are spectral bisections
+(the Fiedler vector of the weighted Laplacian, cut at the median) polished by a
+Kernighan-Lin style pass that moves nodes across the cut while it gets lighter.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# How far a refinement pass may unbalance a bisection, as a fraction of n
+_BALANCE_SLACK = 0.1
+_REFINE_PASSES = 8
+
+
+@dataclass
+class Cluster:
+    """A node of a cluster tree: a leaf holds items, an inner node children."""
+
+    items: list = field(default_factory=list)
+    children: list["Cluster"] = field(default_factory=list)
+
+    @property
+    def is_leaf(self) -> bool:
+        return not self.children
+
+    def leaves(self) -> list["Cluster"]:
+        if self.is_leaf:
+            return [self]
+        return [leaf for child in self.children for leaf in child.leaves()]
+
+    def levels(self) -> list[list["Cluster"]]:
+        """Inner nodes grouped by height, bottom-up."""
+        levels = defaultdict(list)
+
+        def height(node):
+            if node.is_leaf:
+                return 0
+            h = 1 + max(height(child) for child in node.children)
+            levels[h].append(node)
+            return h
+
+        height(self)
+        return [levels[h] for h in sorted(levels)]
+
+    def map(self, f) -> "Cluster":
+        """The same tree with every leaf item replaced by f(item)."""
+        if self.is_leaf:
+            return Cluster(items=[f(item) for item in self.items])
+        return Cluster(children=[child.map(f) for child in self.children])
+
+
+def _components(n: int, adjacency: dict[int, dict[int, float]]) -> list[list[int]]:
+    seen = set()
+    components = []
+    for start in range(n):
+        if start in seen:
+            continue
+        seen.add(start)
+        stack = [start]
+        component = []
+        while stack:
+            node = stack.pop()
+            component.append(node)
+            for other in adjacency[node]:
+                if other not in seen:
+                    seen.add(other)
+                    stack.append(other)
+        components.append(component)
+    return components
+
+
+def _adjacency(n: int, edges: list[tuple[int, int, float]]):
+    adjacency = {i: defaultdict(float) for i in range(n)}
+    for a, b, w in edges:
+        if a != b and w > 0:
+            adjacency[a][b] += w
+            adjacency[b][a] += w
+    return adjacency
+
+
+def _refine(side: np.ndarray, adjacency: dict) -> None:
+    """Move nodes across the cut, best gain first, while that lowers the cut."""
+    n = len(side)
+    slack = max(1, int(_BALANCE_SLACK * n))
+    # Both sides keep at least one node, however small n is
+    low = max(1, n // 2 - slack)
+    high = min(n - 1, (n + 1) // 2 + slack)
+
+    for _ in range(_REFINE_PASSES):
+        gains = []
+        for node in range(n):
+            same = sum(w for o, w in adjacency[node].items() if side[o] == side[node])
+            other = sum(w for o, w in adjacency[node].items() if side[o] != side[node])
+            gains.append((other - same, node))
+        gains.sort(reverse=True)
+
+        moved = False
+        for _, node in gains:
+            same = sum(w for o, w in adjacency[node].items() if side[o] == side[node])
+            other = sum(w for o, w in adjacency[node].items() if side[o] != side[node])
+            if other - same <= 0:
+                continue
+            size_after = int(side.sum()) + (-1 if side[node] else 1)
+            if not low <= size_after <= high:
+                continue
+            side[node] = not side[node]
+            moved = True
+        if not moved:
+            return
+
+
+def bisect(n: int, edges: list[tuple[int, int, float]]) -> list[bool]:
+    """
+    Split nodes into two halves with a light cut between them.
+
+    Returns the side of each node. Disconnected graphs are split along their
+    components when that keeps the halves balanced.
+    """
+    if n < 2:
+        return [False] * n
+    adjacency = _adjacency(n, edges)
+
+    # Whole components on each side cost nothing to cut
+    components = sorted(_components(n, adjacency), key=len, reverse=True)
+    largest = len(components[0])
+    if len(components) > 1 and largest <= (n + 1) // 2 + _BALANCE_SLACK * n:
+        side = [False] * n
+        count = [0, 0]
+        for component in components:
+            s = int(count[1] < count[0])
+            for node in component:
+                side[node] = bool(s)
+            count[s] += len(component)
+        return side
+
+    # Fiedler vector of the weighted Laplacian
+    laplacian = np.zeros((n, n))
+    for a, neighbours in adjacency.items():
+        for b, w in neighbours.items():
+            laplacian[a, b] -= w
+            laplacian[a, a] += w
+    _, vectors = np.linalg.eigh(laplacian)
+    fiedler = vectors[:, 1]
+
+    side = np.zeros(n, dtype=bool)
+    side[np.argsort(fiedler, kind="stable")[n // 2 :]] = True
+    _refine(side, adjacency)
+    return side.tolist()
+
+
+def split(
+    n: int, edges: list[tuple[int, int, float]], max_size: int
+) -> list[list[int]]:
+    """Recursively bisect until every part has at most max_size nodes."""
+    if n <= max_size:
+        return [list(range(n))]
+
+    side = bisect(n, edges)
+    if all(side) or not any(side):
+        # Never recurse on the same nodes: halve them in index order instead
+        side = [i >= n // 2 for i in range(n)]
+    parts = []
+    for s in (False, True):
+        nodes = [i for i in range(n) if side[i] == s]
+        index = {node: k for k, node in enumerate(nodes)}
+        sub_edges = [
+            (index[a], index[b], w) for a, b, w in edges if a in index and b in index
+        ]
+        for part in split(len(nodes), sub_edges, max_size):
+            parts.append([nodes[k] for k in part])
+    return parts
+
+
+def build_hierarchy(
+    n: int, edges: list[tuple[int, int, float]], max_size: int
+) -> Cluster:
+    """
+    Cluster tree over nodes 0..n-1 in which no cluster has more than max_size
+    items or children, so every level is a small packing problem.
+
+    Built bottom-up: split the nodes into parts, then cluster the parts by the
+    weight between them, until one level fits.
+    """
+    if max_size < 2:
+        raise ValueError("max_size must be at least 2")
+    if n <= max_size:
+        return Cluster(items=list(range(n)))
+
+    parts = split(n, edges, max_size)
+    part_of = {node: p for p, part in enumerate(parts) for node in part}
+    between = defaultdict(float)
+    for a, b, w in edges:
+        pa, pb = part_of[a], part_of[b]
+        if pa != pb:
+            between[(min(pa, pb), max(pa, pb))] += w
+
+    upper = build_hierarchy(
+        len(parts), [(a, b, w) for (a, b), w in between.items()], max_size
+    )
+    return attach(upper, [Cluster(items=part) for part in parts])
+
+
+def attach(node: Cluster, clusters: list[Cluster]) -> Cluster:
+    """Replace the indices at the leaves of `node` with clusters[index]."""
+    if node.is_leaf:
+        if len(node.items) == 1:
+            return clusters[node.items[0]]
+        return Cluster(children=[clusters[k] for k in node.items])
+    return Cluster(children=[attach(child, clusters) for child in node.children])
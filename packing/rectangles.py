@@ -1,15 +1,38 @@
 import base64
 import io
 import math
-from typing import Any, NamedTuple
+import threading
+import time
+from collections import defaultdict
+from dataclasses import replace
+from typing import Any, Callable, NamedTuple
 
-import matplotlib.patches as patches
-import matplotlib.pyplot as plt
 from ortools.sat.python import cp_model
 
+from packing.annealing import pack_components_annealing
+from packing.edges import (
+    EdgeConstraint,
+    edge_constraint,
+    edge_key,
+    on_edge,
+    side_options,
+    start_side,
+)
+from packing.evaluate import PlacementProblem
+from packing.geometry import (
+    ROTATIONS,
+    Grid,
+    place_rotated,
+    rotate_point,
+    rotated_size,
+)
+from packing.greedy import pack_greedy
+from packing.options import SolverOptions
+
 _LAMBDA_SIZE = 1
 _LAMBDA_WIRE = 1
-_SCALE = 1e-3
+# Wire weights are resolved to quarter units in the (integer) objective
+_WIRE_WEIGHT_STEPS = 4
 
 
 class WireInfo(NamedTuple):
@@ -17,16 +40,182 @@ class WireInfo(NamedTuple):
     dest: int
     location_source: tuple[float, float]
     location_dest: tuple[float, float]
+    weight: float = 1.0
+
+
+class NetInfo(NamedTuple):
+    members: list[tuple[int, tuple[float, float]]]
+    weight: float = 1.0
+
+
+class SolutionProgress(NamedTuple):
+    """An improved placement reported while CP-SAT is still searching."""
+
+    positions: list[tuple[float, ...]]  # Same format as the final result
+    objective: float
+    bound: float  # Best proven lower bound on the objective so far
+    elapsed: float  # Seconds since the search started
+    # The search is over: the placement is the result and the bound is final
+    final: bool = False
+
+    @property
+    def gap(self) -> float:
+        return (self.objective - self.bound) / max(1.0, abs(self.objective))
+
+
+class _SearchMonitor(cp_model.CpSolverSolutionCallback):
+    """
+    Sees every improving solution. Hands it to `on_solution`, which may return
+    True to accept it and end the search, and stops the search once the
+    incumbent has not improved for `timeout` seconds.
+    """
+
+    def __init__(self, timeout: float | None = None, on_solution=None):
+        super().__init__()
+        self._timeout = timeout
+        self._on_solution = on_solution
+        self._last_improvement: float | None = None
+        self._done = threading.Event()
+        self._watchdog = threading.Thread(target=self._watch, daemon=True)
+
+    def on_solution_callback(self) -> None:
+        self._last_improvement = time.monotonic()
+        if self._on_solution is not None and self._on_solution(self):
+            self.StopSearch()
+
+    def _watch(self) -> None:
+        while not self._done.wait(min(0.05, self._timeout)):
+            last = self._last_improvement
+            if last is not None and time.monotonic() - last > self._timeout:
+                self.StopSearch()
+                return
+
+    def __enter__(self) -> "_SearchMonitor":
+        if self._timeout is not None:
+            self._watchdog.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._done.set()
+        if self._watchdog.is_alive():
+            self._watchdog.join()
+
+
+def _anneal_on_grid(grid, rects, wires, constraints, options, nets, rotations, fixed):
+    """
+    Anneal a grid-aligned copy of the problem, so the result lands on the
+    same grid as CP-SAT's.
+
+    Sizes are rounded up to whole cells and fixed rects widened to the cells
+    they touch. Flooring the free positions afterwards then can't create an
+    overlap: every edge it could cross is a grid line.
+    """
+    n = len(rects)
+    fixed = fixed or [None] * n
+    starts = [
+        (grid.snap_down(p[0]), grid.snap_down(p[1])) if p is not None else None
+        for p in fixed
+    ]
+    sizes = [
+        (
+            (grid.snap_up(p[0] + w) - s[0], grid.snap_up(p[1] + h) - s[1])
+            if p is not None
+            else (grid.snap_up(w), grid.snap_up(h))
+        )
+        for (w, h), p, s in zip(rects, fixed, starts)
+    ]
+
+    def shifted(i, location):
+        # Pins of a widened fixed rect keep their place on the board
+        if fixed[i] is None:
+            return location
+        return (
+            location[0] + fixed[i][0] - starts[i][0],
+            location[1] + fixed[i][1] - starts[i][1],
+        )
+
+    positions = pack_components_annealing(
+        sizes,
+        [
+            w._replace(
+                location_source=shifted(w.source, w.location_source),
+                location_dest=shifted(w.dest, w.location_dest),
+            )
+            for w in wires
+        ],
+        constraints,
+        options,
+        [
+            net._replace(members=[(i, shifted(i, loc)) for i, loc in net.members])
+            for net in nets or []
+        ],
+        rotations,
+        starts if any(p is not None for p in fixed) else None,
+    )
+    if positions is None:
+        return None
+
+    sol = []
+    for i, (x, y, *rotation) in enumerate(positions[:n]):
+        if fixed[i] is not None:
+            x, y = fixed[i]
+        else:
+            x, y = grid.snap_down(x), grid.snap_down(y)
+        sol.append((x, y, *rotation))
+    width, height = positions[n]
+    sol.append((grid.snap_up(width), grid.snap_up(height)))
+    return sol
+
+
+def _interchangeable(orientations, constraints, fixed, wires, nets, scaled_pin):
+    """
+    Groups of free rects that can swap places without changing the problem:
+    same scaled size and rotations, same edge constraint, and wired with the same
+    pins to the same other rects and nets. Rects wired to each other are
+    never grouped.
+    """
+    n = len(orientations)
+
+    def pins(i, location):
+        return tuple(scaled_pin(i, *location, angle) for angle in orientations[i])
+
+    incident = [[] for _ in range(n)]
+    for w in wires:
+        weight = round(w.weight * _WIRE_WEIGHT_STEPS)
+        incident[w.source].append(
+            ("w", w.dest, pins(w.source, w.location_source), weight)
+        )
+        incident[w.dest].append(("w", w.source, pins(w.dest, w.location_dest), weight))
+    for k, net in enumerate(nets):
+        for i, location in net.members:
+            incident[i].append(("n", k, pins(i, location)))
+
+    groups = defaultdict(list)
+    for i in range(n):
+        if fixed[i] is not None:
+            continue
+        key = (
+            tuple(sorted(orientations[i].items())),
+            edge_key(constraints[i]),
+            tuple(sorted(map(repr, incident[i]))),
+        )
+        groups[key].append(i)
+    return [group for group in groups.values() if len(group) > 1]
 
 
 def pack_components_general(
     rects: list[tuple[float, float]],
     wires: list[WireInfo],
-    constraints: list[bool],
-) -> list[tuple[float, float]]:
+    constraints: list[bool | EdgeConstraint],
+    options: SolverOptions | None = None,
+    nets: list[NetInfo] | None = None,
+    rotations: list[tuple[int, ...]] | None = None,
+    fixed: list[tuple[float, float] | None] | None = None,
+    on_solution: Callable[[SolutionProgress], bool | None] | None = None,
+) -> list[tuple[float, ...]]:
     """
     Packs rectangles that minimizes some combination of:
-    1) sum of wire lengths
+    1) sum of wire lengths (pairwise wires and/or net half-perimeters)
     2) perimeter (has to be linear)
 
     Assumes that (0, 0) is the bottom left.
@@ -37,78 +226,478 @@ def pack_components_general(
                1) wire from rects[source] to recs[dest] (0-indexed)
                2) location_source is the point of the wire in source with respect to its bottom left
                3) location_dest is the point of the wire in dest with respect to its bottom left
-        constraints: list of booleans indicating whether each rectangle must be on the edge
+               4) weight scales the wire's length in the objective (e.g. shared net count)
+        constraints: per rectangle, whether it must be on the edge: False, True for any
+                     side, or an EdgeConstraint (or its JSON form, see packing.edges)
+                     naming the sides it may take and the side of it that must face
+                     out. Ignored for fixed rectangles
+        options: solver settings (engine, time limit, workers, gap, seed, early stop);
+                 defaults to a single 10 second CP-SAT solve, or annealing for
+                 groups larger than options.heuristic_threshold
+        nets: optional list of (members, weight) where members are (rect index, pin
+              location with respect to its bottom left). Each net adds its half-perimeter
+              wirelength (HPWL) to the objective, which grows linearly with fanout
+              instead of quadratically like one wire per pair
+        rotations: optional list of the counter-clockwise rotations (0, 90, 180, 270)
+                   each rectangle may use; wire and net locations are given for the
+                   unrotated rectangle and rotate with it
+        fixed: optional bottom left (x, y >= 0) per rectangle for rectangles that
+               must stay where they are, None for the ones to place. Fixed
+               rectangles are obstacles for the others, are not rotated and may
+               overlap each other. The packing's size is then measured from its
+               smallest coordinates, so free rectangles can go left of or below
+               fixed ones where those leave room
+        on_solution: optional callback for every improved CP-SAT solution (the
+                     annealer does not report progress). Returning True accepts
+                     that solution as good enough and ends the search early.
+                     It is called once more with final=True and the final
+                     bound when CP-SAT's own solution is the result
     Returns:
         Coordinates of the bottom left of each rectangle with the i-th coordinate corresponding
-        to the i-th rectangle in the input.
+        to the i-th rectangle in the input. When rotations are given each entry is
+        (x, y, rotation) instead, with the bottom left taken after rotating.
     """
     if len(constraints) != len(rects):
         raise ValueError("Constraints must be the same length as rects")
 
+    if options is None:
+        options = SolverOptions()
+    grid = options.grid
+    if options.engine_for(len(rects)) == "anneal":
+        positions = _anneal_on_grid(
+            grid, rects, wires, constraints, options, nets, rotations, fixed
+        )
+        if positions is not None:
+            return positions
+        print("⚠️ Annealing missed an edge constraint; solving with CP-SAT instead")
+        options = replace(options, engine="cpsat")
+
     model = cp_model.CpModel()
     n = len(rects)
+    rotations_given = rotations is not None
+
+    if rotations is None:
+        rotations = [(0,)] * n
+    elif len(rotations) != n:
+        raise ValueError("Rotations must be the same length as rects")
+    if fixed is None:
+        fixed = [None] * n
+    elif len(fixed) != n:
+        raise ValueError("Fixed must be the same length as rects")
+    rotations = [(0,) if p is not None else r for r, p in zip(rotations, fixed)]
+    if n == 0:
+        return [(0, 0)]
+
+    # Grid (width, height) of every allowed orientation of each rect
+    orientations = [
+        {
+            angle: tuple(grid.up(d) for d in rotated_size(w_true, h_true, angle))
+            for angle in allowed
+        }
+        for (w_true, h_true), allowed in zip(rects, rotations)
+    ]
 
-    # Maximum size
-    x_sum = max(1, sum(math.ceil(w * _SCALE) for w, _ in rects))
-    y_sum = max(1, sum(math.ceil(h * _SCALE) for h, _ in rects))
-
-    # Basic coordinate variables
-    x = [model.NewIntVar(0, x_sum, f"x[{i}]") for i in range(n)]
-    y = [model.NewIntVar(0, y_sum, f"y[{i}]") for i in range(n)]
+    # Fixed rects cover every grid cell they touch
+    fixed_scaled = [None] * n
+    for i, p in enumerate(fixed):
+        if p is None:
+            continue
+        fx, fy = grid.down(p[0]), grid.down(p[1])
+        fixed_scaled[i] = (fx, fy)
+        orientations[i] = {
+            0: (grid.up(p[0] + rects[i][0]) - fx, grid.up(p[1] + rects[i][1]) - fy)
+        }
+
+    # Without fixed rects the packing's bottom left is the origin. Fixed rects
+    # pin it down, so free rects may go left of and below them; then the
+    # packing's left and bottom edges are the smallest coordinates instead
+    has_fixed = any(p is not None for p in fixed)
+
+    def low(values: list) -> int:
+        return min(values) if has_fixed else 0
+
+    def scaled_pin(i: int, px: float, py: float, angle: int) -> tuple[int, int]:
+        rx, ry = rotate_point(px, py, *rects[i], angle)
+        return grid.nearest(rx), grid.nearest(ry)
+
+    def objective_of(xs: list, ys: list, angles: list) -> int:
+        """The model's objective for a given placement (in scaled units)."""
+
+        def pin(i, location):
+            rx, ry = scaled_pin(i, *location, angles[i])
+            return xs[i] + rx, ys[i] + ry
+
+        size = (
+            max(xs[i] + orientations[i][angles[i]][0] for i in range(n))
+            - low(xs)
+            + max(ys[i] + orientations[i][angles[i]][1] for i in range(n))
+            - low(ys)
+        )
+        wire = 0
+        for w in wires:
+            (sx, sy), (dx, dy) = pin(w.source, w.location_source), pin(
+                w.dest, w.location_dest
+            )
+            coeff = max(1, round(w.weight * _WIRE_WEIGHT_STEPS))
+            wire += coeff * (abs(sx - dx) + abs(sy - dy))
+        for net in nets or []:
+            if len({i for i, _ in net.members}) < 2:
+                continue
+            points = [pin(i, location) for i, location in net.members]
+            coeff = max(1, round(net.weight * _WIRE_WEIGHT_STEPS))
+            wire += coeff * (
+                max(p[0] for p in points)
+                - min(p[0] for p in points)
+                + max(p[1] for p in points)
+                - min(p[1] for p in points)
+            )
+        return _LAMBDA_SIZE * _WIRE_WEIGHT_STEPS * size + _LAMBDA_WIRE * wire
 
-    # Overlap constrains
-    x_intervals = []
-    y_intervals = []
+    # Edge constrained rects: the sides each can take, with the rotations it
+    # may have there
+    edges = [
+        edge_constraint(c) if p is None else None for c, p in zip(constraints, fixed)
+    ]
+    sides = [
+        side_options(c, tuple(orientations[i])) if c is not None else None
+        for i, c in enumerate(edges)
+    ]
 
-    for i, (w_true, h_true) in enumerate(rects):
-        w_scaled = math.ceil(w_true * _SCALE)
-        h_scaled = math.ceil(h_true * _SCALE)
+    # Greedy placement: the default start (warm start, upper bound and fallback)
+    greedy_angles = [0 if 0 in o else next(iter(o)) for o in orientations]
+    greedy_sides = [None] * n
+    for i, c in enumerate(edges):
+        if c is not None:
+            side, greedy_angles[i] = start_side(c, tuple(orientations[i]))
+            greedy_sides[i] = EdgeConstraint((side,))
+    greedy = pack_greedy(
+        [orientations[i][a] for i, a in enumerate(greedy_angles)],
+        [
+            (
+                w.source,
+                w.dest,
+                scaled_pin(w.source, *w.location_source, greedy_angles[w.source]),
+                scaled_pin(w.dest, *w.location_dest, greedy_angles[w.dest]),
+                w.weight,
+            )
+            for w in wires
+        ],
+        greedy_sides,
+        [
+            (
+                [(i, scaled_pin(i, *loc, greedy_angles[i])) for i, loc in net.members],
+                net.weight,
+            )
+            for net in nets or []
+        ],
+        fixed_scaled,
+    )
+    start_x = [p[0] for p in greedy.positions]
+    start_y = [p[1] for p in greedy.positions]
+    start_angles = greedy_angles
+    start_objective = objective_of(start_x, start_y, start_angles)
+
+    def on_edges(xs: list, ys: list, angles: list) -> bool:
+        sizes = [orientations[i][angles[i]] for i in range(n)]
+        left, bottom = low(xs), low(ys)
+        width = max(xs[i] + sizes[i][0] for i in range(n)) - left
+        height = max(ys[i] + sizes[i][1] for i in range(n)) - bottom
+        return all(
+            on_edge(
+                edges[i],
+                (
+                    xs[i] - left,
+                    ys[i] - bottom,
+                    xs[i] - left + sizes[i][0],
+                    ys[i] - bottom + sizes[i][1],
+                ),
+                angles[i],
+                width,
+                height,
+            )
+            for i in range(n)
+        )
 
-        x_intervals.append(
-            model.NewFixedSizeIntervalVar(x[i], w_scaled, f"x_intervals[{i}]")
+    # The greedy placement can only miss an edge when fixed rects are in the
+    # way; then it is just a hint and bounds nothing
+    start_legal = on_edges(start_x, start_y, start_angles)
+    if not start_legal:
+        print("⚠️ Greedy placement misses an edge constraint; using it as a hint only")
+
+    # Multiresolution: a solve on the coarse grid is also a legal placement on
+    # this one (every coarse cell is whole fine cells), so if it beats the
+    # greedy one it becomes the start and the search stays close to it
+    window = None
+    coarse_step = options.coarse_grid_step
+    if coarse_step is not None and coarse_step > grid.step:
+        ratio = coarse_step / grid.step
+        if abs(ratio - round(ratio)) > 1e-9:
+            raise ValueError("coarse_grid_step must be a multiple of grid_step")
+        coarse_time = options.max_time_in_seconds * options.coarse_time_fraction
+        coarse = pack_components_general(
+            rects,
+            wires,
+            constraints,
+            replace(
+                options,
+                grid_step=coarse_step,
+                coarse_grid_step=None,
+                max_time_in_seconds=coarse_time,
+            ),
+            nets,
+            rotations if rotations_given else None,
+            fixed if has_fixed else None,
         )
-        y_intervals.append(
-            model.NewFixedSizeIntervalVar(y[i], h_scaled, f"y_intervals[{i}]")
+        options = replace(
+            options, max_time_in_seconds=options.max_time_in_seconds - coarse_time
         )
 
-    model.AddNoOverlap2D(x_intervals, y_intervals)
+        coarse_x = [
+            grid.down(p[0]) if fixed[i] is None else fixed_scaled[i][0]
+            for i, p in enumerate(coarse[:n])
+        ]
+        coarse_y = [
+            grid.down(p[1]) if fixed[i] is None else fixed_scaled[i][1]
+            for i, p in enumerate(coarse[:n])
+        ]
+        coarse_angles = [p[2] if len(p) > 2 else 0 for p in coarse[:n]]
+        coarse_objective = objective_of(coarse_x, coarse_y, coarse_angles)
+        # Edge rects flush with a coarse edge may not be flush with a fine one
+        if (coarse_objective <= start_objective or not start_legal) and on_edges(
+            coarse_x, coarse_y, coarse_angles
+        ):
+            print(
+                f"Coarse {coarse_step:g} grid pass: objective {coarse_objective} "
+                f"(greedy {start_objective}); refining around it"
+            )
+            start_x, start_y, start_angles = coarse_x, coarse_y, coarse_angles
+            start_objective = coarse_objective
+            start_legal = True
+            window = math.ceil(options.refine_window * ratio)
+        else:
+            print(
+                f"Coarse {coarse_step:g} grid pass did not beat greedy; "
+                "searching the full grid"
+            )
 
-    # Size of grid determined from locations
-    w_used = model.NewIntVar(0, x_sum, "w_used")
-    h_used = model.NewIntVar(0, y_sum, "h_used")
+    # Interchangeable rects can trade places without changing anything, so only
+    # one ordering of each group is searched; the start follows it
+    symmetric = _interchangeable(
+        orientations, edges, fixed, wires, nets or [], scaled_pin
+    )
+    for group in symmetric:
+        placed = sorted((start_x[i], start_y[i], start_angles[i]) for i in group)
+        for i, (sx, sy, angle) in zip(group, placed):
+            start_x[i], start_y[i], start_angles[i] = sx, sy, angle
+    start_width = max(
+        start_x[i] + orientations[i][start_angles[i]][0] for i in range(n)
+    )
+    start_height = max(
+        start_y[i] + orientations[i][start_angles[i]][1] for i in range(n)
+    )
 
-    model.AddMaxEquality(
-        w_used, [x[i] + math.ceil(rects[i][0] * _SCALE) for i in range(n)]
+    # Bounds. The start placement is feasible, so the optimum costs no more
+    # than it does and its width + height is at most the size part of that.
+    # From below: the largest rect, and the area of the free rects (fixed ones
+    # may overlap each other)
+    free = [i for i in range(n) if fixed[i] is None]
+    area = sum(min(w * h for w, h in orientations[i].values()) for i in free)
+    w_lb = max(
+        min(w for w, _ in o.values()) + (p[0] if p is not None else 0)
+        for o, p in zip(orientations, fixed_scaled)
     )
-    model.AddMaxEquality(
-        h_used, [y[i] + math.ceil(rects[i][1] * _SCALE) for i in range(n)]
+    h_lb = max(
+        min(h for _, h in o.values()) + (p[1] if p is not None else 0)
+        for o, p in zip(orientations, fixed_scaled)
     )
+    if start_legal and not has_fixed:
+        size_ub = start_objective // (_LAMBDA_SIZE * _WIRE_WEIGHT_STEPS)
+        w_ub = max(1, size_ub - h_lb)
+        h_ub = max(1, size_ub - w_lb)
+    else:
+        # Free rects in a row beyond the fixed ones, either way round (the
+        # start only bounds the packing's size, not where it ends)
+        fixed_reach = max(
+            (max(p) + max(orientations[i][0]) for i, p in enumerate(fixed_scaled) if p),
+            default=0,
+        )
+        w_ub = h_ub = fixed_reach + sum(
+            max(max(size) for size in orientations[i].values()) for i in free
+        )
+    w_lb = max(w_lb, math.ceil(area / h_ub))
+    h_lb = max(h_lb, math.ceil(area / w_ub))
+    size_lb = max(w_lb + h_lb, math.ceil(2 * math.sqrt(area)))
 
-    # Add edge constraints for components that must be on the edge
-    for i in range(n):
-        if constraints[i]:  # Only add edge constraints for components that require it
-            w_scaled = math.ceil(rects[i][0] * _SCALE)
-            h_scaled = math.ceil(rects[i][1] * _SCALE)
+    # Maximum size; every rect, pin and net box is inside the bounding box
+    x_sum = w_ub
+    y_sum = h_ub
 
-            b_left = model.NewBoolVar(f"on_left[{i}]")
-            b_bottom = model.NewBoolVar(f"on_bottom[{i}]")
-            b_right = model.NewBoolVar(f"on_right[{i}]")
-            b_top = model.NewBoolVar(f"on_top[{i}]")
+    # Basic coordinate variables
+    x = [
+        (
+            model.NewIntVar(
+                0, x_sum - min(w for w, _ in orientations[i].values()), f"x[{i}]"
+            )
+            if fixed_scaled[i] is None
+            else model.NewConstant(fixed_scaled[i][0])
+        )
+        for i in range(n)
+    ]
+    y = [
+        (
+            model.NewIntVar(
+                0, y_sum - min(h for _, h in orientations[i].values()), f"y[{i}]"
+            )
+            if fixed_scaled[i] is None
+            else model.NewConstant(fixed_scaled[i][1])
+        )
+        for i in range(n)
+    ]
 
-            # If bool is true then what is implied by the bool must be true
-            model.Add(x[i] == 0).OnlyEnforceIf(b_left)
-            model.Add(y[i] == 0).OnlyEnforceIf(b_bottom)
-            model.Add(x[i] + w_scaled == w_used).OnlyEnforceIf(b_right)
-            model.Add(y[i] + h_scaled == h_used).OnlyEnforceIf(b_top)
+    # Overlap constrains
+    x_intervals = []
+    y_intervals = []
+    interval_owner = []
+
+    # Per rect: angle -> literal that is true when the rect uses that rotation
+    # (None for rects with a single allowed orientation)
+    rotation_lits = []
+    widths = []
+    heights = []
+
+    for i, options_i in enumerate(orientations):
+        if len(options_i) == 1:
+            ((angle, (w_scaled, h_scaled)),) = options_i.items()
+            x_intervals.append(
+                model.NewFixedSizeIntervalVar(x[i], w_scaled, f"x_intervals[{i}]")
+            )
+            y_intervals.append(
+                model.NewFixedSizeIntervalVar(y[i], h_scaled, f"y_intervals[{i}]")
+            )
+            interval_owner.append(i)
+            rotation_lits.append({angle: None})
+            widths.append(w_scaled)
+            heights.append(h_scaled)
+            continue
+
+        # One optional interval pair per orientation, exactly one of them present
+        lits = {}
+        for angle, (w_scaled, h_scaled) in options_i.items():
+            lit = model.NewBoolVar(f"rot[{i}][{angle}]")
+            lits[angle] = lit
+            x_intervals.append(
+                model.NewOptionalFixedSizeIntervalVar(
+                    x[i], w_scaled, lit, f"x_intervals[{i}][{angle}]"
+                )
+            )
+            y_intervals.append(
+                model.NewOptionalFixedSizeIntervalVar(
+                    y[i], h_scaled, lit, f"y_intervals[{i}][{angle}]"
+                )
+            )
+            interval_owner.append(i)
+        model.AddExactlyOne(lits.values())
+
+        rotation_lits.append(lits)
+        widths.append(sum(lits[a] * w for a, (w, _) in options_i.items()))
+        heights.append(sum(lits[a] * h for a, (_, h) in options_i.items()))
+
+    if all(p is None for p in fixed):
+        model.AddNoOverlap2D(x_intervals, y_intervals)
+    else:
+        # Fixed rects may overlap each other, so each is checked against the
+        # free rects on its own
+        free = [k for k, i in enumerate(interval_owner) if fixed[i] is None]
+        model.AddNoOverlap2D(
+            [x_intervals[k] for k in free], [y_intervals[k] for k in free]
+        )
+        for k, i in enumerate(interval_owner):
+            if fixed[i] is not None:
+                model.AddNoOverlap2D(
+                    [x_intervals[j] for j in free] + [x_intervals[k]],
+                    [y_intervals[j] for j in free] + [y_intervals[k]],
+                )
 
-            # At least one bool must be true (component must be on at least one edge)
-            model.AddBoolOr([b_left, b_bottom, b_right, b_top])
+    # Size of grid determined from locations
+    w_used = model.NewIntVar(w_lb, w_ub, "w_used")
+    h_used = model.NewIntVar(h_lb, h_ub, "h_used")
+    model.Add(w_used + h_used >= size_lb)
+
+    model.AddMaxEquality(w_used, [x[i] + widths[i] for i in range(n)])
+    model.AddMaxEquality(h_used, [y[i] + heights[i] for i in range(n)])
+    if has_fixed:
+        left = model.NewIntVar(0, x_sum, "left")
+        bottom = model.NewIntVar(0, y_sum, "bottom")
+        model.AddMinEquality(left, x)
+        model.AddMinEquality(bottom, y)
+    else:
+        left = bottom = 0
+
+    # Edge constraints as a side assignment: exactly one allowed side per
+    # rect, which forces its facing rotation, and the rects given the same
+    # side must fit along it together
+    along = {"left": 1, "right": 1, "bottom": 0, "top": 0}
+    on_side = defaultdict(list)  # side -> (literal or 1, shortest extent along it)
+
+    def place_on(i: int, side: str, lit=None) -> None:
+        flush = {
+            "left": x[i] == left,
+            "bottom": y[i] == bottom,
+            "right": x[i] + widths[i] == w_used,
+            "top": y[i] + heights[i] == h_used,
+        }[side]
+        facing = [
+            rotation_lits[i][angle].Not()
+            for angle in rotation_lits[i]
+            if angle not in sides[i][side] and rotation_lits[i][angle] is not None
+        ]
+        extent = min(orientations[i][a][along[side]] for a in sides[i][side])
+        if lit is None:
+            model.Add(flush)
+            for not_angle in facing:
+                model.AddBoolAnd([not_angle])
+            on_side[side].append((1, extent))
+        else:
+            model.Add(flush).OnlyEnforceIf(lit)
+            for not_angle in facing:
+                model.AddImplication(lit, not_angle)
+            on_side[side].append((lit, extent))
+
+    for i in range(n):
+        if sides[i] is None:
+            continue
+        if not sides[i]:
+            raise ValueError(
+                f"Rect {i} cannot face {edges[i].facing!r} out of any of "
+                f"{edges[i].sides} with rotations {tuple(orientations[i])}"
+            )
+        if len(sides[i]) == 1:
+            (side,) = sides[i]
+            place_on(i, side)
+            continue
+        lits = {side: model.NewBoolVar(f"on_{side}[{i}]") for side in sides[i]}
+        model.AddExactlyOne(lits.values())
+        for side, lit in lits.items():
+            place_on(i, side, lit)
+
+    for side, members in on_side.items():
+        if len(members) > 1:
+            model.Add(
+                sum(extent * lit for lit, extent in members)
+                <= (h_used - bottom if along[side] else w_used - left)
+            )
 
     def endpoint_expr(i: int, px: float, py: float) -> Any:
-        px_scaled = round(px * _SCALE)
-        py_scaled = round(py * _SCALE)
-        sx = x[i] + px_scaled
-        sy = y[i] + py_scaled
+        sx = x[i]
+        sy = y[i]
+        for angle, lit in rotation_lits[i].items():
+            rx, ry = scaled_pin(i, px, py, angle)
+            if lit is None:
+                sx += rx
+                sy += ry
+            else:
+                sx += rx * lit
+                sy += ry * lit
         return sx, sy
 
     wire_abs_terms = []
@@ -128,46 +717,160 @@ def pack_components_general(
         model.AddAbsEquality(dx_abs, dx_diff)
         model.AddAbsEquality(dy_abs, dy_diff)
 
-        wire_abs_terms.append(dx_abs)
-        wire_abs_terms.append(dy_abs)
+        coeff = max(1, round(w.weight * _WIRE_WEIGHT_STEPS))
+        wire_abs_terms.append(coeff * dx_abs)
+        wire_abs_terms.append(coeff * dy_abs)
+
+    for k, net in enumerate(nets or []):
+        if len({i for i, _ in net.members}) < 2:
+            continue
+
+        # Bounding box of the net's pins; minimization keeps it tight, so plain
+        # inequalities are enough (no min/max equalities needed)
+        x_lo = model.NewIntVar(0, x_sum, f"net_x_lo[{k}]")
+        x_hi = model.NewIntVar(0, x_sum, f"net_x_hi[{k}]")
+        y_lo = model.NewIntVar(0, y_sum, f"net_y_lo[{k}]")
+        y_hi = model.NewIntVar(0, y_sum, f"net_y_hi[{k}]")
+
+        for i, location in net.members:
+            px, py = endpoint_expr(i, *location)
+            model.Add(x_lo <= px)
+            model.Add(x_hi >= px)
+            model.Add(y_lo <= py)
+            model.Add(y_hi >= py)
+
+        coeff = max(1, round(net.weight * _WIRE_WEIGHT_STEPS))
+        wire_abs_terms.append(coeff * (x_hi - x_lo))
+        wire_abs_terms.append(coeff * (y_hi - y_lo))
 
     # Minimize
-    size_expr = w_used + h_used
+    size_expr = _WIRE_WEIGHT_STEPS * (w_used - left + h_used - bottom)
     wire_expr = cp_model.LinearExpr.Sum(wire_abs_terms) if wire_abs_terms else 0
-    model.Minimize(_LAMBDA_SIZE * size_expr + _LAMBDA_WIRE * wire_expr)
+    objective = _LAMBDA_SIZE * size_expr + _LAMBDA_WIRE * wire_expr
+    model.Minimize(objective)
+    if start_legal:
+        model.Add(objective <= start_objective)
+
+    # Lexicographic (x, y) order within each group of interchangeable rects
+    for group in symmetric:
+        for a, b in zip(group, group[1:]):
+            model.Add(x[a] * (y_sum + 1) + y[a] < x[b] * (y_sum + 1) + y[b])
+
+    # Refining a coarse answer: every free rect stays within the window
+    if window is not None:
+        for i in range(n):
+            if fixed[i] is None:
+                model.Add(x[i] >= start_x[i] - window)
+                model.Add(x[i] <= start_x[i] + window)
+                model.Add(y[i] >= start_y[i] - window)
+                model.Add(y[i] <= start_y[i] + window)
+
+    # Warm start from the start placement
+    for i in range(n):
+        if fixed[i] is not None:
+            continue
+        model.AddHint(x[i], start_x[i])
+        model.AddHint(y[i], start_y[i])
+        for angle, lit in rotation_lits[i].items():
+            if lit is not None:
+                model.AddHint(lit, angle == start_angles[i])
+    model.AddHint(w_used, start_width)
+    model.AddHint(h_used, start_height)
+
+    def read_solution(value, boolean_value):
+        xs = [value(x[i]) for i in range(n)]
+        ys = [value(y[i]) for i in range(n)]
+        angles = [
+            next(
+                a
+                for a, lit in rotation_lits[i].items()
+                if lit is None or boolean_value(lit)
+            )
+            for i in range(n)
+        ]
+        return xs, ys, angles, value(w_used), value(h_used)
+
+    def solution(xs, ys, angles, width, height):
+        sol = []
+        for i in range(len(rects)):
+            if fixed[i] is not None:
+                xi, yi = fixed[i]
+            else:
+                xi, yi = grid.to_units(xs[i]), grid.to_units(ys[i])
+            if rotations_given:
+                sol.append((xi, yi, angles[i]))
+            else:
+                sol.append((xi, yi))
+        sol.append((grid.to_units(width), grid.to_units(height)))
+        return sol
+
+    def report(monitor: _SearchMonitor) -> bool:
+        progress = SolutionProgress(
+            solution(*read_solution(monitor.Value, monitor.BooleanValue)),
+            monitor.ObjectiveValue(),
+            monitor.BestObjectiveBound(),
+            monitor.WallTime(),
+        )
+        try:
+            return bool(on_solution(progress))
+        except Exception as e:
+            # A broken progress consumer must not lose the placement
+            print(f"⚠️ Solution callback failed: {e}")
+            return False
 
     # Solve
     solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = 10.0
+    options.apply(solver)
 
-    status = solver.Solve(model)
+    if options.no_improvement_timeout is not None or on_solution is not None:
+        with _SearchMonitor(
+            options.no_improvement_timeout, report if on_solution else None
+        ) as monitor:
+            status = solver.Solve(model, monitor)
+    else:
+        status = solver.Solve(model)
 
     # Get answer
-    if status == cp_model.OPTIMAL:
-        print("Found optimal solution")
-    elif status == cp_model.FEASIBLE:
-        print("Found feasible solution")
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        print(
+            "Found optimal solution"
+            if status == cp_model.OPTIMAL
+            else "Found feasible solution"
+        )
+        use_start = start_legal and solver.ObjectiveValue() > start_objective
+        if use_start:
+            print("Start placement is better; using it")
     elif status == cp_model.INFEASIBLE:
-        raise RuntimeError("Problem is infeasible - no valid packing exists")
+        # The start placement satisfies every constraint, so this means a
+        # bound or symmetry cut was wrong; don't fail the layout over it
+        print("⚠️ Model reported infeasible; using start placement")
+        use_start = True
     elif status == cp_model.MODEL_INVALID:
         raise RuntimeError("Model is invalid - check constraints")
     else:
-        raise RuntimeError(f"Solver failed with status: {status}")
-
-    # Construct solution
-    sol = []
+        print(f"Solver returned {solver.StatusName(status)}; using start placement")
+        use_start = True
 
-    for i in range(len(rects)):
-        xi = solver.Value(x[i]) / _SCALE
-        yi = solver.Value(y[i]) / _SCALE
-        sol.append((xi, yi))
+    if use_start:
+        if not start_legal:
+            print("⚠️ Start placement misses an edge constraint")
+        return solution(start_x, start_y, start_angles, start_width, start_height)
 
-    sol.append(
-        (
-            math.ceil(solver.Value(w_used) / _SCALE),
-            math.ceil(solver.Value(h_used) / _SCALE),
-        )
-    )
+    sol = solution(*read_solution(solver.Value, solver.BooleanValue))
+    if on_solution is not None:
+        try:
+            on_solution(
+                SolutionProgress(
+                    sol,
+                    solver.ObjectiveValue(),
+                    solver.BestObjectiveBound(),
+                    solver.WallTime(),
+                    final=True,
+                )
+            )
+        except Exception as e:
+            # Same as for the intermediate reports: keep the placement
+            print(f"⚠️ Solution callback failed: {e}")
     return sol
 
 
@@ -189,6 +892,10 @@ def generate_visualization(
     Returns:
         Base64 encoded PNG image string
     """
+    # Imported here so packing workers don't pay for matplotlib on startup
+    import matplotlib.patches as patches
+    import matplotlib.pyplot as plt
+
     # Create figure with white background
     fig, ax = plt.subplots(1, 1, figsize=(10, 10), facecolor="white")
     ax.set_facecolor("white")
@@ -435,42 +1142,29 @@ if __name__ == "__main__":
 
     # Pack the rectangles
     try:
-        positions = pack_components_general(rects, wires, constraints)
+        rotations = [ROTATIONS if r else (0,) for r in rot]
+        positions = pack_components_general(
+            rects, wires, constraints, rotations=rotations
+        )
         print("✅ Packing successful!")
         print(f"Rectangle positions: {positions}")
 
+        # Work with the rectangles as placed (rotated sizes and wire endpoints)
+        rects, wires, positions = place_rotated(rects, wires, positions)
+
         # Skip the original single plot - go directly to statistics and double plot
 
         # Print some statistics
+        scores = PlacementProblem(rects, wires, constraints).score_positions(positions)
         total_area = sum(w * h for w, h in rects)
-        bounding_box_w = max(pos[0] + rect[0] for pos, rect in zip(positions, rects))
-        bounding_box_h = max(pos[1] + rect[1] for pos, rect in zip(positions, rects))
-        bounding_area = bounding_box_w * bounding_box_h
-        efficiency = (total_area / bounding_area) * 100 if bounding_area > 0 else 0
+        bounding_area = float(scores.width * scores.height)
 
         print(f"\n📊 Packing Statistics:")
         print(f"Total rectangle area: {total_area:.2f}")
-        print(f"Bounding box: {bounding_box_w:.2f} × {bounding_box_h:.2f}")
+        print(f"Bounding box: {scores.width:.2f} × {scores.height:.2f}")
         print(f"Bounding box area: {bounding_area:.2f}")
-        print(f"Packing efficiency: {efficiency:.1f}%")
-
-        # Calculate total wire length
-        total_wire_length = 0
-        for wire in wires:
-            if wire.source != wire.dest:  # Skip self-connections
-                src_pos = positions[wire.source]
-                dest_pos = positions[wire.dest]
-                src_x = src_pos[0] + wire.location_source[0]
-                src_y = src_pos[1] + wire.location_source[1]
-                dest_x = dest_pos[0] + wire.location_dest[0]
-                dest_y = dest_pos[1] + wire.location_dest[1]
-
-                wire_length = abs(src_x - dest_x) + abs(
-                    src_y - dest_y
-                )  # Manhattan distance
-                total_wire_length += wire_length
-
-        print(f"Total wire length (Manhattan): {total_wire_length:.2f}")
+        print(f"Packing efficiency: {scores.efficiency * 100:.1f}%")
+        print(f"Total wire length (Manhattan): {scores.wirelength:.2f}")
 
         # Test the new generate_visualization function
         print("\n🎨 Testing generate_visualization function...")
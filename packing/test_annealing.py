@@ -0,0 +1,40 @@
+"""
+Fixed rects push the greedy start off the edges; the annealer must not return
+that placement (python -m pytest packing).
+"""
+
+from packing.annealing import pack_components_annealing
+from packing.evaluate import PlacementProblem
+from packing.options import SolverOptions
+from packing.rectangles import pack_components_general
+
+# The greedy start puts the free rects right of the fixed one, so the left
+# constrained rect is not on the packing's left edge
+RECTS = [(10.0, 10.0), (2.0, 2.0), (3.0, 2.0), (2.0, 3.0)]
+CONSTRAINTS = [False, "left", "bottom", False]
+FIXED = [(0.0, 0.0), None, None, None]
+
+
+def _legal(positions) -> bool:
+    problem = PlacementProblem(RECTS, [], CONSTRAINTS, fixed=FIXED)
+    return bool(problem.score_positions(positions).legal())
+
+
+def test_annealing_never_returns_missed_edges():
+    for seed in range(10):
+        positions = pack_components_annealing(
+            RECTS, [], CONSTRAINTS, SolverOptions(random_seed=seed), fixed=FIXED
+        )
+        assert positions is None or _legal(positions)
+
+
+def test_anneal_engine_falls_back_to_cpsat():
+    positions = pack_components_general(
+        RECTS,
+        [],
+        CONSTRAINTS,
+        SolverOptions(engine="anneal", max_time_in_seconds=2.0),
+        fixed=FIXED,
+    )
+    assert positions[0][:2] == FIXED[0]
+    assert _legal(positions)
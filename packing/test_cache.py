@@ -0,0 +1,60 @@
+"""
+The placement cache: relabelled problems share an entry and results come back
+in each caller's own rect order (python -m pytest packing).
+"""
+
+from packing.cache import PlacementCache, canonical_key
+
+# A, B and C with a wire from A to C; the second problem lists them as C, A, B
+RECTS = [(2000, 1000), (1000, 1000), (3000, 2000)]
+WIRES = [(0, 2, (500, 500), (1500, 1000), 1.0)]
+CONSTRAINTS = [False, "left", False]
+POSITIONS = [(0, 0), (0, 1000), (2000, 0), (5000, 2000)]
+
+PERMUTATION = [2, 0, 1]  # New index k holds original rect PERMUTATION[k]
+NEW_INDEX = {original: k for k, original in enumerate(PERMUTATION)}
+
+
+def _permuted():
+    rects = [RECTS[i] for i in PERMUTATION]
+    wires = [(NEW_INDEX[s], NEW_INDEX[d], ls, ld, w) for s, d, ls, ld, w in WIRES]
+    constraints = [CONSTRAINTS[i] for i in PERMUTATION]
+    return rects, wires, constraints
+
+
+def test_relabelled_problems_share_a_key():
+    original = canonical_key(RECTS, WIRES, CONSTRAINTS)
+    permuted = canonical_key(*_permuted())
+    assert original.digest == permuted.digest
+    assert [PERMUTATION[i] for i in permuted.order] == original.order
+
+
+def test_get_maps_results_to_the_callers_order():
+    cache = PlacementCache()
+    cache.put(cache.key(RECTS, WIRES, CONSTRAINTS), POSITIONS)
+
+    positions = cache.get(cache.key(*_permuted()))
+    assert positions[:-1] == [POSITIONS[i] for i in PERMUTATION]
+    assert positions[-1] == POSITIONS[-1]
+    assert cache.get(cache.key(RECTS, WIRES, CONSTRAINTS)) == POSITIONS
+
+
+def test_different_problems_do_not_collide():
+    key = canonical_key(RECTS, WIRES, CONSTRAINTS)
+    rewired = [(1, 2, (500, 500), (1500, 1000), 1.0)]
+    assert canonical_key(RECTS, rewired, CONSTRAINTS).digest != key.digest
+    assert canonical_key(RECTS, WIRES, [False] * 3).digest != key.digest
+    assert canonical_key(RECTS, WIRES, CONSTRAINTS, grid_step=50).digest != key.digest
+    fixed = [(0, 0), None, None]
+    assert canonical_key(RECTS, WIRES, CONSTRAINTS, fixed=fixed).digest != key.digest
+
+
+def test_entries_survive_on_disk(tmp_path):
+    writer = PlacementCache(tmp_path)
+    writer.put(writer.key(RECTS, WIRES, CONSTRAINTS), POSITIONS)
+
+    reader = PlacementCache(tmp_path)
+    assert reader.get(reader.key(*_permuted()))[0] == POSITIONS[PERMUTATION[0]]
+    assert (reader.hits, reader.misses) == (1, 0)
+    reader.clear()
+    assert reader.get(reader.key(RECTS, WIRES, CONSTRAINTS)) is None
@@ -0,0 +1,55 @@
+"""
+PlacementProblem scoring on small hand-checked placements (python -m pytest
+packing).
+"""
+
+import numpy as np
+
+from packing.evaluate import PlacementProblem
+
+RECTS = [(2.0, 2.0), (1.0, 1.0), (1.0, 2.0)]
+WIRES = [(0, 1, (2.0, 1.0), (0.0, 0.5), 2.0)]
+NETS = [([(0, (1.0, 1.0)), (2, (0.5, 1.0))], 1.0)]
+
+
+def test_scores_a_legal_placement():
+    problem = PlacementProblem(RECTS, WIRES, [False, False, "top"], NETS)
+    scores = problem.score_positions([(0, 0), (2, 0), (2, 1)])
+
+    assert scores.legal()
+    assert (scores.width, scores.height) == (3.0, 3.0)
+    assert scores.wire_lengths.tolist() == [0.5]
+    assert scores.net_lengths.tolist() == [2.5]
+    # Bounding box plus the weighted wire and the net half-perimeter
+    assert scores.objective == 3 + 3 + 2 * 0.5 + 2.5
+    assert np.isclose(scores.efficiency, 7 / 9)
+
+
+def test_counts_overlaps_and_missed_edges():
+    problem = PlacementProblem(RECTS, WIRES, [False, "left", "top"], NETS)
+    scores = problem.score_positions([(0, 0), (1, 1), (3, 0)])
+    assert scores.overlaps == 1 and scores.overlap_area == 1.0
+    assert scores.edge_violations == 1  # Rect 1 is inside, rect 2 on the top
+    assert not scores.legal()
+
+    # Touching rects don't overlap
+    assert problem.score_positions([(0, 0), (2, 0), (0, 2)]).overlaps == 0
+
+
+def test_fixed_rects_may_overlap_each_other_and_set_the_frame():
+    fixed = [(5.0, 5.0), (5.5, 5.5), None]
+    problem = PlacementProblem(RECTS, [], ["left", "left", "left"], fixed=fixed)
+    scores = problem.score_positions([(5, 5), (5.5, 5.5), (5, 7)])
+    # Edges are measured from the placement's own bottom left, not from 0
+    assert scores.legal()
+
+
+def test_scores_batches_at_once():
+    problem = PlacementProblem(RECTS, WIRES, [False] * 3, NETS)
+    x = np.array([[0, 2, 2], [0, 0, 3]])
+    y = np.array([[0, 0, 1], [0, 2, 0]])
+    scores = problem.score(x, y)
+    assert scores.objective.shape == (2,)
+    for k in range(2):
+        single = problem.score_positions(list(zip(x[k], y[k])))
+        assert scores.objective[k] == single.objective
@@ -0,0 +1,78 @@
+"""
+Edge constraint normalization and the greedy skyline packer, checked with the
+evaluator (python -m pytest packing).
+"""
+
+import random
+
+import pytest
+
+from packing.edges import (
+    EdgeConstraint,
+    edge_constraint,
+    edge_json,
+    edge_key,
+    facing_angle,
+    side_options,
+)
+from packing.evaluate import PlacementProblem
+from packing.greedy import pack_greedy
+
+
+def test_edge_constraint_forms_agree():
+    assert edge_constraint(False) is None
+    assert edge_constraint(True) == EdgeConstraint()
+    assert edge_constraint("left") == EdgeConstraint(("left",))
+    as_dict = {"sides": ["top", "left"], "facing": "bottom"}
+    assert edge_constraint(as_dict) == EdgeConstraint(("top", "left"), "bottom")
+    # JSON round trips and order-independent keys
+    assert edge_constraint(edge_json(as_dict)) == edge_constraint(as_dict)
+    assert edge_constraint(list(edge_constraint(as_dict))) == edge_constraint(as_dict)
+    assert edge_key(["left", "top"]) == edge_key(["top", "left"])
+    with pytest.raises(ValueError):
+        edge_constraint("middle")
+
+
+def test_facing_picks_the_rotation_for_each_side():
+    assert facing_angle("bottom", "bottom") == 0
+    assert facing_angle("bottom", "right") == 90
+    constraint = EdgeConstraint(("left", "bottom"), facing="bottom")
+    assert side_options(constraint, (0, 90, 180, 270)) == {
+        "left": (270,),
+        "bottom": (0,),
+    }
+    assert side_options(constraint, (0,)) == {"bottom": (0,)}
+
+
+def _random_problem(rng: random.Random, n: int):
+    sizes = [(rng.randint(1, 6), rng.randint(1, 6)) for _ in range(n)]
+    wires = [
+        (rng.randrange(n), rng.randrange(n), (0.5, 0.5), (0.5, 0.5), 1.0)
+        for _ in range(n)
+    ]
+    constraints = [
+        rng.choice([False, False, "left", "bottom", "right", "top"]) for _ in range(n)
+    ]
+    return sizes, wires, constraints
+
+
+def test_greedy_placements_are_legal():
+    rng = random.Random(7)
+    for _ in range(30):
+        n = rng.randint(1, 15)
+        sizes, wires, constraints = _random_problem(rng, n)
+        placed = pack_greedy(sizes, wires, constraints)
+
+        problem = PlacementProblem(sizes, wires, constraints)
+        scores = problem.score_positions(placed.positions)
+        assert scores.legal()
+        assert (scores.width, scores.height) == (placed.width, placed.height)
+
+
+def test_greedy_keeps_fixed_rects_in_place():
+    sizes = [(4, 4), (2, 2), (1, 3)]
+    fixed = [(10, 10), None, None]
+    placed = pack_greedy(sizes, [], [False] * 3, fixed=fixed)
+    assert placed.positions[0] == fixed[0]
+    problem = PlacementProblem(sizes, [], [False] * 3, fixed=fixed)
+    assert problem.score_positions(placed.positions).overlaps == 0
@@ -0,0 +1,47 @@
+"""
+NetGraph weights, large-net handling and its CSR form (python -m pytest packing).
+"""
+
+from packing.netgraph import NetGraph
+
+NETS = {
+    "SIG": ["U1", "R1", "R1"],  # One entry per pad; R1 counts once
+    "CLK": ["U1", "R1"],
+    "GND": ["U1", "R1", "C1", "C2"],
+    "NC": ["C3"],
+}
+
+
+def test_shared_nets_add_up_and_large_nets_are_discounted():
+    graph = NetGraph.from_nets(NETS, large_net_size=3, large_net_weight=0.25)
+    assert graph.weight("R1", "U1") == 2.25
+    assert graph.weight("C1", "C2") == 0.25
+    assert graph.weight("U1", "C3") == 0.0
+    assert "C3" not in graph.index
+
+    dropped = NetGraph.from_nets(NETS, large_net_size=3)
+    assert dropped.weight("R1", "U1") == 2.0
+    assert dropped.weight("C1", "C2") == 0.0
+
+
+def test_csr_lists_every_edge_both_ways():
+    graph = NetGraph.from_nets(NETS, nodes=["C3"])
+    csr = graph.to_csr()
+    assert csr.nodes == graph.nodes
+    assert len(csr.indptr) == len(graph.nodes) + 1
+    assert len(csr.indices) == 2 * len(graph.edges())
+
+    for i, ref in enumerate(csr.nodes):
+        row = range(csr.indptr[i], csr.indptr[i + 1])
+        neighbours = [csr.indices[k] for k in row]
+        assert neighbours == sorted(neighbours)
+        for k in row:
+            assert csr.weights[k] == graph.weight(ref, csr.nodes[csr.indices[k]])
+    isolated = graph.index["C3"]
+    assert csr.indptr[isolated] == csr.indptr[isolated + 1]
+
+
+def test_quotient_edges_sum_between_groups():
+    graph = NetGraph.from_nets(NETS)
+    groups = {"U1": 0, "R1": 0, "C1": 1, "C2": 2}
+    assert graph.quotient_edges(groups) == {(0, 1): 2.0, (0, 2): 2.0, (1, 2): 1.0}
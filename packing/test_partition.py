@@ -0,0 +1,63 @@
+"""
+Bisection and hierarchy building, including the tiny graphs whose balance
+window used to let every node move to one side (python -m pytest packing).
+"""
+
+from packing.partition import bisect, build_hierarchy, split
+
+TRIANGLE = [(0, 1, 1.0), (1, 2, 1.0), (0, 2, 1.0)]
+
+
+def _two_cliques(size: int, bridge: float = 0.1):
+    """Two dense cliques of `size` nodes joined by one light edge."""
+    edges = []
+    for base in (0, size):
+        edges += [
+            (base + a, base + b, 1.0) for a in range(size) for b in range(a + 1, size)
+        ]
+    return edges + [(0, size, bridge)]
+
+
+def test_bisect_keeps_both_sides_on_tiny_graphs():
+    for n, edges in [(2, [(0, 1, 1.0)]), (3, TRIANGLE), (3, [(0, 1, 1), (1, 2, 1)])]:
+        side = bisect(n, edges)
+        assert len(side) == n
+        assert any(side) and not all(side)
+
+
+def test_bisect_cuts_the_light_bridge():
+    side = bisect(8, _two_cliques(4))
+    assert len(set(side[:4])) == 1 and len(set(side[4:])) == 1
+    assert side[0] != side[4]
+
+
+def test_bisect_splits_disconnected_graphs_along_components():
+    edges = [(0, 1, 1.0), (1, 2, 1.0), (3, 4, 1.0), (4, 5, 1.0)]
+    side = bisect(6, edges)
+    assert side[0] == side[1] == side[2] != side[3] == side[4] == side[5]
+
+
+def test_split_covers_every_node_within_max_size():
+    for n, edges, max_size in [
+        (2, [(0, 1, 1.0)], 1),
+        (3, TRIANGLE, 2),
+        (3, [(0, 1, 1), (1, 2, 1)], 2),
+        (8, _two_cliques(4), 4),
+        (9, [], 2),
+    ]:
+        parts = split(n, edges, max_size)
+        assert sorted(node for part in parts for node in part) == list(range(n))
+        assert all(1 <= len(part) <= max_size for part in parts)
+
+
+def test_build_hierarchy_bounds_every_cluster():
+    for n, edges in [
+        (3, [(0, 1, 1.0), (1, 2, 1.0)]),
+        (3, TRIANGLE),
+        (8, _two_cliques(4)),
+    ]:
+        tree = build_hierarchy(n, edges, 2)
+        items = sorted(item for leaf in tree.leaves() for item in leaf.items)
+        assert items == list(range(n))
+        assert all(len(leaf.items) <= 2 for leaf in tree.leaves())
+        assert all(len(node.children) <= 2 for level in tree.levels() for node in level)
@@ -1,7 +1,15 @@
+import atexit
 import base64
+import hashlib
 import io
+import json
 import os as _os
+import queue
+import subprocess
 import sys as _sys
+import threading
+import time
+import urllib.request
 
 import matplotlib.patches as patches
 import matplotlib.pyplot as plt
@@ -11,18 +19,101 @@ _os.add_dll_directory(r"C:\Program Files\KiCad\9.0\bin")
 _sys.path.append(r"C:\Program Files\KiCad\9.0\bin\Lib\site-packages")
 
 from collections import defaultdict
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
 
 import pcbnew
 
-_BB_PADDING = 0
+_sys.path.append(str(Path(__file__).parent.parent))
+
+from packing.cache import PlacementCache, default_cache_dir
+from packing.evaluate import PlacementProblem
+from packing.geometry import DEFAULT_GRID_STEP, ROTATIONS, place_rotated, rotate_point
+from packing.instances import Instance, save_instance
+from packing.netgraph import CSRGraph, NetGraph
+from packing.partition import Cluster, attach, build_hierarchy
+
+# Courtesy clearance (nm) kept on every side of a footprint unless
+# solve_layout is given one for its reference; neighbours end up with the sum
+# of their margins between them
+_DEFAULT_MARGIN = 0
+
+# Nets with more parts than this (GND, supply rails) only count for a fraction
+# of a normal net when weighting connections
+_LARGE_NET_SIZE = 8
+_LARGE_NET_WEIGHT = 0.25
+
+# "hpwl" scores each net by its half-perimeter; "pairwise" uses one wire per
+# pair of connected parts
+_DEFAULT_OBJECTIVE = "hpwl"
+
+# CP-SAT time budget. Group packs get a budget that grows with the problem
+# size; only the board-level pack gets the full limit.
+_TOP_LEVEL_TIME_LIMIT = 10.0
+_GROUP_TIME_BASE = 0.2
+_GROUP_TIME_PER_RECT = 0.05
+_GROUP_TIME_PER_WIRE = 0.01
+_GROUP_GAP_LIMIT = 0.01
+
+# Packing grid (nm per grid unit). Everything the packers return is a whole
+# number of steps; a coarser grid trades precision for smaller domains
+_GRID_STEP = DEFAULT_GRID_STEP
+# Packs of at least this many parts are first solved on a 50 um grid and then
+# refined on the packing grid around that answer
+_COARSE_GRID_STEP = 50_000
+_COARSE_MIN_RECTS = 8
+
+# Every pack streams its improving solutions; the layout takes one as good
+# enough once it is within this gap of the proven bound
+_ACCEPT_GAP = 0.02
+
+# Backend endpoint that shows layout progress in /buildstatus, and how often
+# each pack may post to it
+_PROGRESS_URL = _os.environ.get(
+    "WIREHEAD_PROGRESS_URL", "http://127.0.0.1:8000/layoutprogress"
+)
+_PROGRESS_INTERVAL = 0.5
+
+# Where solve_layout saves the laid-out board by default
+_OUTPUT_BOARD = Path(
+    "C:\\Users\\alexl\\Documents\\KiCad Projects\\remote-controll\\testing.kicad_pcb"
+)
+
+# Groups (and levels of groups) with more packing units than this are split
+# with the graph partitioner and packed level by level, so every CP-SAT
+# problem stays small enough to solve quickly
+_MAX_CLUSTER_SIZE = 24
+
+# Packing runs in separate Python processes so ortools never shares an
+# address space with KiCad's DLLs. Workers are kept warm between calls.
+_WORKER_SCRIPT = Path(__file__).parent / "ortools_subprocess.py"
+_MAX_PACKING_WORKERS = _os.cpu_count() or 1
+_PACKING_WORKERS = min(4, _MAX_PACKING_WORKERS)
 
 
 @dataclass
 class SingleItemInfo:
     size: tuple[float, float]
     name: str
+    # net -> centroid of the footprint's pads on that net, relative to its
+    # bottom left with y pointing up (the packer's frame)
+    pins: dict[str, tuple[float, float]] = field(default_factory=dict)
+    margin: float = 0  # Included in size and pins
+
+
+def footprint_margin(ref: str, margins: dict[str, float] | None = None) -> float:
+    if margins and ref in margins:
+        return margins[ref]
+    return _DEFAULT_MARGIN
+
+
+def _centroid(points) -> tuple[float, float]:
+    points = list(points)
+    return (
+        sum(p[0] for p in points) / len(points),
+        sum(p[1] for p in points) / len(points),
+    )
 
 
 def get_fp_rect(fp):
@@ -30,185 +121,635 @@ def get_fp_rect(fp):
     return fp.GetBoundingBox()
 
 
-def get_items_infos(pcb_path: Path, refs: list[str]) -> list[SingleItemInfo]:
-    board = pcbnew.LoadBoard(pcb_path)
+@dataclass
+class PadInfo:
+    ref: str
+    name: str
+    net: str
+    position: tuple[int, int]  # board coordinates (nm)
+
+
+@dataclass
+class FootprintInfo:
+    ref: str
+    name: str
+    bbox: tuple[int, int, int, int]  # left, top, right, bottom (nm)
+    pads: list[PadInfo]
+
+    @property
+    def size(self) -> tuple[int, int]:
+        left, top, right, bottom = self.bbox
+        return right - left, bottom - top
+
+    def pin_locations(self) -> dict[str, tuple[float, float]]:
+        """
+        Centroid of this footprint's pads on each net, relative to the bounding
+        box's bottom left. KiCad's y axis points down, so y is flipped to match
+        the packer, whose (0, 0) is the bottom left.
+        """
+        left, _, _, bottom = self.bbox
+        by_net = defaultdict(list)
+        for pad in self.pads:
+            if pad.net:
+                by_net[pad.net].append(
+                    (pad.position[0] - left, bottom - pad.position[1])
+                )
+        return {net: _centroid(points) for net, points in by_net.items()}
+
+
+@dataclass
+class BoardModel:
+    """
+    Everything the layout needs from a .kicad_pcb, read with a single LoadBoard.
+
+    `footprints` keeps the board's footprint order; `nets` maps each net name
+    to the pads on it.
+    """
+
+    board: "pcbnew.BOARD"
+    footprints: dict[str, FootprintInfo]
+    nets: dict[str, list[PadInfo]]
+    path: Path | None = None
+
+    @classmethod
+    def load(cls, pcb_path: Path) -> "BoardModel":
+        board = pcbnew.LoadBoard(str(pcb_path))
+        footprints = {}
+        nets = defaultdict(list)
+
+        for fp in board.GetFootprints():
+            ref = fp.GetReference()
+            bbox = get_fp_rect(fp)
+
+            # Try different methods to get a meaningful name for the footprint
+            try:
+                name = fp.GetFPID().GetLibItemName().GetUTF8()  # Library footprint name
+            except:
+                name = ref  # Component reference (e.g., U1, R1)
+
+            pads = []
+            for pad in fp.Pads():
+                position = pad.GetPosition()
+                pad_info = PadInfo(
+                    ref=ref,
+                    name=pad.GetName(),
+                    net=pad.GetNetname(),
+                    position=(position.x, position.y),
+                )
+                pads.append(pad_info)
+                if pad_info.net:
+                    nets[pad_info.net].append(pad_info)
+
+            footprints[ref] = FootprintInfo(
+                ref=ref,
+                name=name,
+                bbox=(bbox.GetLeft(), bbox.GetTop(), bbox.GetRight(), bbox.GetBottom()),
+                pads=pads,
+            )
+
+        print(
+            f"Loaded {len(footprints)} footprints and {len(nets)} nets from {pcb_path}"
+        )
+        return cls(
+            board=board, footprints=footprints, nets=dict(nets), path=Path(pcb_path)
+        )
+
+    @property
+    def refs(self) -> list[str]:
+        return list(self.footprints)
+
+    def find_footprint(self, ref: str):
+        return self.board.FindFootprintByReference(ref)
+
+
+def get_items_infos(
+    board: BoardModel, refs: list[str], margins: dict[str, float] | None = None
+) -> list[SingleItemInfo]:
     sizes = []
 
-    # Get all available footprint references for debugging
-    all_footprints = list(board.GetFootprints())
-    available_refs = [fp.GetReference() for fp in all_footprints]
-    print(f"Available footprint references: {sorted(available_refs)}")
     print(f"Looking for: {refs}")
 
     for r in refs:
-        f = board.FindFootprintByReference(r)
+        f = board.footprints.get(r)
 
         if f is None:
             print(f"⚠️ Warning: Footprint '{r}' not found on PCB")
             continue
 
-        bbox = get_fp_rect(f)
-        width = bbox.GetWidth() + _BB_PADDING
-        height = bbox.GetHeight() + _BB_PADDING
-
-        # Try different methods to get a meaningful name for the footprint
-        try:
-            name = f.GetFPID().GetLibItemName().GetUTF8()  # Library footprint name
-        except:
-            try:
-                name = f.GetReference()  # Component reference (e.g., U1, R1)
-            except:
-                name = "Unknown"
-
-        sizes.append(SingleItemInfo(size=(width, height), name=name))
-        print(f"✅ Found '{r}': {width}x{height} ({name})")
+        # The margin goes on every side, so the footprint sits in the middle
+        margin = footprint_margin(r, margins)
+        width = f.size[0] + 2 * margin
+        height = f.size[1] + 2 * margin
+        pins = {
+            net: (px + margin, py + margin)
+            for net, (px, py) in f.pin_locations().items()
+        }
+
+        sizes.append(
+            SingleItemInfo(size=(width, height), name=f.name, pins=pins, margin=margin)
+        )
+        print(f"✅ Found '{r}': {width}x{height} ({f.name})")
 
     return sizes
 
 
-def pack_components_via_subprocess(rects, wires_data, constraints):
+def solver_options_for(
+    n_rects: int,
+    n_wires: int,
+    top_level: bool = False,
+    grid_step: float = _GRID_STEP,
+    search_workers: int | None = None,
+) -> dict:
     """
-    Call pack_components_general via subprocess to avoid DLL conflicts.
+    Size the CP-SAT budget from the problem size. `search_workers` caps the
+    CP-SAT workers when other packs run at the same time.
 
-    Args:
-        rects: list of (width, height) tuples
-        wires_data: list of tuples (source_idx, dest_idx, source_location, dest_location)
-        constraints: list of booleans for edge constraints
+    Returns a dict of SolverOptions fields for the packing subprocess.
+    """
+    # The coarse grid has to be a whole number of packing grid steps
+    factor = round(_COARSE_GRID_STEP / grid_step)
+    coarse_grid_step = (
+        grid_step * factor if factor >= 2 and n_rects >= _COARSE_MIN_RECTS else None
+    )
 
-    Returns:
-        list of (x, y) positions for each rectangle, or None if failed
+    if top_level:
+        return {
+            "max_time_in_seconds": _TOP_LEVEL_TIME_LIMIT,
+            "num_workers": search_workers or 0,
+            "no_improvement_timeout": _TOP_LEVEL_TIME_LIMIT / 2,
+            "grid_step": grid_step,
+            "coarse_grid_step": coarse_grid_step,
+        }
+
+    time_limit = min(
+        _TOP_LEVEL_TIME_LIMIT,
+        _GROUP_TIME_BASE
+        + _GROUP_TIME_PER_RECT * n_rects
+        + _GROUP_TIME_PER_WIRE * n_wires,
+    )
+    return {
+        "max_time_in_seconds": time_limit,
+        # Tiny groups are solved faster by one worker than by a portfolio
+        "num_workers": min(1 if n_rects <= 4 else 8, search_workers or 8),
+        "relative_gap_limit": _GROUP_GAP_LIMIT,
+        "no_improvement_timeout": time_limit / 4,
+        "grid_step": grid_step,
+        "coarse_grid_step": coarse_grid_step,
+    }
+
+
+class PackingWorker:
+    """One long-lived `ortools_subprocess.py serve` process."""
+
+    def __init__(self):
+        self._next_id = 0
+        self._start()
+
+    def _start(self):
+        self.process = subprocess.Popen(
+            [_sys.executable, str(_WORKER_SCRIPT), "serve"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+
+    def request(self, payload: dict, on_progress=None) -> dict:
+        """
+        Send one request and block until its response line arrives.
+
+        With on_progress the worker streams every improved solution to it
+        first; on_progress returning True accepts that solution and ends the
+        search early (for a batch, the search of the problem at its "index").
+        """
+        if self.process.poll() is not None:
+            print(f"⚠️ Packing worker exited ({self.process.returncode}), restarting")
+            self._start()
+
+        self._next_id += 1
+        payload = {**payload, "id": self._next_id, "stream": on_progress is not None}
+
+        self.process.stdin.write(json.dumps(payload) + "\n")
+        self.process.stdin.flush()
+
+        accepted = set()
+        while True:
+            line = self.process.stdout.readline()
+            if not line:
+                raise RuntimeError("Packing worker closed its output")
+
+            response = json.loads(line)
+            if response.get("id") != self._next_id:
+                raise RuntimeError(f"Packing worker answered out of order: {response}")
+            if response.get("event") != "solution":
+                return response
+
+            index = response.get("index")
+            if on_progress is None or not on_progress(response):
+                continue
+            if response.get("final") or index in accepted:
+                continue  # That search is already over
+            accepted.add(index)
+            self.process.stdin.write(
+                json.dumps({"op": "accept", "id": self._next_id, "index": index}) + "\n"
+            )
+            self.process.stdin.flush()
+
+    def close(self):
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.write(json.dumps({"op": "shutdown"}) + "\n")
+                self.process.stdin.close()
+                self.process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+
+
+class PackingWorkerPool:
+    """A fixed set of warm packing workers; each request borrows an idle one."""
+
+    def __init__(self, size: int = _PACKING_WORKERS):
+        self._workers = []
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self.grow(size)
+
+    @property
+    def size(self) -> int:
+        return len(self._workers)
+
+    def grow(self, size: int):
+        """Start workers until the pool has `size` of them (capped at the CPU count)."""
+        with self._lock:
+            while len(self._workers) < min(size, _MAX_PACKING_WORKERS):
+                worker = PackingWorker()
+                self._workers.append(worker)
+                self._idle.put(worker)
+
+    def request(self, payload: dict, on_progress=None) -> dict:
+        worker = self._idle.get()
+        try:
+            return worker.request(payload, on_progress)
+        except Exception:
+            # Don't hand a worker with a half-read response to the next caller
+            worker.close()
+            worker._start()
+            raise
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        for worker in self._workers:
+            worker.close()
+
+
+_POOL: PackingWorkerPool | None = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_packing_pool() -> PackingWorkerPool:
+    """Return the shared worker pool, starting it on first use."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = PackingWorkerPool()
+            atexit.register(_POOL.close)
+        return _POOL
+
+
+# Packing results shared by every pack in this process and across runs
+_PLACEMENT_CACHE = PlacementCache(default_cache_dir())
+
+
+def placement_is_legal(
+    positions,
+    rects,
+    wires_data,
+    constraints,
+    nets=None,
+    rotations=None,
+    fixed=None,
+    options=None,
+    **_,  # The rest of a pack_batch_via_subprocess problem
+):
     """
-    import json
-    import subprocess
-    import sys
+    Cheap check of packer output (fresh or cached) before it is used: no
+    overlaps, every edge constraint met and no fixed rect moved by more than
+    the grid step it was snapped to.
+    """
+    scores = PlacementProblem(
+        rects, wires_data, constraints, nets, rotations, fixed
+    ).score_positions(positions)
+    step = (options or {}).get("grid_step") or DEFAULT_GRID_STEP
+    moved = sum(
+        abs(positions[i][0] - p[0]) >= step or abs(positions[i][1] - p[1]) >= step
+        for i, p in enumerate(fixed or [])
+        if p is not None
+    )
+    if scores.legal() and not moved:
+        return True
+    print(
+        f"⚠️ Illegal placement: {scores.overlaps} overlapping pairs, "
+        f"{scores.edge_violations} edge constraints missed, "
+        f"{moved} fixed rects moved"
+    )
+    return False
 
-    # Convert wire data to the format expected by subprocess
+
+def _pack_payload(rects, wires_data, constraints, options, nets, rotations, fixed):
+    """The worker's JSON form of one packing problem."""
+    # Convert wire data to the format expected by the worker
     wire_objects = []
-    for source, dest, loc_source, loc_dest in wires_data:
+    for source, dest, loc_source, loc_dest, weight in wires_data:
         wire_objects.append(
             {
                 "source": source,
                 "dest": dest,
                 "location_source": loc_source,
                 "location_dest": loc_dest,
+                "weight": weight,
             }
         )
 
-    # Prepare input data
-    input_data = {"rects": rects, "wires": wire_objects, "constraints": constraints}
+    return {
+        "rects": rects,
+        "wires": wire_objects,
+        "constraints": constraints,
+        "options": options,
+        "nets": [
+            {"members": members, "weight": weight} for members, weight in nets or []
+        ],
+        "rotations": rotations,
+        "fixed": fixed,
+    }
+
+
+def pack_components_via_subprocess(
+    rects,
+    wires_data,
+    constraints,
+    options=None,
+    nets=None,
+    rotations=None,
+    use_cache=True,
+    fixed=None,
+    progress=None,
+):
+    """
+    Call pack_components_general in a packing worker to avoid DLL conflicts.
 
-    try:
-        # Run the packing operation in subprocess
-        result = subprocess.run(
-            [sys.executable, "pcb/ortools_subprocess.py", "pack"],
-            input=json.dumps(input_data),
-            capture_output=True,
-            text=True,
-            cwd=".",
+    Args:
+        rects: list of (width, height) tuples
+        wires_data: list of tuples
+                    (source_idx, dest_idx, source_location, dest_location, weight)
+        constraints: edge constraint per rectangle (bool or EdgeConstraint)
+        options: optional dict of SolverOptions fields (see solver_options_for)
+        nets: optional list of (members, weight) with members as
+              (rect_idx, location) pairs; scored by half-perimeter wirelength
+        rotations: optional list of allowed rotations (degrees) per rectangle
+        use_cache: reuse (and store) the result for an identical problem
+        fixed: optional (x, y) per rectangle that must not move, None otherwise
+        progress: optional callback for every improved solution found while
+                  solving (a dict with positions, objective, bound, gap and
+                  elapsed); returning True accepts it and ends the search.
+                  A PackProgress also has the worker accept by gap
+
+    Returns:
+        list of (x, y) positions for each rectangle, or None if packing failed
+        or gave an illegal placement; with rotations each position is
+        (x, y, rotation)
+    """
+    key = None
+    if use_cache:
+        key = _PLACEMENT_CACHE.key(
+            rects,
+            wires_data,
+            constraints,
+            nets,
+            rotations,
+            fixed,
+            (options or {}).get("grid_step"),
         )
+        cached = _PLACEMENT_CACHE.get(key)
+        if cached is not None and placement_is_legal(
+            cached, rects, wires_data, constraints, nets, rotations, fixed, options
+        ):
+            print(f"✅ Packing cache hit ({len(rects)} rects)")
+            return cached
+
+    progress, accept_gap = _split_progress(progress)
+    input_data = {
+        "op": "pack",
+        **_pack_payload(
+            rects, wires_data, constraints, options, nets, rotations, fixed
+        ),
+        "accept_gap": accept_gap,
+    }
 
-        if result.returncode == 0:
-            print(f"Debug - subprocess stdout: '{result.stdout}'")
-            print(f"Debug - subprocess stderr: '{result.stderr}'")
-
-            if result.stdout.strip():
-                try:
-                    # Extract JSON from output (it might have extra lines from ortools)
-                    output_lines = result.stdout.strip().split("\n")
-                    json_line = None
-
-                    # Find the line that looks like JSON (starts with { and ends with })
-                    for line in output_lines:
-                        line = line.strip()
-                        if line.startswith("{") and line.endswith("}"):
-                            json_line = line
-                            break
-
-                    if json_line:
-                        response = json.loads(json_line)
-                        if response["success"]:
-                            print(f"✅ Packing successful: {response['message']}")
-                            return response["positions"]
-                        else:
-                            print(f"❌ Packing failed: {response['error']}")
-                            return None
-                    else:
-                        print("❌ No JSON found in subprocess output")
-                        print(f"Raw output: '{result.stdout}'")
-                        return None
-
-                except json.JSONDecodeError as e:
-                    print(f"❌ JSON decode error: {e}")
-                    print(f"Raw output: '{result.stdout}'")
-                    return None
-            else:
-                print("❌ Subprocess returned empty output")
-                return None
-        else:
-            print(f"❌ Subprocess failed with return code {result.returncode}")
-            print(f"Stderr: {result.stderr}")
-            print(f"Stdout: {result.stdout}")
+    try:
+        response = get_packing_pool().request(input_data, progress)
+    except Exception as e:
+        print(f"❌ Failed to run packing worker: {e}")
+        return None
+
+    if response["success"]:
+        print(f"✅ Packing successful: {response['message']}")
+        if not placement_is_legal(
+            response["positions"],
+            rects,
+            wires_data,
+            constraints,
+            nets,
+            rotations,
+            fixed,
+            options,
+        ):
+            print("❌ Packing result rejected")
             return None
+        if key is not None:
+            _PLACEMENT_CACHE.put(key, response["positions"])
+        return response["positions"]
+
+    print(f"❌ Packing failed: {response['error']}")
+    return None
+
+
+def pack_batch_via_subprocess(problems: list[dict], use_cache=True, progress=None):
+    """
+    Pack independent problems with a single request to one packing worker,
+    which solves them concurrently.
+
+    Args:
+        problems: keyword arguments of pack_components_via_subprocess (rects,
+                  wires_data, constraints and optionally options, nets,
+                  rotations, fixed) for each problem
+        use_cache: reuse (and store) results for identical problems
+        progress: optional list with a progress callback (or None) per problem
+
+    Returns:
+        (positions, error) per problem, in order: the packer output as
+        pack_components_via_subprocess returns it, or None and why it failed
+    """
+    problems = [
+        {"options": None, "nets": None, "rotations": None, "fixed": None, **problem}
+        for problem in problems
+    ]
+    progress = progress or [None] * len(problems)
+    results = [None] * len(problems)
+    keys = [None] * len(problems)
+
+    to_solve = []
+    for i, problem in enumerate(problems):
+        if use_cache:
+            keys[i] = _PLACEMENT_CACHE.key(
+                problem["rects"],
+                problem["wires_data"],
+                problem["constraints"],
+                problem["nets"],
+                problem["rotations"],
+                problem["fixed"],
+                (problem["options"] or {}).get("grid_step"),
+            )
+            cached = _PLACEMENT_CACHE.get(keys[i])
+            if cached is not None and placement_is_legal(cached, **problem):
+                results[i] = (cached, None)
+                continue
+        to_solve.append(i)
+
+    if len(to_solve) < len(problems):
+        print(
+            f"✅ Packing cache hit for {len(problems) - len(to_solve)}"
+            f"/{len(problems)} problems"
+        )
+    if not to_solve:
+        return results
+
+    progress, accept_gaps = zip(*map(_split_progress, progress))
+
+    def on_progress(event):
+        callback = progress[to_solve[event["index"]]]
+        return callback is not None and callback(event)
 
+    input_data = {
+        "op": "pack_batch",
+        "problems": [
+            {**_pack_payload(**problems[i]), "accept_gap": accept_gaps[i]}
+            for i in to_solve
+        ],
+    }
+    streaming = any(progress[i] is not None for i in to_solve)
+
+    try:
+        response = get_packing_pool().request(
+            input_data, on_progress if streaming else None
+        )
+        if not response["success"]:
+            raise RuntimeError(response["error"])
     except Exception as e:
-        print(f"❌ Failed to run packing subprocess: {e}")
-        return None
+        print(f"❌ Failed to run packing batch: {e}")
+        for i in to_solve:
+            results[i] = (None, str(e))
+        return results
+
+    for i, result in zip(to_solve, response["results"]):
+        if not result["success"]:
+            results[i] = (None, result["error"])
+        elif not placement_is_legal(result["positions"], **problems[i]):
+            results[i] = (None, "Packer returned an illegal placement")
+        else:
+            if keys[i] is not None:
+                _PLACEMENT_CACHE.put(keys[i], result["positions"])
+            results[i] = (result["positions"], None)
+
+    slowest = max(result["elapsed"] for result in response["results"])
+    print(
+        f"✅ Packing batch: {response['message']} in {response['elapsed']:.2f}s "
+        f"(slowest problem {slowest:.2f}s)"
+    )
+    return results
 
 
-def get_all_connections(pcb_path: Path):
-    """Return a list of [ref1, ref2] pairs for every connection between components."""
-    board = pcbnew.LoadBoard(pcb_path)
-
-    # Get all footprints
-    footprints = list(board.GetFootprints())
-    print(f"Found {len(footprints)} footprints")
-
-    # Build nets dictionary: net_name -> list of (ref, pad_name) tuples
-    nets = {}
-    for fp in footprints:
-        for pad in fp.Pads():
-            net_name = pad.GetNetname()
-            if net_name and net_name != "":
-                if net_name not in nets:
-                    nets[net_name] = []
-                nets[net_name].append((fp.GetReference(), pad.GetName()))
-
-    print(f"Found {len(nets)} nets")
-
-    # Generate all connections (pairs of component references)
-    connections = []
-
-    for net_name, pads in nets.items():
-        # Skip nets with only one pad (no connections possible)
-        if len(pads) < 2:
+def build_net_graph(
+    board: BoardModel,
+    large_net_size: int | None = _LARGE_NET_SIZE,
+    large_net_weight: float = _LARGE_NET_WEIGHT,
+) -> NetGraph:
+    """
+    Build the weighted part connectivity graph of the board.
+
+    Edge weights count the nets two parts share; nets with more than
+    `large_net_size` parts count `large_net_weight` each (0 skips them).
+    """
+    graph = NetGraph.from_nets(
+        {net: [pad.ref for pad in pads] for net, pads in board.nets.items()},
+        nodes=board.refs,
+        large_net_size=large_net_size,
+        large_net_weight=large_net_weight,
+    )
+    print(f"Total connections found: {len(graph.weights)}")
+    return graph
+
+
+def collect_nets(board: BoardModel, unit_of: dict[str, int], pins: list[dict]):
+    """
+    Return the nets that connect more than one packing unit, as (members, weight).
+
+    `unit_of` maps part references to rect indices (parts not in it are
+    ignored) and `pins[unit][net]` is where that unit's pins on the net are.
+    """
+    nets = []
+    for net_name, pads in board.nets.items():
+        units = sorted({unit_of[pad.ref] for pad in pads if pad.ref in unit_of})
+        if len(units) < 2:
             continue
 
-        # Generate all pairs of component references in this net
-        refs_in_net = [ref for ref, pad_name in pads]
-        unique_refs = list(set(refs_in_net))  # Remove duplicates
+        fanout = len({pad.ref for pad in pads})
+        weight = _LARGE_NET_WEIGHT if fanout > _LARGE_NET_SIZE else 1.0
+        nets.append(([(unit, pins[unit][net_name]) for unit in units], weight))
 
-        # Create pairs between all unique component references
-        for i in range(len(unique_refs)):
-            for j in range(i + 1, len(unique_refs)):
-                connection = [unique_refs[i], unique_refs[j]]
-                if (
-                    connection not in connections
-                    and [connection[1], connection[0]] not in connections
-                ):
-                    connections.append(connection)
-                    print(
-                        f"Connection: {connection[0]} <-> {connection[1]} (net: {net_name})"
-                    )
+    return nets
 
-    print(f"Total connections found: {len(connections)}")
-    return connections
 
+def wire_endpoints(pins_a: dict, pins_b: dict, center_a, center_b):
+    """
+    Endpoints for a wire between two units: the centroid of each side's pins
+    on the nets they share, or the centres if they share none.
+    """
+    shared = pins_a.keys() & pins_b.keys()
+    if not shared:
+        return center_a, center_b
+    return (
+        _centroid(pins_a[net] for net in shared),
+        _centroid(pins_b[net] for net in shared),
+    )
 
-def process_component(
-    pcb_path: Path, refs: list[str], all_wires: list[tuple[str, str]]
-):
 
-    infos = get_items_infos(pcb_path, refs)
+def get_all_connections(board: BoardModel):
+    """Return a list of [ref1, ref2] pairs for every connection between components."""
+    graph = build_net_graph(board, large_net_size=None)
+    return [[a, b] for a, b, _ in graph.edges()]
+
+
+@dataclass
+class GroupProblem:
+    refs: list[str]
+    sizes: list[tuple[float, float]]
+    pins: list[dict[str, tuple[float, float]]]
+    wires: list[tuple]
+    nets: list[tuple]
+    constraints: list[bool]
+    component_name: str
+    rotations: list[tuple[int, ...]] | None = None
+
+
+def build_group_problem(
+    board: BoardModel,
+    refs: list[str],
+    graph: NetGraph,
+    allow_rotation: bool = True,
+    margins: dict[str, float] | None = None,
+) -> GroupProblem:
+    infos = get_items_infos(board, refs, margins)
 
     # Set component name to be the thing with the biggest size
     biggest_size = 0
@@ -221,21 +762,29 @@ def process_component(
 
     # Get sizes
     sizes = [info.size for info in infos]
+    pins = [info.pins for info in infos]
     component_wires = []
-
-    for wire in all_wires:
-        if wire[0] in refs and wire[1] in refs:
-            idx1 = refs.index(wire[0])
-            idx2 = refs.index(wire[1])
-
-            component_wires.append(
-                (
-                    idx1,
-                    idx2,
+    index = {ref: i for i, ref in enumerate(refs)}
+
+    for a, b, weight in graph.subgraph_edges(refs):
+        idx1 = index[a]
+        idx2 = index[b]
+
+        component_wires.append(
+            (
+                idx1,
+                idx2,
+                *wire_endpoints(
+                    pins[idx1],
+                    pins[idx2],
                     (sizes[idx1][0] / 2, sizes[idx1][1] / 2),
                     (sizes[idx2][0] / 2, sizes[idx2][1] / 2),
-                )
+                ),
+                weight,
             )
+        )
+
+    component_nets = collect_nets(board, index, pins)
 
     constraints = [False] * len(sizes)
 
@@ -243,17 +792,266 @@ def process_component(
     print(component_wires)
     print(constraints)
 
-    positions = pack_components_via_subprocess(sizes, component_wires, constraints)
-    position_map = {ref: pos for ref, pos in zip(refs, positions)}
+    rotations = [ROTATIONS if allow_rotation else (0,)] * len(sizes)
+
+    return GroupProblem(
+        refs,
+        sizes,
+        pins,
+        component_wires,
+        component_nets,
+        constraints,
+        component_name,
+        rotations,
+    )
+
+
+def pack_arguments(
+    sizes,
+    wires,
+    nets,
+    constraints,
+    objective,
+    top_level=False,
+    rotations=None,
+    fixed=None,
+    grid_step=_GRID_STEP,
+    search_workers=None,
+) -> dict:
+    """
+    Keyword arguments of pack_components_via_subprocess for either the
+    pairwise-wire or the net (HPWL) objective.
+    """
+    if objective == "hpwl":
+        n_pins = sum(len(members) for members, _ in nets)
+        return {
+            "rects": sizes,
+            "wires_data": [],
+            "constraints": constraints,
+            "options": solver_options_for(
+                len(sizes), n_pins, top_level, grid_step, search_workers
+            ),
+            "nets": nets,
+            "rotations": rotations,
+            "fixed": fixed,
+        }
+
+    if objective == "pairwise":
+        return {
+            "rects": sizes,
+            "wires_data": wires,
+            "constraints": constraints,
+            "options": solver_options_for(
+                len(sizes), len(wires), top_level, grid_step, search_workers
+            ),
+            "rotations": rotations,
+            "fixed": fixed,
+        }
+
+    raise ValueError(f"Unknown objective: {objective}")
+
+
+def pack_problem(
+    sizes,
+    wires,
+    nets,
+    constraints,
+    objective,
+    top_level=False,
+    rotations=None,
+    fixed=None,
+    progress=None,
+    grid_step=_GRID_STEP,
+    search_workers=None,
+):
+    """Pack with either the pairwise-wire or the net (HPWL) objective."""
+    return pack_components_via_subprocess(
+        **pack_arguments(
+            sizes,
+            wires,
+            nets,
+            constraints,
+            objective,
+            top_level,
+            rotations,
+            fixed,
+            grid_step,
+            search_workers,
+        ),
+        progress=progress,
+    )
+
+
+def pack_group(
+    problem: GroupProblem,
+    objective: str = _DEFAULT_OBJECTIVE,
+    progress=None,
+    grid_step: float = _GRID_STEP,
+):
+    return pack_problem(
+        problem.sizes,
+        problem.wires,
+        problem.nets,
+        problem.constraints,
+        objective,
+        rotations=problem.rotations,
+        progress=progress,
+        grid_step=grid_step,
+    )
+
+
+def pack_groups(
+    problems: dict[int, GroupProblem],
+    parallel: bool = True,
+    objective: str = _DEFAULT_OBJECTIVE,
+    progress: dict[int, object] | None = None,
+    grid_step: float = _GRID_STEP,
+) -> tuple[dict[int, list], dict[int, str]]:
+    """
+    Pack every group problem.
+
+    In parallel mode all groups go to one packing worker in a single batch
+    request and are solved there concurrently; otherwise they are packed one
+    after another. `progress`
+    optionally maps a group index to its pack_components_via_subprocess
+    progress callback.
+
+    Returns:
+        (positions, failures): packer output keyed by group index, and an error
+        message for every group that could not be packed.
+    """
+    positions = {}
+    failures = {}
+    progress = progress or {}
+
+    def record(i, result=None, error=None):
+        if result is None:
+            failures[i] = error or "packer returned no solution"
+            print(f"❌ Group {i} ({problems[i].refs}) failed: {failures[i]}")
+        else:
+            positions[i] = result
+
+    if not parallel or len(problems) <= 1:
+        for i, problem in problems.items():
+            try:
+                record(i, pack_group(problem, objective, progress.get(i), grid_step))
+            except Exception as e:
+                record(i, error=str(e))
+        return positions, failures
+
+    indices = list(problems)
+    results = pack_batch_via_subprocess(
+        [
+            pack_arguments(
+                problems[i].sizes,
+                problems[i].wires,
+                problems[i].nets,
+                problems[i].constraints,
+                objective,
+                rotations=problems[i].rotations,
+                grid_step=grid_step,
+            )
+            for i in indices
+        ],
+        progress=[progress.get(i) for i in indices],
+    )
+    for i, (result, error) in zip(indices, results):
+        record(i, result, error)
+
+    return positions, failures
+
+
+def export_group_problems(
+    board: BoardModel,
+    refs: list[list[str]],
+    directory: str | Path,
+    graph: NetGraph | None = None,
+    objective: str = _DEFAULT_OBJECTIVE,
+    allow_rotation: bool = True,
+    margins: dict[str, float] | None = None,
+) -> list[Path]:
+    """
+    Write every group's packing problem as a benchmark fixture (see
+    packing/benchmark.py), named after the board.
+    """
+    if graph is None:
+        graph = build_net_graph(board)
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    stem = board.path.stem if board.path is not None else "board"
+
+    paths = []
+    for i, group in enumerate(refs):
+        problem = build_group_problem(board, group, graph, allow_rotation, margins)
+        arguments = pack_arguments(
+            problem.sizes,
+            problem.wires,
+            problem.nets,
+            problem.constraints,
+            objective,
+            rotations=problem.rotations,
+        )
+        instance = Instance(
+            name=f"{stem}-group{i + 1}",
+            rects=arguments["rects"],
+            constraints=arguments["constraints"],
+            wires=arguments["wires_data"],
+            nets=arguments.get("nets") or [],
+            rotations=arguments["rotations"],
+        )
+        path = directory / f"{instance.name}.json"
+        save_instance(instance, path)
+        paths.append(path)
+
+    print(f"Exported {len(paths)} packing problems to {directory}")
+    return paths
+
+
+def finish_group(problem: GroupProblem, positions: list):
+    positions = list(positions)
+    position_map = {ref: pos for ref, pos in zip(problem.refs, positions)}
     final_size = positions.pop()
 
     print(position_map)
     print(final_size)
 
-    # Generate visualization for this component group
-    part_viz = generate_visualization(sizes, positions, component_wires, refs)
+    # Generate visualization for this component group, as placed (rotated)
+    placed_sizes, placed_wires, locations = place_rotated(
+        problem.sizes, problem.wires, positions
+    )
+    part_viz = generate_visualization(
+        placed_sizes, locations, placed_wires, problem.refs
+    )
+
+    return position_map, problem.component_name, final_size, part_viz
+
 
-    return position_map, component_name, final_size, part_viz
+def group_pin_locations(
+    problem: GroupProblem, position_map: dict
+) -> dict[str, tuple[float, float]]:
+    """Centroid of a packed group's pins on each net, relative to the group's bottom left."""
+    by_net = defaultdict(list)
+    for i, ref in enumerate(problem.refs):
+        x, y, *rotation = position_map[ref]
+        angle = rotation[0] if rotation else 0
+        for net, (px, py) in problem.pins[i].items():
+            px, py = rotate_point(px, py, *problem.sizes[i], angle)
+            by_net[net].append((x + px, y + py))
+    return {net: _centroid(points) for net, points in by_net.items()}
+
+
+def process_component(
+    board: BoardModel,
+    refs: list[str],
+    graph: NetGraph,
+    objective: str = _DEFAULT_OBJECTIVE,
+):
+    problem = build_group_problem(board, refs, graph)
+    positions = pack_group(problem, objective)
+    if positions is None:
+        raise RuntimeError(f"Failed to pack component group {refs}")
+
+    return finish_group(problem, positions)
 
 
 def is_basic_component(identifier: str) -> bool:
@@ -280,35 +1078,38 @@ def is_basic_component(identifier: str) -> bool:
     return False
 
 
-def dfs(cur: int, visited: set, adj, comp: list[str]):
+def dfs(cur: int, visited: set, csr: CSRGraph, comp: list[str]):
     visited.add(cur)
-    comp.append(cur)
-    for v in adj[cur]:
-        if v not in visited and is_basic_component(v):
-            dfs(v, visited, adj, comp)
+    comp.append(csr.nodes[cur])
+    for k in range(csr.indptr[cur], csr.indptr[cur + 1]):
+        v = csr.indices[k]
+        # Edges that only come from large nets (GND, rails) don't join groups
+        if csr.weights[k] < 1:
+            continue
+        if v not in visited and is_basic_component(csr.nodes[v]):
+            dfs(v, visited, csr, comp)
 
 
-def generate_refs(pcb_path: Path):
-    board = pcbnew.LoadBoard(pcb_path)
-    wires = get_all_connections(pcb_path)
-    all_parts = []
+def generate_refs(board: BoardModel, graph: NetGraph | None = None):
+    if graph is None:
+        graph = build_net_graph(board)
+    csr = graph.to_csr()
     visited = set()
 
-    adj = defaultdict(list)
-    for u, v in wires:
-        adj[u].append(v)
-        adj[v].append(u)
-
-    for _, fp in enumerate(board.GetFootprints()):
-        ref = fp.GetReference()
-        all_parts.append(ref)
-
     refs = []
 
-    for part in all_parts:
-        if part not in visited and not is_basic_component(part):
+    for part in board.refs:
+        cur = graph.index[part]
+        if cur not in visited and not is_basic_component(part):
             comp = []
-            dfs(part, visited, adj, comp)
+            dfs(cur, visited, csr, comp)
+            refs.append(comp)
+
+    # Basic parts that no group reached still need a place on the board
+    for part in board.refs:
+        if graph.index[part] not in visited:
+            comp = []
+            dfs(graph.index[part], visited, csr, comp)
             refs.append(comp)
 
     return refs
@@ -451,59 +1252,451 @@ def generate_visualization(
     return image_base64
 
 
-def solve_layout(pcb_path: Path, refs: list[list[str]]) -> list[str]:
-    board = pcbnew.LoadBoard(pcb_path)
+@dataclass
+class PackedBlock:
+    """A packed cluster, with everything relative to its bottom left."""
+
+    placements: dict[str, tuple]  # ref -> (x, y[, rotation])
+    size: tuple[float, float]
+    pins: dict[str, tuple[float, float]]  # net -> pin centroid
+    name: str
+
+
+def cluster_groups(
+    graph: NetGraph, refs: list[list[str]], max_size: int = _MAX_CLUSTER_SIZE
+) -> Cluster:
+    """
+    Cluster tree whose leaves hold part references and whose root is the board.
+
+    Groups with more than `max_size` parts are split with the partitioner, and
+    when there are more than `max_size` groups they are clustered in turn.
+    """
+    trees = []
+    for group in refs:
+        if len(group) <= max_size:
+            trees.append(Cluster(items=list(group)))
+            continue
+        index = {ref: i for i, ref in enumerate(group)}
+        edges = [(index[a], index[b], w) for a, b, w in graph.subgraph_edges(group)]
+        tree = build_hierarchy(len(group), edges, max_size)
+        trees.append(tree.map(group.__getitem__))
+
+    if len(trees) <= max_size:
+        return Cluster(children=trees)
+
+    part_to_group = {ref: g for g, group in enumerate(refs) for ref in group}
+    edges = [(a, b, w) for (a, b), w in graph.quotient_edges(part_to_group).items()]
+    return attach(build_hierarchy(len(trees), edges, max_size), trees)
+
+
+def pack_blocks(
+    board: BoardModel,
+    graph: NetGraph,
+    blocks: list[PackedBlock],
+    objective: str = _DEFAULT_OBJECTIVE,
+    top_level: bool = False,
+    fixed: list[tuple[float, float] | None] | None = None,
+    progress=None,
+    grid_step: float = _GRID_STEP,
+    search_workers: int | None = None,
+) -> tuple[PackedBlock, str]:
+    """
+    Pack already packed clusters (unrotated) into one bigger block.
+
+    `fixed` optionally gives blocks that must stay where they are on the board
+    (bottom left in the packer's frame); the others are packed around them and
+    everything comes back in that same frame. `search_workers` caps the CP-SAT
+    workers of this pack (see solver_options_for).
+    """
+    sizes = [block.size for block in blocks]
+    part_to_idx = {ref: i for i, block in enumerate(blocks) for ref in block.placements}
+    block_pins = [block.pins for block in blocks]
+    wires = []
+    constraints = [False] * len(sizes)
+
+    # One wire per pair of blocks, weighted by every connection between them
+    for (idx1, idx2), weight in graph.quotient_edges(part_to_idx).items():
+        wires.append(
+            (
+                idx1,
+                idx2,
+                *wire_endpoints(
+                    block_pins[idx1],
+                    block_pins[idx2],
+                    (sizes[idx1][0] / 2, sizes[idx1][1] / 2),
+                    (sizes[idx2][0] / 2, sizes[idx2][1] / 2),
+                ),
+                weight,
+            )
+        )
+
+    nets = collect_nets(board, part_to_idx, block_pins)
+
+    print("Overall:" if top_level else f"Cluster of {len(blocks)} blocks:")
+    print(sizes)
+    print(wires)
+    print(constraints)
+    print("--------------------------------")
+
+    # The packer wants non-negative coordinates, so fixed blocks are shifted
+    # far enough from the origin that every free block fits left of or below
+    # them, and everything is shifted back afterwards
+    origin = (0.0, 0.0)
+    if fixed and any(p is not None for p in fixed):
+        free = [size for size, p in zip(sizes, fixed) if p is None]
+        origin = (
+            min(p[0] for p in fixed if p is not None) - sum(w for w, _ in free),
+            min(p[1] for p in fixed if p is not None) - sum(h for _, h in free),
+        )
+        fixed = [
+            (p[0] - origin[0], p[1] - origin[1]) if p is not None else None
+            for p in fixed
+        ]
+
+    positions = pack_problem(
+        sizes,
+        wires,
+        nets,
+        constraints,
+        objective,
+        top_level=top_level,
+        fixed=fixed,
+        progress=progress,
+        grid_step=grid_step,
+        search_workers=search_workers,
+    )
+    if positions is None:
+        raise RuntimeError(
+            "Failed to pack the board-level layout"
+            if top_level
+            else f"Failed to pack a cluster of {len(blocks)} blocks"
+        )
+    final_size = positions.pop()
+
+    placements = {}
+    by_net = defaultdict(list)
+    for (ox, oy), block in zip(positions, blocks):
+        ox, oy = ox + origin[0], oy + origin[1]
+        for ref, (x, y, *rotation) in block.placements.items():
+            placements[ref] = (x + ox, y + oy, *rotation)
+        for net, (px, py) in block.pins.items():
+            by_net[net].append((px + ox, py + oy))
+
+    names = [block.name for block in blocks]
+    biggest = max(blocks, key=lambda block: block.size[0] * block.size[1])
+    visualization = generate_visualization(sizes, positions, wires, names)
+
+    block = PackedBlock(
+        placements,
+        final_size,
+        {net: _centroid(points) for net, points in by_net.items()},
+        biggest.name,
+    )
+    return block, visualization
+
+
+def group_signature(board: BoardModel, graph: NetGraph, refs: list[str]) -> str:
+    """
+    Fingerprint of a group's parts and the connections between them. A group
+    whose signature is unchanged since the last layout doesn't need repacking.
+    """
+    data = {
+        # Sorted sizes so parts the last layout rotated still match
+        "parts": [
+            (ref, board.footprints[ref].name, sorted(board.footprints[ref].size))
+            for ref in sorted(refs)
+        ],
+        "edges": sorted(graph.subgraph_edges(refs)),
+    }
+    return hashlib.sha256(json.dumps(data).encode()).hexdigest()
+
+
+def layout_manifest_path(board_path: Path | None) -> Path | None:
+    """Where the signatures of a board's last layout are kept, next to it."""
+    if board_path is None:
+        return None
+    return Path(board_path).with_suffix(".layout.json")
+
+
+def load_layout_manifest(path: Path) -> set[str]:
+    try:
+        return set(json.loads(path.read_text()).get("groups", []))
+    except (OSError, ValueError):
+        return set()
+
+
+def save_layout_manifest(path: Path, signatures) -> None:
+    try:
+        path.write_text(json.dumps({"groups": sorted(signatures)}, indent=2))
+    except OSError as e:
+        print(f"⚠️ Could not save layout manifest {path}: {e}")
+
+
+def pinned_block(
+    board: BoardModel, refs: list[str], margins: dict[str, float] | None = None
+) -> tuple[PackedBlock, tuple[float, float]]:
+    """
+    A group that stays where it is on the board: the block covering its parts
+    and their margins, and its bottom left in the packer's frame (y up).
+    """
+    fps = [board.footprints[ref] for ref in refs]
+    left = min(fp.bbox[0] - footprint_margin(fp.ref, margins) for fp in fps)
+    top = min(fp.bbox[1] - footprint_margin(fp.ref, margins) for fp in fps)
+    right = max(fp.bbox[2] + footprint_margin(fp.ref, margins) for fp in fps)
+    bottom = max(fp.bbox[3] + footprint_margin(fp.ref, margins) for fp in fps)
+
+    placements = {fp.ref: (fp.bbox[0] - left, bottom - fp.bbox[3]) for fp in fps}
+    by_net = defaultdict(list)
+    for fp in fps:
+        for pad in fp.pads:
+            if pad.net:
+                by_net[pad.net].append(
+                    (pad.position[0] - left, bottom - pad.position[1])
+                )
+    biggest = max(fps, key=lambda fp: fp.size[0] * fp.size[1])
+
+    block = PackedBlock(
+        placements,
+        (right - left, bottom - top),
+        {net: _centroid(points) for net, points in by_net.items()},
+        biggest.name,
+    )
+    return block, (left, -bottom)
+
+
+@dataclass
+class PackProgress:
+    """
+    Progress of one pack: every streamed solution goes to on_progress(name,
+    event), and the packing worker itself accepts the first solution whose gap
+    is at most accept_gap, so the search stops on that very solution.
+    """
+
+    name: str
+    on_progress: object = None  # Callable[[str, dict], None]
+    accept_gap: float | None = None
+
+    def __call__(self, event: dict) -> bool:
+        if self.on_progress is not None:
+            self.on_progress(self.name, event)
+        return False  # Accepting by gap is up to the worker
+
+
+def pack_progress(name: str, on_progress=None, accept_gap: float | None = None):
+    """
+    PackProgress for one pack, or None when there is nothing to do, so the pack
+    isn't streamed.
+    """
+    if on_progress is None and accept_gap is None:
+        return None
+    return PackProgress(name, on_progress, accept_gap)
+
+
+def _split_progress(progress):
+    """
+    (callback to stream solutions to or None, accept_gap for the worker) of a
+    pack's progress argument.
+    """
+    if not isinstance(progress, PackProgress):
+        return progress, None
+    streamed = progress if progress.on_progress is not None else None
+    return streamed, progress.accept_gap
 
-    all_wires = get_all_connections(pcb_path)
-    all_info = []
-    part_to_idx = {}
+
+class BackendProgressReporter:
+    """
+    on_progress for solve_layout that posts each pack's latest objective, bound
+    and gap to the backend, at most once per interval per pack.
+    """
+
+    def __init__(self, url: str = _PROGRESS_URL, interval: float = _PROGRESS_INTERVAL):
+        self.url = url
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._latest: dict[str, dict] = {}
+        self._sent: dict[str, float] = {}
+
+    def __call__(self, name: str, event: dict):
+        update = {
+            "name": name,
+            **{k: event[k] for k in ("objective", "bound", "gap", "elapsed")},
+        }
+        now = time.monotonic()
+        with self._lock:
+            self._latest[name] = update
+            if now - self._sent.get(name, -self.interval) < self.interval:
+                return
+            self._sent[name] = now
+            del self._latest[name]
+        self._post(update)
+
+    def flush(self):
+        """Post the updates that were held back by the interval."""
+        with self._lock:
+            updates = list(self._latest.values())
+            self._latest.clear()
+        for update in updates:
+            self._post(update)
+
+    def _post(self, update: dict):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(update).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            urllib.request.urlopen(request, timeout=1).close()
+        except OSError as e:
+            print(f"⚠️ Could not report layout progress: {e}")
+
+
+def solve_layout(
+    board: BoardModel,
+    refs: list[list[str]],
+    parallel: bool = True,
+    graph: NetGraph | None = None,
+    objective: str = _DEFAULT_OBJECTIVE,
+    allow_rotation: bool = True,
+    max_cluster_size: int = _MAX_CLUSTER_SIZE,
+    incremental: bool = False,
+    on_progress=None,
+    accept_gap: float | None = _ACCEPT_GAP,
+    margins: dict[str, float] | None = None,
+    grid_step: float = _GRID_STEP,
+    output_path: Path | str = _OUTPUT_BOARD,
+) -> list[str]:
+    """
+    Pack every group, then the groups onto the board, move the footprints and
+    save the board to output_path.
+
+    With `incremental`, groups whose parts and internal connections match the
+    last layout of this board keep their current positions and only the rest
+    are packed, around them. The manifest of that layout is saved next to
+    output_path, so the next incremental run has to load the saved board.
+
+    on_progress(name, event) sees every improved solution of every pack as it
+    is found (see BackendProgressReporter); a pack stops early once its gap
+    is at most accept_gap.
+
+    `margins` overrides the clearance kept around individual footprints (by
+    reference, in nm) and every pack runs on a grid of `grid_step` nm.
+    """
+    if graph is None:
+        graph = build_net_graph(board)
     visualizations = []  # Collect all visualizations
 
-    for i, ref_list in enumerate(refs):
-        position_map, component_name, final_size, part_viz = process_component(
-            pcb_path, ref_list, all_wires
+    manifest_path = layout_manifest_path(board.path)
+    signatures = [group_signature(board, graph, group) for group in refs]
+    pinned = set()
+    if incremental and manifest_path is not None:
+        previous = load_layout_manifest(manifest_path)
+        pinned = {g for g, signature in enumerate(signatures) if signature in previous}
+        print(f"Incremental layout: keeping {len(pinned)}/{len(refs)} groups in place")
+    obstacles = [pinned_block(board, refs[g], margins) for g in sorted(pinned)]
+    pinned_refs = {ref for g in pinned for ref in refs[g]}
+    to_solve = [group for g, group in enumerate(refs) if g not in pinned]
+
+    if not to_solve:
+        print("Nothing changed since the last layout")
+        return visualizations
+
+    # Big groups and long lists of groups become a tree of small problems:
+    # the leaves are packed part by part, everything above them block by block
+    tree = cluster_groups(graph, to_solve, max_cluster_size)
+    leaves = tree.leaves()
+    levels = tree.levels()
+    if len(levels) > 1 or len(leaves) != len(to_solve):
+        print(
+            f"Split {len(to_solve)} groups into {len(leaves)} clusters, "
+            f"{len(levels)} levels"
         )
-        all_info.append((position_map, component_name, final_size))
-        visualizations.append(part_viz)  # Store part-level visualization
 
-        for part in ref_list:
-            part_to_idx[part] = i
+    # The leaf packs are independent, so they can all be solved at once
+    problems = {
+        i: build_group_problem(board, leaf.items, graph, allow_rotation, margins)
+        for i, leaf in enumerate(leaves)
+    }
+    group_positions, failures = pack_groups(
+        problems,
+        parallel=parallel,
+        objective=objective,
+        progress={
+            i: pack_progress(f"group {i + 1}", on_progress, accept_gap)
+            for i in problems
+        },
+        grid_step=grid_step,
+    )
+
+    if failures:
+        print(f"⚠️ {len(failures)}/{len(leaves)} component groups failed to pack:")
+        for i, error in sorted(failures.items()):
+            print(f"  Group {i+1} {leaves[i].items}: {error}")
+        print("These groups are left where they are.")
+
+    # Groups that failed are left out of everything above them
+    blocks: dict[int, PackedBlock] = {}
+    for i in sorted(group_positions):
+        position_map, component_name, final_size, part_viz = finish_group(
+            problems[i], group_positions[i]
+        )
+        blocks[id(leaves[i])] = PackedBlock(
+            position_map,
+            final_size,
+            group_pin_locations(problems[i], position_map),
+            component_name,
+        )
+        visualizations.append(part_viz)  # Store part-level visualization
 
         print(position_map)
         print(component_name)
         print(final_size)
         print("--------------------------------")
 
-    overall_sizes = [info[2] for info in all_info]
-    overeall_wires = []
-    overall_constraints = [False] * len(overall_sizes)
-
-    for wire in all_wires:
-        if wire[0] in part_to_idx and wire[1] in part_to_idx:
-            idx1 = part_to_idx[wire[0]]
-            idx2 = part_to_idx[wire[1]]
+    # Combine level by level; clusters on the same level are independent
+    def combine(node: Cluster, name: str, search_workers: int | None = None):
+        children = [blocks[id(child)] for child in node.children if id(child) in blocks]
+        fixed = [None] * len(children)
+        if node is tree:
+            # Unchanged groups are obstacles the board-level pack works around
+            children += [block for block, _ in obstacles]
+            fixed += [position for _, position in obstacles]
+        if not children:
+            return None
+        return pack_blocks(
+            board,
+            graph,
+            children,
+            objective,
+            top_level=node is tree,
+            fixed=fixed,
+            progress=pack_progress(name, on_progress, accept_gap),
+            grid_step=grid_step,
+            search_workers=search_workers,
+        )
 
-            if idx1 == idx2:
-                continue
-            overeall_wires.append(
-                (
-                    idx1,
-                    idx2,
-                    (overall_sizes[idx1][0] / 2, overall_sizes[idx1][1] / 2),
-                    (overall_sizes[idx2][0] / 2, overall_sizes[idx2][1] / 2),
-                )
-            )
+    for depth, level in enumerate(levels, start=1):
+        names = [
+            "board" if node is tree else f"cluster {depth}.{k + 1}"
+            for k, node in enumerate(level)
+        ]
+        if parallel and len(level) > 1:
+            # Packs of a level share the cores instead of each taking 8 or all
+            concurrent = min(len(level), _MAX_PACKING_WORKERS)
+            share = [max(1, _MAX_PACKING_WORKERS // concurrent)] * len(level)
+            get_packing_pool().grow(concurrent)
+            with ThreadPoolExecutor(max_workers=concurrent) as executor:
+                results = list(executor.map(combine, level, names, share))
+        else:
+            results = [combine(node, name) for node, name in zip(level, names)]
 
-    print("Overall:")
-    print(overall_sizes)
-    print(overeall_wires)
-    print(overall_constraints)
-    print("--------------------------------")
+        for node, result in zip(level, results):
+            if result is not None:
+                blocks[id(node)], viz = result
+                visualizations.append(viz)
 
-    big_part_positions = pack_components_via_subprocess(
-        overall_sizes, overeall_wires, overall_constraints
-    )
-    _ = big_part_positions.pop()
+    if id(tree) not in blocks:
+        raise RuntimeError("Failed to pack the board-level layout")
+    placements = blocks[id(tree)].placements
 
     # Place le items
     def get_fp_bbox(fp):
@@ -515,36 +1708,40 @@ def solve_layout(pcb_path: Path, refs: list[list[str]]) -> list[str]:
         bl = pcbnew.VECTOR2I(
             bbox.GetLeft(), bbox.GetBottom()
         )  # bottom-left in board units (nm)
-        # how far we must move the footprint so its BL lands at target
-        delta = pcbnew.VECTOR2I(int(target_x_nm - bl.x), int(target_y_nm - bl.y))
+        # The packer's y axis points up and KiCad's points down, so packer y
+        # maps to -y on the board; otherwise rects of different heights overlap
+        delta = pcbnew.VECTOR2I(int(target_x_nm - bl.x), int(-target_y_nm - bl.y))
         fp.Move(delta)
 
     # Place part
-    for i in range(len(refs)):
-        offset = (big_part_positions[i][0], big_part_positions[i][1])
-        for part in refs[i]:
-            posititon_map = all_info[i][0]
-            part_pos = posititon_map[part]  # This is [x, y]
-            part_position = (
-                part_pos[0] + offset[0],  # x + offset_x
-                part_pos[1] + offset[1],  # y + offset_y
-            )
-            place_by_bottom_left(
-                board.FindFootprintByReference(part),
-                float(part_position[0]),
-                float(part_position[1]),
+    for part, part_pos in placements.items():  # (x, y[, rotation]) on the board
+        if part in pinned_refs:
+            continue  # Already where it belongs
+        fp = board.find_footprint(part)
+        # Placements are for the footprint plus its margin on every side
+        margin = footprint_margin(part, margins)
+        if len(part_pos) > 2 and part_pos[2]:
+            # Rotate first so the bounding box used for placement is the final one
+            fp.SetOrientation(
+                pcbnew.EDA_ANGLE(
+                    fp.GetOrientationDegrees() + part_pos[2], pcbnew.DEGREES_T
+                )
             )
-    pcbnew.SaveBoard(
-        "C:\\Users\\alexl\\Documents\\KiCad Projects\\remote-controll\\testing.kicad_pcb",
-        board,
-    )
-
-    # Generate component-level visualization with component names
-    component_names = [info[1] for info in all_info]
-    component_viz = generate_visualization(
-        overall_sizes, big_part_positions, overeall_wires, component_names
+        place_by_bottom_left(
+            fp, float(part_pos[0]) + margin, float(part_pos[1]) + margin
+        )
+    pcbnew.SaveBoard(str(output_path), board.board)
+
+    # Remember what was laid out, next to the board holding those positions,
+    # so the next incremental run on that board can keep it
+    save_layout_manifest(
+        layout_manifest_path(output_path),
+        [
+            signature
+            for group, signature in zip(refs, signatures)
+            if all(ref in placements for ref in group)
+        ],
     )
-    visualizations.append(component_viz)  # Add final component-level visualization
 
     return visualizations
 
@@ -556,8 +1753,8 @@ def test_packing_subprocess():
     # Simple test case
     rects = [(2.0, 1.0), (1.5, 1.5), (1.0, 2.0)]
     wires_data = [
-        (0, 1, (1.0, 0.5), (0.75, 0.75)),  # Connect centers of rect 0 and 1
-        (1, 2, (0.75, 0.75), (0.5, 1.0)),  # Connect centers of rect 1 and 2
+        (0, 1, (1.0, 0.5), (0.75, 0.75), 1.0),  # Connect centers of rect 0 and 1
+        (1, 2, (0.75, 0.75), (0.5, 1.0), 1.0),  # Connect centers of rect 1 and 2
     ]
     constraints = [False, False, True]  # Only rect 2 must be on edge
 
@@ -675,13 +1872,18 @@ if __name__ == "__main__":
         "C:\\Users\\alexl\\Documents\\KiCad Projects\\remote-controll\\allm.kicad_pcb"
     )
 
-    refs = generate_refs(pcb_file)
+    board = BoardModel.load(pcb_file)
+    graph = build_net_graph(board)
+
+    refs = generate_refs(board, graph)
     print(f"Generated {len(refs)} component groups:")
     for i, ref_group in enumerate(refs):
         print(f"  Group {i+1}: {ref_group}")
 
-    # Get all visualizations
-    visualizations = solve_layout(pcb_file, refs)
+    # Get all visualizations, showing the packer's progress in the web UI
+    reporter = BackendProgressReporter()
+    visualizations = solve_layout(board, refs, graph=graph, on_progress=reporter)
+    reporter.flush()
 
     print(f"\nGenerated {len(visualizations)} visualizations")
     print(f"Part-level visualizations: {len(visualizations)-1}")
@@ -4,16 +4,40 @@ Subprocess wrapper for ortools operations to avoid DLL conflicts with KiCad.
 """
 
 import json
+import os
+import queue
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 
-def run_packing_operation(rects, wires_data, constraints):
-    """Run packing operation in subprocess-safe way."""
+def run_packing_operation(
+    rects,
+    wires_data,
+    constraints,
+    options_data=None,
+    nets_data=None,
+    rotations=None,
+    fixed=None,
+    on_solution=None,
+):
+    """
+    Run packing operation in subprocess-safe way.
+
+    on_solution, if given, gets every improved solution as a JSON-ready dict
+    and may return True to accept it and stop the search.
+    """
     try:
         # Import ortools modules
         sys.path.insert(0, str(Path(__file__).parent.parent))
-        from packing.rectangles import WireInfo, pack_components_general
+        from packing.rectangles import (
+            NetInfo,
+            SolverOptions,
+            WireInfo,
+            pack_components_general,
+        )
 
         # Convert wire data back to WireInfo objects
         wires = []
@@ -24,11 +48,45 @@ def run_packing_operation(rects, wires_data, constraints):
                     dest=wire_data["dest"],
                     location_source=tuple(wire_data["location_source"]),
                     location_dest=tuple(wire_data["location_dest"]),
+                    weight=wire_data.get("weight", 1.0),
                 )
             )
 
+        nets = [
+            NetInfo(
+                members=[(i, tuple(location)) for i, location in net_data["members"]],
+                weight=net_data.get("weight", 1.0),
+            )
+            for net_data in nets_data or []
+        ]
+
+        options = SolverOptions(**options_data) if options_data else None
+
+        def report(progress):
+            return on_solution(
+                {
+                    "positions": progress.positions,
+                    "objective": progress.objective,
+                    "bound": progress.bound,
+                    "gap": progress.gap,
+                    "elapsed": progress.elapsed,
+                    "final": progress.final,
+                }
+            )
+
         # Run the packing
-        positions = pack_components_general(rects, wires, constraints)
+        positions = pack_components_general(
+            rects,
+            wires,
+            constraints,
+            options,
+            nets=nets,
+            rotations=[tuple(r) for r in rotations] if rotations else None,
+            fixed=(
+                [tuple(p) if p is not None else None for p in fixed] if fixed else None
+            ),
+            on_solution=report if on_solution else None,
+        )
 
         return {
             "success": True,
@@ -67,21 +125,212 @@ def test_ortools():
         return {"success": False, "error": str(e), "message": "ortools test failed"}
 
 
+def run_pack_request(request, on_solution=None):
+    """
+    Run one "pack" request (or one problem of a batch), timing it.
+
+    With an "accept_gap" the first solution within that gap is accepted right
+    here, so the search stops on it instead of waiting for the caller.
+    """
+    start = time.perf_counter()
+    accept_gap = request.get("accept_gap")
+    if accept_gap is not None:
+        stream = on_solution
+
+        def on_solution(progress):
+            accepted = stream is not None and stream(progress)
+            return accepted or progress["gap"] <= accept_gap
+
+    result = run_packing_operation(
+        request["rects"],
+        request["wires"],
+        request["constraints"],
+        request.get("options"),
+        request.get("nets"),
+        request.get("rotations"),
+        request.get("fixed"),
+        on_solution,
+    )
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+
+def run_batch_operation(problems, max_workers=None, on_solution=None, on_done=None):
+    """
+    Solve independent pack problems concurrently on a thread pool (CP-SAT
+    releases the GIL while it searches).
+
+    Results come back in the order of `problems`, each with its own success
+    flag and elapsed time. Streamed solutions carry the problem's "index",
+    which is also passed to on_done as soon as that problem's search ends.
+
+    The cores are shared out: each problem's CP-SAT num_workers is capped so
+    that all concurrent searches together use at most one thread per core.
+    """
+    start = time.perf_counter()
+    cpus = os.cpu_count() or 1
+    max_workers = min(len(problems), max_workers or cpus, cpus)
+    share = max(1, cpus // max_workers)
+
+    def search_workers(problem):
+        options = dict(problem.get("options") or {})
+        # 0 lets CP-SAT use every core
+        options["num_workers"] = min(options.get("num_workers") or cpus, share)
+        return {**problem, "options": options}
+
+    problems = [search_workers(problem) for problem in problems]
+
+    def solve(index):
+        report = None
+        if on_solution is not None:
+
+            def report(progress):
+                return on_solution({"index": index, **progress})
+
+        try:
+            return run_pack_request(problems[index], report)
+        finally:
+            if on_done is not None:
+                on_done(index)
+
+    if max_workers <= 1:
+        results = [solve(index) for index in range(len(problems))]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(solve, range(len(problems))))
+
+    return {
+        "success": True,
+        "results": results,
+        "elapsed": time.perf_counter() - start,
+        "message": f"Packed {sum(r['success'] for r in results)}/{len(results)} problems",
+    }
+
+
+def handle_request(request, on_solution=None, on_done=None):
+    """
+    Dispatch one decoded request to the matching operation. on_done(index) is
+    called as each search of a batch ends.
+    """
+    operation = request.get("op", "pack")
+
+    if operation == "test":
+        return test_ortools()
+
+    if operation == "pack":
+        return run_pack_request(request, on_solution)
+
+    if operation == "pack_batch":
+        return run_batch_operation(
+            request["problems"], request.get("max_workers"), on_solution, on_done
+        )
+
+    return {"success": False, "error": f"Unknown operation: {operation}"}
+
+
+def serve():
+    """
+    Long-lived worker mode: answer newline-delimited JSON requests from stdin
+    with one JSON line each on stdout, until EOF or a "shutdown" request.
+
+    Every response echoes the request's "id" so the caller can match them up.
+    A pack request with "stream": true is also answered with one
+    {"id", "event": "solution", ...} line per improved solution before its
+    final response; sending {"op": "accept", "id": ...} meanwhile ends that
+    search with the next solution it finds. A pack with "accept_gap" accepts
+    its first solution within that gap itself. For a "pack_batch" request
+    events and accepts carry the "index" of the problem as well.
+    """
+    protocol_out = sys.stdout
+    # Anything printed by the packer goes to stderr so it can't corrupt the protocol
+    sys.stdout = sys.stderr
+
+    # Pay the ortools import once, up front, instead of on the first request
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    import packing.rectangles  # noqa: F401
+
+    # stdin is read on its own thread so accepts arrive while a solve is running
+    pending = queue.Queue()
+    accepted = set()
+
+    def read_requests():
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            # Whatever one line holds, it is answered and the next one is read
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError(f"expected a JSON object, got {line[:80]}")
+                if request.get("op") == "accept":
+                    accepted.add((request.get("id"), request.get("index")))
+                    continue
+                if request.get("op") == "shutdown":
+                    break
+            except Exception as e:
+                pending.put(f"Invalid request: {e}")
+                continue
+            pending.put(request)
+        pending.put(None)
+
+    threading.Thread(target=read_requests, daemon=True).start()
+
+    # Batch problems stream from several threads at once
+    write_lock = threading.Lock()
+
+    def write(message):
+        line = json.dumps(message) + "\n"
+        with write_lock:
+            protocol_out.write(line)
+            protocol_out.flush()
+
+    while True:
+        request = pending.get()
+        if request is None:
+            break
+        if isinstance(request, str):
+            write({"success": False, "error": request})
+            continue
+
+        request_id = request.get("id")
+
+        def stream(progress):
+            write({"id": request_id, "event": "solution", **progress})
+            return (request_id, progress.get("index")) in accepted
+
+        def done(index):
+            # An accept that arrived after the search ended must not linger
+            accepted.discard((request_id, index))
+
+        try:
+            response = handle_request(
+                request, stream if request.get("stream") else None, done
+            )
+        except Exception as e:
+            # A malformed request (e.g. a pack without "rects") must not end
+            # the worker; answer it like any other failure
+            response = {"success": False, "error": f"Invalid request: {e!r}"}
+        response["id"] = request_id
+        for key in list(accepted):  # Copied: the reader thread adds to it
+            if key[0] == request_id:
+                accepted.discard(key)
+        write(response)
+
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         operation = sys.argv[1]
 
-        if operation == "test":
-            result = test_ortools()
-            print(json.dumps(result))
+        if operation == "serve":
+            serve()
 
-        elif operation == "pack":
-            # Read input data from stdin
-            input_data = json.loads(sys.stdin.read())
-            result = run_packing_operation(
-                input_data["rects"], input_data["wires"], input_data["constraints"]
-            )
-            print(json.dumps(result))
+        elif operation in ("test", "pack", "pack_batch"):
+            request = {"op": operation}
+            if operation != "test":
+                # Read input data from stdin
+                request.update(json.loads(sys.stdin.read()))
+            print(json.dumps(handle_request(request)))
 
         else:
             print(